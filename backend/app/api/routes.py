@@ -1,31 +1,90 @@
 """
 API路由模块
 """
-from fastapi import APIRouter, HTTPException, Depends
+import datetime
+import functools
+import logging
+
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Any, Dict, List, Literal, Optional
 
 from app.schemas.schemas import (
     GreenChemistryRequest,
+    SolventGridRequest,
     EcoScaleRequest,
     ChromatogramAnalysisRequest,
+    ChromatogramBatchRequest,
+    ChromatogramProcessingOptions,
+    ChromatogramTraceRequest,
     ChromatogramAnalysisResponse,
     HPLCAnalysisCreate,
+    HPLCAnalysisBulkCreate,
     HPLCAnalysisResponse,
+    MethodRecordWrite,
+    MethodStoreSyncRequest,
+    ReagentBatchCreate,
     APIResponse,
     # 新增完整评分系统的模型
     FullScoreRequest,
     FullScoreResponse,
+    BatchFullScoreRequest,
+    SchemeSweepRequest,
+    ScoringResultCreate,
+    ScoringResultBatchCreate,
+    ScoringSessionDelta,
+    PumpTraceData,
+    TraceFullScoreRequest,
     WeightSchemesResponse,
+    WeightSchemeCreate,
     WeightDetailsResponse
 )
 from app.services.green_chemistry import analyzer
 from app.services import scoring_service  # 导入评分服务
+from app.services import scoring_cache
+from app.services import analysis_store
+from app.services import chromatogram
+from app.services import chromatogram_batch
+from app.services import method_store
+from app.services import result_store
+from app.services import reagent_store
+from app.services import scheme_store
+from app.services import trace_integration
+from app.services import trace_store
+from app.services import trace_view
+from app.services.reagent_library import reagent_library
+from app.services.scoring_stream import score_ndjson_stream
+from app.services.scoring_session import session_store
+from app.core.config import settings
+from app.core.executor import ExecutorBusyError, batch_pool, cpu_pool, executor_stats
+from app.core.instrumentation import debug_payload
 from app.database.connection import get_db
 from app.database.models import HPLCAnalysis
-from sqlalchemy import select
+from app.database.pagination import decode_cursor, encode_cursor
+from sqlalchemy import String, or_, select, tuple_, type_coerce
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+def _run_batch(func, *args: Any, limit: bool = True, **kwargs: Any):
+    """在批量工作池中执行，工作进程先同步本进程的自定义权重方案"""
+    return batch_pool.run(
+        scoring_service.run_with_schemes,
+        scoring_service.scheme_registry.export(),
+        func,
+        *args,
+        limit=limit,
+        **kwargs
+    )
+
+
+def _busy_error(error: ExecutorBusyError) -> HTTPException:
+    """工作池繁忙时返回503，提示客户端稍后重试"""
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": "1"})
 
 
 @router.post("/green-chemistry/solvent-score", tags=["绿色化学"])
@@ -36,17 +95,68 @@ async def calculate_solvent_score(request: GreenChemistryRequest):
             solvent_a=request.solvent_a,
             solvent_b=request.solvent_b,
             ratio_a=request.ratio_a,
-            volume_ml=request.volume_ml
+            volume_ml=request.volume_ml,
+            strict=request.strict
         )
+        message = "溶剂评分计算成功"
+        if result["unknown_solvents"]:
+            message += f"（{', '.join(result['unknown_solvents'])} 不在溶剂数据库中，按默认值计算）"
         return APIResponse(
             success=True,
-            message="溶剂评分计算成功",
+            message=message,
             data=result
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/green-chemistry/solvent-grid", tags=["绿色化学"])
+async def calculate_solvent_grid(request: SolventGridRequest):
+    """
+    在 溶剂对 × A比例 × 体积 网格上计算综合绿色评分（方法开发时筛选溶剂体系）
+    
+    返回评分排名表、溶剂×溶剂的最高评分矩阵，以及 [体积][溶剂对][比例] 的完整评分矩阵（热图数据）。
+    溶剂必须在溶剂数据库中（不使用默认值）。
+    """
+    divisions = round(1 / request.ratio_step)
+    ratios = [i / divisions for i in range(divisions + 1)]
+    volume_max = request.volume_max_ml if request.volume_max_ml is not None else request.volume_min_ml
+    if request.volume_points == 1:
+        volumes = [request.volume_min_ml]
+    else:
+        step = (volume_max - request.volume_min_ml) / (request.volume_points - 1)
+        volumes = [request.volume_min_ml + i * step for i in range(request.volume_points)]
+    
+    num_solvents = len(set(request.solvents)) if request.solvents is not None else len(analyzer.solvent_db)
+    combinations = num_solvents * (num_solvents - 1) // 2 * len(ratios) * len(volumes)
+    if combinations > settings.SOLVENT_GRID_MAX_COMBINATIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"网格共 {combinations} 个组合，超过上限 {settings.SOLVENT_GRID_MAX_COMBINATIONS}"
+        )
+    
+    try:
+        result = await cpu_pool.run(
+            analyzer.calculate_solvent_score_grid,
+            solvents=request.solvents,
+            ratios=ratios,
+            volumes_ml=volumes,
+            top=request.top,
+            include_matrix=request.include_matrix
+        )
+        return APIResponse(
+            success=True,
+            message="溶剂体系网格评分完成",
+            data=result
+        )
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"溶剂体系网格评分失败: {str(e)}")
+
+
 @router.post("/green-chemistry/eco-scale", tags=["绿色化学"])
 async def calculate_eco_scale(request: EcoScaleRequest):
     """计算Eco-Scale评分"""
@@ -70,21 +180,95 @@ async def calculate_eco_scale(request: EcoScaleRequest):
 async def analyze_chromatogram(request: ChromatogramAnalysisRequest):
     """分析色谱图数据"""
     try:
-        result = analyzer.analyze_chromatogram(
+        result = await cpu_pool.run(
+            analyzer.analyze_chromatogram,
             retention_times=request.retention_times,
-            peak_areas=request.peak_areas
+            peak_areas=request.peak_areas,
+            peak_widths=request.peak_widths
         )
         return APIResponse(
             success=True,
             message="色谱图分析完成",
             data=result
         )
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/analysis/chromatogram/trace", response_model=APIResponse, tags=["色谱分析"])
+async def analyze_chromatogram_trace(request: ChromatogramTraceRequest):
+    """
+    处理检测器原始信号
+    
+    基线校正、Savitzky-Golay平滑、峰检测和积分，返回每个峰的保留时间、面积、半峰宽、
+    USP塔板数、拖尾因子和与前一峰的分离度；汇总字段同 /analysis/chromatogram。
+    大信号建议以base64编码的二进制缓冲区上传。
+    """
+    try:
+        result = await cpu_pool.run(
+            chromatogram.process_chromatogram,
+            request.signal,
+            request.sample_rate_hz,
+            **request.model_dump(exclude={"signal", "sample_rate_hz"})
+        )
+        return APIResponse(
+            success=True,
+            message="色谱信号处理完成",
+            data=result
+        )
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"色谱信号处理失败: {str(e)}")
+
+
+@router.post("/analysis/chromatogram/batch", response_model=APIResponse, tags=["色谱分析"])
+async def analyze_chromatogram_batch(request: ChromatogramBatchRequest, db: AsyncSession = Depends(get_db)):
+    """
+    批量处理色谱运行（质控序列）
+    
+    运行可以是已上传信号的分析记录ID或内联信号，按工作进程数分块并行处理。
+    结果按输入顺序返回每个运行的汇总（单个运行出错时该项为 {"index", "success": false, "error"}），
+    以及按目标保留时间（默认为主峰）汇总的保留时间漂移和峰面积RSD。
+    """
+    if len(request.runs) > settings.CHROMATOGRAM_BATCH_MAX_RUNS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"批量分析最多支持 {settings.CHROMATOGRAM_BATCH_MAX_RUNS} 个运行"
+        )
+    
+    try:
+        # 准入时检查一次排队深度，各块随后同时提交
+        batch_pool.check_capacity()
+        runs = await chromatogram_batch.resolve_runs(db, [run.model_dump() for run in request.runs])
+        result = await chromatogram_batch.analyze_batch(
+            runs,
+            request.model_dump(include=set(ChromatogramProcessingOptions.model_fields)),
+            run=functools.partial(batch_pool.run, limit=False),
+            workers=batch_pool.max_workers,
+            targets=request.target_retention_times,
+            rt_window=request.rt_window,
+            include_peaks=request.include_peaks
+        )
+        return APIResponse(
+            success=True,
+            message="色谱批量分析完成",
+            data=result
+        )
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"色谱批量分析失败: {str(e)}")
+
+
 @router.post("/analysis/hplc", response_model=APIResponse, tags=["HPLC分析"])
 async def create_hplc_analysis(
     analysis: HPLCAnalysisCreate,
@@ -130,36 +314,240 @@ async def create_hplc_analysis(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/analysis/hplc/bulk", response_model=APIResponse, tags=["HPLC分析"])
+async def bulk_create_hplc_analyses(
+    request: HPLCAnalysisBulkCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    批量创建HPLC分析记录（导入历史方法）
+    
+    绿色评分批量计算，记录按块（HPLC_BULK_CHUNK_SIZE 条一个事务）批量插入，
+    返回与输入顺序一致的记录ID。某一块失败时此前的块已提交，错误信息中给出已写入的数量。
+    """
+    if len(request.analyses) > settings.HPLC_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"批量创建最多支持 {settings.HPLC_BULK_MAX_ITEMS} 条记录"
+        )
+    
+    try:
+        rows = await cpu_pool.run(
+            analysis_store.analysis_rows,
+            [item.model_dump() for item in request.analyses]
+        )
+        ids = await analysis_store.insert_analysis_rows(db, rows, settings.HPLC_BULK_CHUNK_SIZE)
+        return APIResponse(
+            success=True,
+            message="HPLC分析批量创建成功",
+            data={"count": len(ids), "ids": ids}
+        )
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except analysis_store.BulkInsertError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"{e}（已写入 {len(e.inserted_ids)} 条）"
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# 列表接口只查询这些列（不加载 raw_data / analysis_results 等JSON列）
+_HPLC_LIST_COLUMNS = (
+    HPLCAnalysis.id,
+    HPLCAnalysis.name,
+    HPLCAnalysis.description,
+    HPLCAnalysis.created_at,
+    HPLCAnalysis.green_score
+)
+
+# created_at 按数据库中的原始文本比较（SQLite 的 CURRENT_TIMESTAMP 不含微秒，
+# 直接绑定 datetime 参数会因格式不同而比较错误）；type_coerce 不生成 CAST，不影响索引
+_HPLC_CREATED_AT_TEXT = type_coerce(HPLCAnalysis.created_at, String)
+
+
 @router.get("/analysis/hplc", response_model=APIResponse, tags=["HPLC分析"])
 async def list_hplc_analyses(
-    skip: int = 0,
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    min_score: Optional[float] = Query(None, description="绿色评分下限"),
+    max_score: Optional[float] = Query(None, description="绿色评分上限"),
+    solvent: Optional[str] = Query(None, description="溶剂A或溶剂B为该溶剂"),
+    created_from: Optional[datetime.date] = Query(None, description="创建日期起（含）"),
+    created_to: Optional[datetime.date] = Query(None, description="创建日期止（含）"),
     db: AsyncSession = Depends(get_db)
 ):
-    """获取HPLC分析列表"""
+    """
+    获取HPLC分析列表（按创建时间从新到旧）
+    
+    使用键集分页：返回 {"items": [...], "next_cursor": ...}，将 next_cursor 作为下一页的
+    cursor 参数传入；next_cursor 为 null 表示没有更多记录。翻页耗时与页数无关。
+    """
     try:
-        stmt = select(HPLCAnalysis).offset(skip).limit(limit)
-        result = await db.execute(stmt)
-        analyses = result.scalars().all()
+        stmt = select(*_HPLC_LIST_COLUMNS, _HPLC_CREATED_AT_TEXT.label("created_at_key"))
+        
+        if min_score is not None:
+            stmt = stmt.where(HPLCAnalysis.green_score >= min_score)
+        if max_score is not None:
+            stmt = stmt.where(HPLCAnalysis.green_score <= max_score)
+        if solvent:
+            stmt = stmt.where(or_(HPLCAnalysis.solvent_a == solvent, HPLCAnalysis.solvent_b == solvent))
+        if created_from is not None:
+            stmt = stmt.where(_HPLC_CREATED_AT_TEXT >= created_from.isoformat())
+        if created_to is not None:
+            stmt = stmt.where(_HPLC_CREATED_AT_TEXT < (created_to + datetime.timedelta(days=1)).isoformat())
+        
+        if cursor:
+            created_at_key, last_id = decode_cursor(cursor, 2)
+            stmt = stmt.where(tuple_(_HPLC_CREATED_AT_TEXT, HPLCAnalysis.id) < (created_at_key, last_id))
+        
+        # 多取一条判断是否还有下一页
+        stmt = stmt.order_by(HPLCAnalysis.created_at.desc(), HPLCAnalysis.id.desc()).limit(limit + 1)
+        rows = (await db.execute(stmt)).all()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last.created_at_key, last.id)
         
         return APIResponse(
             success=True,
             message="获取分析列表成功",
-            data=[
-                {
-                    "id": a.id,
-                    "name": a.name,
-                    "description": a.description,
-                    "created_at": a.created_at.isoformat() if a.created_at else None,
-                    "green_score": a.green_score
-                }
-                for a in analyses
-            ]
+            data={
+                "items": [
+                    {
+                        "id": a.id,
+                        "name": a.name,
+                        "description": a.description,
+                        "created_at": a.created_at.isoformat() if a.created_at else None,
+                        "green_score": a.green_score
+                    }
+                    for a in rows[:limit]
+                ],
+                "next_cursor": next_cursor
+            }
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.put("/analysis/hplc/{analysis_id}/trace", response_model=APIResponse, tags=["HPLC分析"])
+async def upload_hplc_trace(
+    analysis_id: int,
+    request: Request,
+    sample_rate_hz: float = Query(..., gt=0, description="采样频率(Hz)"),
+    start_time: float = Query(0.0, description="第一个采样点的保留时间(分钟)"),
+    dtype: Literal["float32", "float64"] = Query("float32", description="原始缓冲区的数据类型（.npy 以头部为准）"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    上传检测器原始信号（application/octet-stream）
+    
+    请求体为小端 float32/float64 缓冲区或 .npy 文件，边接收边写入磁盘，
+    元数据记录在分析记录的 raw_data.trace 中；再次上传会替换原有信号。
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.TRACE_UPLOAD_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"信号数据超过上限 {settings.TRACE_UPLOAD_MAX_BYTES} 字节"
+        )
+    
+    try:
+        meta = await trace_store.attach_trace(
+            db, analysis_id, request.stream(), sample_rate_hz, start_time, dtype
+        )
+    except trace_store.TraceTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"信号上传失败: {str(e)}")
+    
+    if meta is None:
+        raise HTTPException(status_code=404, detail=f"分析记录不存在: {analysis_id}")
+    return APIResponse(success=True, message="信号上传成功", data=meta)
+
+
+@router.get("/analysis/hplc/{analysis_id}/trace", response_model=APIResponse, tags=["HPLC分析"])
+async def get_hplc_trace(analysis_id: int, db: AsyncSession = Depends(get_db)):
+    """获取分析记录的原始信号元数据"""
+    meta = await trace_store.get_trace_meta(db, analysis_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail=f"分析记录 {analysis_id} 不存在或未上传信号")
+    return APIResponse(success=True, message="获取信号信息成功", data=meta)
+
+
+@router.get("/analysis/hplc/{analysis_id}/trace/view", response_model=APIResponse, tags=["HPLC分析"])
+async def view_hplc_trace(
+    analysis_id: int,
+    start: Optional[float] = Query(None, description="窗口起始时间(分钟)，默认为信号起点"),
+    end: Optional[float] = Query(None, description="窗口结束时间(分钟)，默认为信号终点"),
+    width: int = Query(1000, ge=1, le=20000, description="图表像素宽度（返回的最大点数）"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    按图表像素宽度获取降采样的原始信号（缩放时只请求可见窗口）
+    
+    返回每个像素列的时间、最小值和最大值；窗口内的采样点不多于像素数时返回原始点。
+    """
+    meta = await trace_store.get_trace_meta(db, analysis_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail=f"分析记录 {analysis_id} 不存在或未上传信号")
+    
+    try:
+        result = await cpu_pool.run(trace_view.view_trace, meta, start, end, width)
+        return APIResponse(
+            success=True,
+            message="获取信号成功",
+            data=result
+        )
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"分析记录 {analysis_id} 的信号文件不存在")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取信号失败: {str(e)}")
+
+
+@router.post("/analysis/hplc/{analysis_id}/trace/analyze", response_model=APIResponse, tags=["HPLC分析"])
+async def analyze_hplc_trace(
+    analysis_id: int,
+    options: ChromatogramProcessingOptions,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    处理已上传的原始信号
+    
+    信号以内存映射方式只读打开，处理参数和返回结果同 /analysis/chromatogram/trace。
+    """
+    meta = await trace_store.get_trace_meta(db, analysis_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail=f"分析记录 {analysis_id} 不存在或未上传信号")
+    
+    try:
+        result = await cpu_pool.run(trace_store.analyze_trace, meta, **options.model_dump())
+        return APIResponse(
+            success=True,
+            message="色谱信号处理完成",
+            data=result
+        )
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"分析记录 {analysis_id} 的信号文件不存在")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"色谱信号处理失败: {str(e)}")
+
+
 @router.get("/solvents/list", tags=["溶剂数据库"])
 async def list_solvents():
     """获取支持的溶剂列表"""
@@ -180,10 +568,311 @@ async def list_solvents():
     )
 
 
+@router.get("/reagents", response_model=APIResponse, tags=["试剂库"])
+async def list_reagents(db: AsyncSession = Depends(get_db)):
+    """获取试剂库（密度和9个小因子）"""
+    try:
+        reagents = await reagent_store.list_reagents(db)
+        return APIResponse(success=True, message="获取试剂库成功", data=reagents)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取试剂库失败: {str(e)}")
+
+
+@router.get("/reagents/{reagent_id}", response_model=APIResponse, tags=["试剂库"])
+async def get_reagent(reagent_id: int, db: AsyncSession = Depends(get_db)):
+    """获取单个试剂"""
+    reagent = await reagent_store.get_reagent(db, reagent_id)
+    if reagent is None:
+        raise HTTPException(status_code=404, detail=f"试剂不存在: {reagent_id}")
+    return APIResponse(success=True, message="获取试剂成功", data=reagent)
+
+
+@router.post("/reagents", response_model=APIResponse, tags=["试剂库"])
+async def save_reagents(request: ReagentBatchCreate, db: AsyncSession = Depends(get_db)):
+    """
+    按名称创建或更新试剂（一个事务）
+    
+    保存后立即更新内存索引：评分请求中的试剂只要与试剂库名称/别名一致（不区分大小写），
+    或在 reagents 字段中给出试剂库ID/名称，即可省略 densities 和 factor_matrix。
+    """
+    try:
+        reagents = await reagent_store.save_reagents(
+            db,
+            [{**item.model_dump(exclude={"factors"}), "factors": item.factors.model_dump()} for item in request.reagents]
+        )
+        return APIResponse(success=True, message="试剂已保存", data=reagents)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"数据验证错误: {str(e)}")
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"保存试剂失败: {str(e)}")
+
+
+@router.delete("/reagents/{reagent_id}", response_model=APIResponse, tags=["试剂库"])
+async def delete_reagent(reagent_id: int, db: AsyncSession = Depends(get_db)):
+    """从试剂库删除试剂"""
+    try:
+        removed = await reagent_store.delete_reagent(db, reagent_id)
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"删除试剂失败: {str(e)}")
+    
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"试剂不存在: {reagent_id}")
+    return APIResponse(success=True, message="试剂已删除")
+
+
+# ============================================================================
+# 方法数据存储API端点（桌面端的方法/因子/梯度数据）
+# ============================================================================
+
+def _record_conflict(outcome: Dict[str, Any]) -> HTTPException:
+    """版本冲突：返回库中的当前记录，由客户端合并后重试"""
+    return HTTPException(
+        status_code=409,
+        detail={
+            "message": f"记录已被修改: {outcome['collection']}/{outcome['key']}",
+            "current": outcome["current"]
+        }
+    )
+
+
+@router.get("/storage/{collection}", response_model=APIResponse, tags=["方法数据"])
+async def list_method_records(collection: str, db: AsyncSession = Depends(get_db)):
+    """获取集合（methods/factors/gradients）中的全部记录"""
+    try:
+        records = await method_store.list_records(db, collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return APIResponse(success=True, message="获取记录成功", data=records)
+
+
+@router.get("/storage/{collection}/{key}", response_model=APIResponse, tags=["方法数据"])
+async def get_method_record(collection: str, key: str, db: AsyncSession = Depends(get_db)):
+    """获取单条记录"""
+    record = await method_store.get_record(db, collection, key)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"记录不存在: {collection}/{key}")
+    return APIResponse(success=True, message="获取记录成功", data=record)
+
+
+@router.put("/storage/{collection}/{key}", response_model=APIResponse, tags=["方法数据"])
+async def put_method_record(
+    collection: str,
+    key: str,
+    request: MethodRecordWrite,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    创建或更新单条记录
+    
+    带 base_version 时做乐观并发检查：与库中版本不一致返回409及当前记录。
+    内容与库中相同时不产生新的修订号。
+    """
+    change = {"collection": collection, "key": key, "data": request.data, "base_version": request.base_version}
+    try:
+        (outcome,) = await method_store.apply_changes(db, [change])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"数据验证错误: {str(e)}")
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"保存记录失败: {str(e)}")
+    
+    if not outcome["success"]:
+        raise _record_conflict(outcome)
+    return APIResponse(success=True, message="记录已保存", data=outcome)
+
+
+@router.delete("/storage/{collection}/{key}", response_model=APIResponse, tags=["方法数据"])
+async def delete_method_record(
+    collection: str,
+    key: str,
+    base_version: Optional[int] = Query(None, ge=0, description="客户端所见的版本"),
+    db: AsyncSession = Depends(get_db)
+):
+    """删除单条记录（保留删除标记，供其他客户端增量同步）"""
+    change = {"collection": collection, "key": key, "deleted": True, "base_version": base_version}
+    try:
+        (outcome,) = await method_store.apply_changes(db, [change])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"删除记录失败: {str(e)}")
+    
+    if not outcome["success"]:
+        raise _record_conflict(outcome)
+    if not outcome["changed"]:
+        raise HTTPException(status_code=404, detail=f"记录不存在: {collection}/{key}")
+    return APIResponse(success=True, message="记录已删除", data=outcome)
+
+
+@router.post("/storage/sync", response_model=APIResponse, tags=["方法数据"])
+async def sync_method_records(request: MethodStoreSyncRequest, db: AsyncSession = Depends(get_db)):
+    """
+    增量同步
+    
+    1. 在一个事务中写入 changes（逐条做版本检查，冲突的条目不写入，在 results 中返回当前记录）
+    2. 返回修订号大于 since 的其他变更（不含本次写入的），客户端保存返回的 revision 作为下次的 since
+    
+    has_more 为 true 时以新的 revision 继续调用（changes 传空）直到取完。
+    """
+    if len(request.changes) > settings.METHOD_STORE_SYNC_MAX_CHANGES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"单次最多同步 {settings.METHOD_STORE_SYNC_MAX_CHANGES} 条变更"
+        )
+    
+    try:
+        results = await method_store.apply_changes(db, [change.model_dump() for change in request.changes])
+        pulled = await method_store.changes_since(
+            db,
+            since=request.since,
+            limit=min(request.limit or settings.METHOD_STORE_SYNC_PAGE_SIZE, settings.METHOD_STORE_SYNC_PAGE_SIZE),
+            collections=request.collections,
+            exclude_revisions=[
+                outcome["revision"] for outcome in results if outcome["success"] and outcome["changed"]
+            ]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"数据验证错误: {str(e)}")
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"同步失败: {str(e)}")
+    
+    return APIResponse(
+        success=True,
+        message="同步完成",
+        data={
+            "results": results,
+            "conflicts": sum(1 for outcome in results if not outcome["success"]),
+            **pulled
+        }
+    )
+
+
 # ============================================================================
 # 完整评分系统API端点
 # ============================================================================
 
+def _resolve_reagents(reagents, densities, factor_matrix, references):
+    """显式给出的因子转为字典，缺少的密度和因子从试剂库补全"""
+    return reagent_library.resolve_stage(
+        reagents,
+        densities,
+        {reagent: factors.model_dump() for reagent, factors in factor_matrix.items()},
+        references
+    )
+
+
+def _full_score_kwargs(request: FullScoreRequest) -> Dict[str, Any]:
+    """
+    将 FullScoreRequest 转换为 scoring_service.calculate_full_scores 的关键字参数
+    
+    异常：
+        ValueError: 引用的试剂在试剂库中不存在
+    """
+    instrument_data = request.instrument
+    prep_data = request.preparation
+    instrument_densities, instrument_factor_matrix = _resolve_reagents(
+        instrument_data.composition, instrument_data.densities, instrument_data.factor_matrix, instrument_data.reagents
+    )
+    prep_densities, prep_factor_matrix = _resolve_reagents(
+        prep_data.volumes, prep_data.densities, prep_data.factor_matrix, prep_data.reagents
+    )
+    
+    return dict(
+        # 仪器分析数据
+        instrument_time_points=instrument_data.time_points,
+        instrument_composition=instrument_data.composition,
+        instrument_flow_rate=instrument_data.flow_rate,
+        instrument_densities=instrument_densities,
+        instrument_factor_matrix=instrument_factor_matrix,
+        instrument_curve_types=instrument_data.curve_types,  # 曲线类型
+        
+        # 样品前处理数据
+        prep_volumes=prep_data.volumes,
+        prep_densities=prep_densities,
+        prep_factor_matrix=prep_factor_matrix,
+        
+        # P/R/D因子（分阶段）
+        p_factor=request.p_factor,
+        pretreatment_p_factor=request.pretreatment_p_factor,
+        instrument_r_factor=request.instrument_r_factor,
+        instrument_d_factor=request.instrument_d_factor,
+        pretreatment_r_factor=request.pretreatment_r_factor,
+        pretreatment_d_factor=request.pretreatment_d_factor,
+        
+        # 权重方案
+        safety_scheme=request.safety_scheme,
+        health_scheme=request.health_scheme,
+        environment_scheme=request.environment_scheme,
+        instrument_stage_scheme=request.instrument_stage_scheme,
+        prep_stage_scheme=request.prep_stage_scheme,
+        final_scheme=request.final_scheme
+    )
+
+
+def _session_delta_kwargs(delta: ScoringSessionDelta) -> Dict[str, Any]:
+    """将 ScoringSessionDelta 转换为会话输入字段（只包含请求中提供的字段）"""
+    kwargs = {
+        key: value
+        for key, value in delta.model_dump(exclude_unset=True, exclude={"instrument", "preparation"}).items()
+        if value is not None
+    }
+    
+    stage_fields = (
+        ("instrument", "instrument_", ("time_points", "composition", "flow_rate", "densities", "factor_matrix", "curve_types")),
+        ("preparation", "prep_", ("volumes", "densities", "factor_matrix")),
+    )
+    for stage_name, prefix, fields in stage_fields:
+        stage = getattr(delta, stage_name)
+        if stage is None:
+            continue
+        values = stage.model_dump(exclude_unset=True)
+        for field in fields:
+            if field in values:
+                kwargs[prefix + field] = values[field]
+    
+    return kwargs
+
+
+def _validate_batch_items(items: List[Dict[str, Any]], model):
+    """
+    逐项校验批量请求，并转换为评分参数（见 _full_score_kwargs）
+    
+    返回：
+        (结果列表（校验失败的项已填入错误，其余为None）, 通过校验的项的序号, 通过校验的请求对象, 评分参数)
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    positions = []
+    requests = []
+    methods = []
+    
+    for index, item in enumerate(items):
+        try:
+            parsed = model.model_validate(item)
+            methods.append(_full_score_kwargs(parsed))
+        except ValidationError as e:
+            error = _validation_error_message(e)
+        except ValueError as e:
+            error = str(e)
+        else:
+            requests.append(parsed)
+            positions.append(index)
+            continue
+        results[index] = {"index": index, "success": False, "error": error}
+    return results, positions, requests, methods
+
+
+def _validation_error_message(error: ValidationError) -> str:
+    """将Pydantic校验错误压缩为单行信息"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" if err["loc"] else err["msg"]
+        for err in error.errors()
+    )
+
+
 @router.post("/scoring/full-score", response_model=APIResponse, tags=["评分系统"])
 async def calculate_full_score(request: FullScoreRequest):
     """
@@ -197,95 +886,127 @@ async def calculate_full_score(request: FullScoreRequest):
     - schemes: 使用的权重方案
     """
     try:
-        # 🔥 首先打印接收到的原始数据
-        print("\n" + "=" * 80)
-        print("🔍 后端接收到的P/R/D因子（分阶段）:")
-        print(f"  仪器分析阶段:")
-        print(f"    p_factor = {request.p_factor}")
-        print(f"    instrument_r_factor = {request.instrument_r_factor}")
-        print(f"    instrument_d_factor = {request.instrument_d_factor}")
-        print(f"  前处理阶段:")
-        print(f"    pretreatment_p_factor = {request.pretreatment_p_factor}")
-        print(f"    pretreatment_r_factor = {request.pretreatment_r_factor}")
-        print(f"    pretreatment_d_factor = {request.pretreatment_d_factor}")
-        print("=" * 80 + "\n")
-        
         # 转换Pydantic模型为字典
-        instrument_data = request.instrument
-        prep_data = request.preparation
+        kwargs = _full_score_kwargs(request)
         
-        # 转换factor_matrix的格式
-        inst_factor_matrix = {
-            reagent: factors.model_dump()
-            for reagent, factors in instrument_data.factor_matrix.items()
-        }
+        debug_payload(logger, "接收到的评分请求", lambda: {
+            "instrument_reagents": list(kwargs["instrument_factor_matrix"]),
+            "prep_reagents": list(kwargs["prep_factor_matrix"]),
+            "instrument_PRD": (request.p_factor, request.instrument_r_factor, request.instrument_d_factor),
+            "pretreatment_PRD": (
+                request.pretreatment_p_factor, request.pretreatment_r_factor, request.pretreatment_d_factor
+            )
+        })
         
-        prep_factor_matrix = {
-            reagent: factors.model_dump()
-            for reagent, factors in prep_data.factor_matrix.items()
-        }
+        # 调用评分服务
+        result = await cpu_pool.run(scoring_service.calculate_full_scores, **kwargs)
         
-        # 🔍 调试：打印接收到的因子矩阵
-        print("\n" + "=" * 80)
-        print("🔍 后端接收到的数据：")
-        print(f"📊 仪器分析阶段:")
-        print(f"   P因子 (能耗): {request.p_factor}")
-        print(f"   R因子 (可回收性): {request.instrument_r_factor}")
-        print(f"   D因子 (可降解性): {request.instrument_d_factor}")
-        print(f"📊 前处理阶段:")
-        print(f"   P因子 (能耗): {request.pretreatment_p_factor}")
-        print(f"   R因子 (可回收性): {request.pretreatment_r_factor}")
-        print(f"   D因子 (可降解性): {request.pretreatment_d_factor}")
-        print("📋 仪器分析试剂:")
-        for reagent, factors in inst_factor_matrix.items():
-            print(f"  {reagent}: S1={factors.get('S1'):.3f}, S2={factors.get('S2'):.3f}, S3={factors.get('S3'):.3f}, S4={factors.get('S4'):.3f}")
-        print("📋 前处理试剂:")
-        for reagent, factors in prep_factor_matrix.items():
-            print(f"  {reagent}: S1={factors.get('S1'):.3f}, S2={factors.get('S2'):.3f}, S3={factors.get('S3'):.3f}, S4={factors.get('S4'):.3f}")
-        print("=" * 80 + "\n")
+        debug_payload(logger, "评分计算完成", lambda: {
+            "merged_sub_factors": result["merged"]["sub_factors"],
+            "score1": result["instrument"]["score1"],
+            "score2": result["preparation"]["score2"],
+            "score3": result["final"]["score3"]
+        })
         
-        # 调用评分服务
-        result = scoring_service.calculate_full_scores(
-            # 仪器分析数据
-            instrument_time_points=instrument_data.time_points,
-            instrument_composition=instrument_data.composition,
-            instrument_flow_rate=instrument_data.flow_rate,
-            instrument_densities=instrument_data.densities,
-            instrument_factor_matrix=inst_factor_matrix,
-            instrument_curve_types=instrument_data.curve_types,  # 新增：曲线类型
-            
-            # 样品前处理数据
-            prep_volumes=prep_data.volumes,
-            prep_densities=prep_data.densities,
-            prep_factor_matrix=prep_factor_matrix,
-            
-            # P/R/D因子（分阶段）
-            p_factor=request.p_factor,
-            pretreatment_p_factor=request.pretreatment_p_factor,
-            instrument_r_factor=request.instrument_r_factor,
-            instrument_d_factor=request.instrument_d_factor,
-            pretreatment_r_factor=request.pretreatment_r_factor,
-            pretreatment_d_factor=request.pretreatment_d_factor,
-            
-            # 权重方案
-            safety_scheme=request.safety_scheme,
-            health_scheme=request.health_scheme,
-            environment_scheme=request.environment_scheme,
-            instrument_stage_scheme=request.instrument_stage_scheme,
-            prep_stage_scheme=request.prep_stage_scheme,
-            final_scheme=request.final_scheme
+        return APIResponse(
+            success=True,
+            message="完整评分计算成功",
+            data=result
         )
+    
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"数据验证错误: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"评分计算失败: {str(e)}")
+
+
+def _trace_instrument_arrays(trace: PumpTraceData):
+    """由泵组成轨迹请求构建仪器分析阶段的数组输入"""
+    return scoring_service.build_trace_instrument_arrays(
+        trace.composition,
+        trace.sample_rate_hz,
+        trace.flow_rate,
+        *_resolve_reagents(trace.composition, trace.densities, trace.factor_matrix, trace.reagents),
+        method=trace.method,
+        dtype=trace.dtype
+    )
+
+
+@router.post("/scoring/gradient/trace-masses", response_model=APIResponse, tags=["评分系统"])
+async def calculate_trace_masses(trace: PumpTraceData):
+    """
+    对实测泵组成轨迹做数值积分，返回各试剂的总质量(g)
+    
+    轨迹按块积分，内存占用与采样点数无关；大轨迹建议使用base64编码的二进制缓冲区上传
+    """
+    try:
+        composition = {
+            reagent: trace_integration.as_trace_array(values, trace.dtype)
+            for reagent, values in trace.composition.items()
+        }
+        flow_rate = trace.flow_rate
+        if not isinstance(flow_rate, float):
+            flow_rate = trace_integration.as_trace_array(flow_rate, trace.dtype)
         
-        # 打印调试信息
-        print("=" * 80)
-        print("✅ 评分计算完成！")
-        print(f"📊 仪器小因子得分: {result['instrument']['sub_factors']}")
-        print(f"📊 前处理小因子得分: {result['preparation']['sub_factors']}")
-        print(f"📊 合成小因子得分 (merged): {result['merged']['sub_factors']}")
-        print(f"🎯 最终总分 (Score₃): {result['final']['score3']}")
-        print(f"🔬 仪器阶段 (Score₁): {result['instrument']['score1']}")
-        print(f"🧪 前处理阶段 (Score₂): {result['preparation']['score2']}")
-        print("=" * 80)
+        densities, _ = _resolve_reagents(trace.composition, trace.densities, {}, trace.reagents)
+        masses = await cpu_pool.run(
+            trace_integration.calculate_trace_masses,
+            composition, trace.sample_rate_hz, flow_rate, densities, method=trace.method
+        )
+        samples = len(next(iter(composition.values()), ()))
+        
+        return APIResponse(
+            success=True,
+            message="轨迹积分计算成功",
+            data={
+                "masses": {reagent: round(mass, 6) for reagent, mass in masses.items()},
+                "samples": samples,
+                "duration_min": max(samples - 1, 0) / (trace.sample_rate_hz * 60.0),
+                "method": trace.method
+            }
+        )
+    
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"数据验证错误: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"轨迹积分计算失败: {str(e)}")
+
+
+def _score_trace_request(request: TraceFullScoreRequest) -> Dict[str, Any]:
+    """以泵组成轨迹积分的仪器分析质量计算完整评分"""
+    prep_data = request.preparation
+    inst = _trace_instrument_arrays(request.instrument)
+    prep = scoring_service.build_prep_arrays(
+        prep_data.volumes,
+        *_resolve_reagents(prep_data.volumes, prep_data.densities, prep_data.factor_matrix, prep_data.reagents)
+    )
+    
+    return scoring_service.score_stage_arrays(
+        inst,
+        prep,
+        p_factor=request.p_factor,
+        pretreatment_p_factor=request.pretreatment_p_factor,
+        instrument_r_factor=request.instrument_r_factor,
+        instrument_d_factor=request.instrument_d_factor,
+        pretreatment_r_factor=request.pretreatment_r_factor,
+        pretreatment_d_factor=request.pretreatment_d_factor,
+        schemes={key: getattr(request, key) for key in scoring_service.SCHEME_KEYS}
+    )
+
+
+@router.post("/scoring/full-score/trace", response_model=APIResponse, tags=["评分系统"])
+async def calculate_trace_full_score(request: TraceFullScoreRequest):
+    """
+    以泵组成轨迹积分得到仪器分析阶段质量，计算完整绿色化学评分
+    
+    返回结构同 /scoring/full-score
+    """
+    try:
+        result = await cpu_pool.run(_score_trace_request, request)
         
         return APIResponse(
             success=True,
@@ -293,24 +1014,401 @@ async def calculate_full_score(request: FullScoreRequest):
             data=result
         )
     
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"数据验证错误: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"评分计算失败: {str(e)}")
 
 
+@router.post("/scoring/full-score/batch", response_model=APIResponse, tags=["评分系统"])
+async def calculate_full_score_batch(request: BatchFullScoreRequest):
+    """
+    批量计算完整绿色化学评分
+    
+    每个方法单独校验，结果按输入顺序返回；单个方法出错时该项返回
+    {"index": i, "success": false, "error": "..."}，其余方法正常评分。
+    """
+    if len(request.methods) > settings.SCORING_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"批量评分最多支持 {settings.SCORING_BATCH_MAX_ITEMS} 个方法"
+        )
+    
+    try:
+        results, positions, requests, methods = _validate_batch_items(request.methods, FullScoreRequest)
+        
+        scored = await _run_batch(scoring_service.calculate_full_scores_batch, methods) if methods else []
+        for position, item in zip(positions, scored):
+            item["index"] = position
+            results[position] = item
+        
+        succeeded = sum(1 for item in results if item["success"])
+        return APIResponse(
+            success=True,
+            message="批量评分计算完成",
+            data={
+                "total": len(results),
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+                "results": results
+            }
+        )
+    
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量评分计算失败: {str(e)}")
+
+
+def _parse_ndjson_method(line: bytes) -> Dict[str, Any]:
+    """将NDJSON中的一行解析为 calculate_full_scores 的关键字参数"""
+    try:
+        return _full_score_kwargs(FullScoreRequest.model_validate_json(line))
+    except ValidationError as e:
+        raise ValueError(_validation_error_message(e))
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    边读请求体边输出的流式响应
+    
+    StreamingResponse 在 ASGI 2.4 以下会并发监听断开事件，与 request.stream()
+    争抢 receive() 消息；这里直接输出，客户端断开由 send 失败或 request.stream() 感知
+    """
+    
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+@router.post("/scoring/full-score/stream", tags=["评分系统"])
+async def stream_full_scores(request: Request):
+    """
+    NDJSON流式批量评分
+    
+    请求体每行一个方法（结构同 FullScoreRequest），响应为 application/x-ndjson，
+    每行一个结果 {"index", "success", "data"|"error"}，按输入顺序边读边算边返回。
+    请求体和结果都不会整体缓存在服务端。
+    
+    准入时检查批量工作池的排队深度，此后各批次不再受排队限制，避免长任务中途被拒绝。
+    """
+    try:
+        batch_pool.check_capacity()
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    
+    return _DuplexStreamingResponse(
+        score_ndjson_stream(
+            request.stream(),
+            _parse_ndjson_method,
+            batch_size=settings.SCORING_STREAM_BATCH_SIZE,
+            max_line_bytes=settings.SCORING_STREAM_MAX_LINE_BYTES,
+            run=functools.partial(_run_batch, limit=False)
+        ),
+        media_type="application/x-ndjson"
+    )
+
+
+@router.post("/scoring/full-score/sweep", response_model=APIResponse, tags=["评分系统"])
+async def sweep_weight_schemes(request: SchemeSweepRequest):
+    """
+    在全部权重方案组合下计算同一方法的Score₃分布
+    
+    返回组合数、各维度方案名称、min/max/mean/std/百分位数，
+    以及Score₃最高(argmax)和最低(argmin)的方案组合
+    """
+    try:
+        kwargs = _full_score_kwargs(request)
+        result = await _run_batch(
+            scoring_service.sweep_weight_schemes,
+            **kwargs,
+            percentiles=tuple(request.percentiles),
+            include_values=request.include_values
+        )
+        return APIResponse(
+            success=True,
+            message="权重方案扫描完成",
+            data=result
+        )
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"数据验证错误: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"权重方案扫描失败: {str(e)}")
+
+
+@router.post("/scoring/results", response_model=APIResponse, tags=["评分结果"])
+async def save_scoring_results(
+    request: ScoringResultBatchCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    批量评分并保存结果
+    
+    每个方法单独校验和评分，成功的结果在一个事务中批量写入；
+    返回每项的 {"index", "success", "id", "score3"} 或 {"index", "success": false, "error"}。
+    """
+    if len(request.methods) > settings.SCORING_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"单次最多保存 {settings.SCORING_BATCH_MAX_ITEMS} 个方法的评分结果"
+        )
+    
+    try:
+        results, positions, requests, methods = _validate_batch_items(request.methods, ScoringResultCreate)
+        scored = await _run_batch(scoring_service.calculate_full_scores_batch, methods) if methods else []
+        
+        entries = []
+        saved_positions = []
+        for position, item, outcome in zip(positions, requests, scored):
+            if outcome["success"]:
+                entries.append((outcome["data"], item.name, item.analysis_id))
+                saved_positions.append(position)
+            else:
+                results[position] = {"index": position, "success": False, "error": outcome["error"]}
+        
+        ids = await result_store.save_results(db, entries)
+        for position, result_id, (data, _, _) in zip(saved_positions, ids, entries):
+            results[position] = {
+                "index": position,
+                "success": True,
+                "id": result_id,
+                "score3": data["final"]["score3"]
+            }
+        
+        return APIResponse(
+            success=True,
+            message="评分结果已保存",
+            data={
+                "total": len(results),
+                "saved": len(ids),
+                "failed": len(results) - len(ids),
+                "results": results
+            }
+        )
+    
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"保存评分结果失败: {str(e)}")
+
+
+@router.get("/scoring/results", response_model=APIResponse, tags=["评分结果"])
+async def query_scoring_results(
+    safety_scheme: Optional[str] = None,
+    health_scheme: Optional[str] = None,
+    environment_scheme: Optional[str] = None,
+    instrument_stage_scheme: Optional[str] = None,
+    prep_stage_scheme: Optional[str] = None,
+    final_scheme: Optional[str] = None,
+    min_score1: Optional[float] = None,
+    max_score1: Optional[float] = None,
+    min_score2: Optional[float] = None,
+    max_score2: Optional[float] = None,
+    min_score3: Optional[float] = None,
+    max_score3: Optional[float] = None,
+    sub_factor: Optional[str] = Query(None, description="按小因子得分过滤，如 S1"),
+    sub_factor_stage: str = Query("merged", description="小因子所属阶段：instrument/preparation/merged"),
+    min_sub_factor: Optional[float] = None,
+    max_sub_factor: Optional[float] = None,
+    analysis_id: Optional[int] = None,
+    order: str = Query("asc", pattern="^(asc|desc)$", description="按Score₃排序：asc最环保在前"),
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    查询已保存的评分结果（按Score₃排序，键集分页）
+    
+    - 排名：给出全部六个权重方案 + limit，即"该方案组合下最环保的前N个方法"
+    - 范围：min/max_score1/2/3 以及单个小因子的得分范围
+    """
+    try:
+        data = await result_store.query_results(
+            db,
+            schemes={
+                "safety_scheme": safety_scheme,
+                "health_scheme": health_scheme,
+                "environment_scheme": environment_scheme,
+                "instrument_stage_scheme": instrument_stage_scheme,
+                "prep_stage_scheme": prep_stage_scheme,
+                "final_scheme": final_scheme
+            },
+            score_ranges={
+                "score1": (min_score1, max_score1),
+                "score2": (min_score2, max_score2),
+                "score3": (min_score3, max_score3)
+            },
+            sub_factor=(sub_factor_stage, sub_factor, min_sub_factor, max_sub_factor) if sub_factor else None,
+            analysis_id=analysis_id,
+            descending=order == "desc",
+            limit=limit,
+            cursor=cursor
+        )
+        return APIResponse(
+            success=True,
+            message="查询评分结果成功",
+            data=data
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"查询评分结果失败: {str(e)}")
+
+
+@router.get("/scoring/results/{result_id}", response_model=APIResponse, tags=["评分结果"])
+async def get_scoring_result(result_id: int, db: AsyncSession = Depends(get_db)):
+    """获取单个评分结果的完整明细（大因子、P/R/D、各阶段小因子）"""
+    result = await result_store.get_result(db, result_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"评分结果不存在: {result_id}")
+    return APIResponse(success=True, message="获取评分结果成功", data=result)
+
+
+@router.delete("/scoring/results/{result_id}", response_model=APIResponse, tags=["评分结果"])
+async def delete_scoring_result(result_id: int, db: AsyncSession = Depends(get_db)):
+    """删除评分结果"""
+    if not await result_store.delete_result(db, result_id):
+        raise HTTPException(status_code=404, detail=f"评分结果不存在: {result_id}")
+    return APIResponse(success=True, message="评分结果已删除")
+
+
+@router.post("/scoring/sessions", response_model=APIResponse, tags=["评分系统"])
+async def create_scoring_session(request: FullScoreRequest):
+    """
+    创建增量评分会话
+    
+    完成一次完整评分并保存各层中间结果，返回会话ID和完整结果
+    """
+    try:
+        session = await cpu_pool.run(session_store.create, _full_score_kwargs(request))
+        return APIResponse(
+            success=True,
+            message="评分会话创建成功",
+            data={
+                "session_id": session.session_id,
+                "version": session.version,
+                "result": session.result
+            }
+        )
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"数据验证错误: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"评分会话创建失败: {str(e)}")
+
+
+@router.get("/scoring/sessions/{session_id}", response_model=APIResponse, tags=["评分系统"])
+async def get_scoring_session(session_id: str):
+    """获取会话当前的完整评分结果（权重方案被修改过时先按新权重重算）"""
+    try:
+        session = session_store.get(session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"评分会话不存在或已过期: {session_id}")
+    
+    try:
+        await cpu_pool.run(session.refresh)
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    
+    return APIResponse(
+        success=True,
+        message="获取评分会话成功",
+        data={
+            "session_id": session.session_id,
+            "version": session.version,
+            "result": session.result
+        }
+    )
+
+
+@router.patch("/scoring/sessions/{session_id}", response_model=APIResponse, tags=["评分系统"])
+async def update_scoring_session(session_id: str, delta: ScoringSessionDelta):
+    """
+    增量更新评分会话
+    
+    只重算受变更影响的层，返回重算的层列表和发生变化的结果字段（点分路径）
+    """
+    try:
+        session = session_store.get(session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"评分会话不存在或已过期: {session_id}")
+    
+    try:
+        diff = await cpu_pool.run(session.update, _session_delta_kwargs(delta))
+        return APIResponse(
+            success=True,
+            message="评分会话更新成功",
+            data={"session_id": session_id, **diff}
+        )
+    except ExecutorBusyError as e:
+        raise _busy_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"数据验证错误: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"评分会话更新失败: {str(e)}")
+
+
+@router.delete("/scoring/sessions/{session_id}", response_model=APIResponse, tags=["评分系统"])
+async def delete_scoring_session(session_id: str):
+    """删除评分会话"""
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"评分会话不存在或已过期: {session_id}")
+    return APIResponse(success=True, message="评分会话已删除")
+
+
+@router.get("/scoring/cache/stats", response_model=APIResponse, tags=["评分系统"])
+async def get_scoring_cache_stats():
+    """获取评分缓存（Layer 0 质量、Layer 1 小因子）的命中统计"""
+    return APIResponse(
+        success=True,
+        message="获取缓存统计成功",
+        data=scoring_cache.cache_stats()
+    )
+
+
+@router.get("/system/executors", response_model=APIResponse, tags=["系统"])
+async def get_executor_stats():
+    """获取计算工作池（线程池/进程池）的排队深度、任务计数和耗时统计"""
+    return APIResponse(
+        success=True,
+        message="获取工作池统计成功",
+        data=executor_stats()
+    )
+
+
+@router.delete("/scoring/cache", response_model=APIResponse, tags=["评分系统"])
+async def clear_scoring_cache():
+    """清空评分缓存并重置统计"""
+    scoring_cache.clear_caches()
+    return APIResponse(
+        success=True,
+        message="评分缓存已清空",
+        data=scoring_cache.cache_stats()
+    )
+
+
 @router.get("/scoring/weight-schemes", response_model=APIResponse, tags=["评分系统"])
 async def get_weight_schemes():
     """
     获取所有可用的权重方案列表（供前端下拉框使用）
     
-    返回6个类别的权重方案：
-    - safety: 安全因子权重方案（4种）
-    - health: 健康因子权重方案（4种）
-    - environment: 环境因子权重方案（4种）
-    - instrument_stage: 仪器分析阶段权重方案（4种）
-    - prep_stage: 前处理阶段权重方案（4种）
-    - final: 最终汇总权重方案（4种）
+    返回6个类别的权重方案（内置4种 + 自定义方案）：
+    - safety: 安全因子权重方案
+    - health: 健康因子权重方案
+    - environment: 环境因子权重方案
+    - instrument_stage: 仪器分析阶段权重方案
+    - prep_stage: 前处理阶段权重方案
+    - final: 最终汇总权重方案
     """
     try:
         schemes = scoring_service.get_available_schemes()
@@ -343,7 +1441,8 @@ async def get_weight_details(category: str, scheme: str):
             data={
                 "category": category,
                 "scheme": scheme,
-                "weights": weights
+                "weights": weights,
+                "builtin": scoring_service.scheme_registry.is_builtin(category, scheme)
             }
         )
     except ValueError as e:
@@ -351,3 +1450,70 @@ async def get_weight_details(category: str, scheme: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取权重详情失败: {str(e)}")
 
+
+@router.get("/scoring/weight-schemes/custom", response_model=APIResponse, tags=["评分系统"])
+async def list_custom_weight_schemes(
+    category: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """获取自定义权重方案列表（含权重值和说明，可按类别过滤）"""
+    try:
+        schemes = await scheme_store.list_custom_schemes(db, category)
+        return APIResponse(
+            success=True,
+            message="获取自定义权重方案成功",
+            data=schemes
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取自定义权重方案失败: {str(e)}")
+
+
+@router.post("/scoring/weight-schemes", response_model=APIResponse, tags=["评分系统"])
+async def save_custom_weight_scheme(
+    request: WeightSchemeCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    创建或更新自定义权重方案
+    
+    权重项须与类别一致（如 safety 为 S1-S4，阶段类别为 S/H/E/P/R/D），每项在 [0, 1] 内且总和为1。
+    保存后立即编译进内存中的方案注册表，评分请求可直接使用该方案名称。
+    """
+    try:
+        scheme = await scheme_store.save_custom_scheme(
+            db,
+            request.category,
+            request.name,
+            request.weights,
+            request.description
+        )
+        return APIResponse(
+            success=True,
+            message="自定义权重方案已保存",
+            data=scheme
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"数据验证错误: {str(e)}")
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"保存自定义权重方案失败: {str(e)}")
+
+
+@router.delete("/scoring/weight-schemes/{category}/{scheme}", response_model=APIResponse, tags=["评分系统"])
+async def delete_custom_weight_scheme(
+    category: str,
+    scheme: str,
+    db: AsyncSession = Depends(get_db)
+):
+    """删除自定义权重方案（内置方案不可删除）"""
+    try:
+        removed = await scheme_store.delete_custom_scheme(db, category, scheme)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"删除自定义权重方案失败: {str(e)}")
+    
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"自定义权重方案不存在: {category}/{scheme}")
+    return APIResponse(success=True, message="自定义权重方案已删除")
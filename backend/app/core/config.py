@@ -29,12 +29,56 @@ class Settings(BaseSettings):
     
     # 数据库配置
     DATABASE_URL: str = "sqlite+aiosqlite:///./data/hplc_analysis.db"
+    DATABASE_ECHO: bool = False  # 输出全部SQL语句（与DEBUG无关）
+    DATABASE_POOL_SIZE: int = 5  # 连接池常驻连接数
+    DATABASE_MAX_OVERFLOW: int = 10  # 连接池允许临时超出的连接数
+    DATABASE_POOL_TIMEOUT: float = 30.0  # 等待空闲连接的超时（秒）
+    DATABASE_POOL_RECYCLE: int = -1  # 连接最长使用时间（秒，-1为不回收）
+    SQLITE_JOURNAL_MODE: str = "WAL"  # 日志模式（WAL下读写互不阻塞）
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # 同步级别（WAL下NORMAL即可保证不损坏）
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # 遇到写锁时的等待时间（毫秒）
+    SQLITE_CACHE_SIZE_KB: int = 65536  # 每个连接的页缓存大小（KB）
+    SQLITE_MMAP_SIZE_MB: int = 256  # 内存映射读取大小（MB，0为关闭）
     
     # 安全配置
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # 日志与性能追踪配置
+    LOG_LEVEL: str = "INFO"  # DEBUG级别时输出评分流程的调试数据
+    SCORING_TRACE_ENABLED: bool = False  # 记录每个请求的分层耗时（Server-Timing响应头）
+    
+    # HPLC分析记录配置
+    HPLC_BULK_MAX_ITEMS: int = 50000  # 批量创建单次请求的最大记录数
+    HPLC_BULK_CHUNK_SIZE: int = 1000  # 批量创建每个事务插入的记录数
+    CHROMATOGRAM_MAX_PEAKS: int = 500  # 色谱信号处理最多返回的峰数（按显著性保留）
+    CHROMATOGRAM_BATCH_MAX_RUNS: int = 2000  # 色谱批量分析单次请求的最大运行数
+    TRACE_STORAGE_DIR: str = "./data/traces"  # 上传的原始信号文件目录（内存映射读取）
+    TRACE_UPLOAD_MAX_BYTES: int = 536870912  # 单个原始信号文件的最大字节数
+
+    # 方法数据存储配置（桌面端的方法/因子/梯度数据）
+    METHOD_STORE_SYNC_MAX_CHANGES: int = 1000  # 增量同步单次上传的最大变更数
+    METHOD_STORE_SYNC_PAGE_SIZE: int = 500  # 增量同步每页返回的最大变更数
+    METHOD_STORE_MAX_RECORD_BYTES: int = 1048576  # 单条记录数据的最大字节数（JSON序列化后）
+    
+    # 评分系统配置
+    SCORING_BATCH_MAX_ITEMS: int = 10000  # 批量评分单次请求的最大方法数
+    SOLVENT_GRID_MAX_COMBINATIONS: int = 5000000  # 溶剂体系网格评分的最大组合数（溶剂对×比例×体积）
+    SCORING_MASS_CACHE_SIZE: int = 1024  # Layer 0 梯度质量缓存条目数（0为关闭）
+    SCORING_SUB_FACTOR_CACHE_SIZE: int = 4096  # Layer 1 小因子缓存条目数（0为关闭）
+    SCORING_SESSION_MAX: int = 1000  # 增量评分会话的最大数量
+    SCORING_SESSION_TTL_SECONDS: int = 1800  # 会话空闲超时（秒）
+    SCORING_STREAM_BATCH_SIZE: int = 64  # NDJSON流式评分每批处理的方法数
+    SCORING_STREAM_MAX_LINE_BYTES: int = 1048576  # NDJSON流式评分单行最大字节数
+    PUMP_TRACE_CHUNK_SIZE: int = 65536  # 泵组成轨迹分块积分的每块采样区间数
+    
+    # 计算工作池配置
+    EXECUTOR_THREAD_WORKERS: int = 4  # 线程池大小（单个评分、色谱分析等小任务）
+    EXECUTOR_THREAD_QUEUE_LIMIT: int = 64  # 线程池最大排队任务数（0为不限制）
+    EXECUTOR_PROCESS_WORKERS: int = 2  # 进程池大小（批量评分、方案扫描；0为改用线程池）
+    EXECUTOR_PROCESS_QUEUE_LIMIT: int = 8  # 进程池最大排队任务数（0为不限制）
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,174 @@
+"""
+CPU密集型任务执行器模块
+
+路由均为 async def，直接调用评分、色谱分析等同步计算会阻塞事件循环，
+一个耗时请求会拖慢包括 /health 在内的所有请求。本模块提供两个工作池：
+
+- cpu_pool（线程池）：单个方法评分、轨迹积分、色谱分析等小任务。
+  NumPy 运算会释放GIL，线程池开销最小，且保留请求上下文（请求ID、分层计时）
+- batch_pool（进程池）：批量评分、权重方案扫描等大任务，避免长时间占用GIL
+
+每个池限制排队深度（运行中 + 等待中的任务数），超出时抛出 ExecutorBusyError，
+由路由返回 503；同时统计提交/完成/失败/拒绝次数以及排队与执行耗时。
+"""
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import BrokenExecutor, Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+class ExecutorBusyError(RuntimeError):
+    """工作池排队任务数已达上限"""
+
+
+def _timed_call(func: Callable, args: tuple, kwargs: dict) -> Tuple[float, float, Any]:
+    """在工作线程/进程中执行任务，返回 (开始时间戳, 执行耗时秒, 结果)"""
+    started_at = time.time()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return started_at, time.perf_counter() - start, result
+
+
+class WorkerPool:
+    """带排队深度限制和统计信息的线程/进程工作池（执行器首次使用时创建）"""
+
+    def __init__(self, name: str, kind: str, max_workers: int, max_queue: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"未知的工作池类型：{kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+        self.max_wait = 0.0
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # spawn：避免在已有线程的进程中fork
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=self.name
+                    )
+            return self._executor
+
+    def check_capacity(self) -> None:
+        """排队任务数已达上限时抛出 ExecutorBusyError（并计入拒绝次数）"""
+        with self._lock:
+            if self.max_queue > 0 and self.pending >= self.max_queue:
+                self.rejected += 1
+                raise ExecutorBusyError(f"{self.name} 工作池繁忙（排队任务 {self.pending}/{self.max_queue}）")
+
+    async def run(self, func: Callable, *args: Any, limit: bool = True, **kwargs: Any) -> Any:
+        """
+        在工作池中执行同步函数并等待结果
+
+        参数：
+            func: 同步函数（进程池要求可pickle，即模块级函数）
+            limit: 是否检查排队深度；已准入的长任务（如流式评分的后续批次）传 False
+
+        异常：
+            ExecutorBusyError: 排队任务数已达上限
+        """
+        if limit:
+            self.check_capacity()
+
+        call = functools.partial(_timed_call, func, args, kwargs)
+        if self.kind == "thread":
+            # 线程池中保留请求上下文（请求ID、分层计时）
+            call = functools.partial(contextvars.copy_context().run, call)
+
+        executor = self._get_executor()
+        with self._lock:
+            self.pending += 1
+            self.submitted += 1
+        submitted_at = time.time()
+
+        try:
+            loop = asyncio.get_running_loop()
+            started_at, elapsed, result = await loop.run_in_executor(executor, call)
+        except BaseException as e:
+            with self._lock:
+                self.pending -= 1
+                self.failed += 1
+                # 工作进程异常退出后执行器不可再用，下次提交时重新创建
+                if isinstance(e, BrokenExecutor) and self._executor is executor:
+                    self._executor = None
+            raise
+
+        wait = max(0.0, started_at - submitted_at)
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+            self.total_wait += wait
+            self.total_run += elapsed
+            self.max_wait = max(self.max_wait, wait)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """工作池统计信息（耗时单位为毫秒）"""
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self.pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait / self.completed * 1000.0, 3) if self.completed else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000.0, 3),
+                "avg_run_ms": round(self.total_run / self.completed * 1000.0, 3) if self.completed else 0.0
+            }
+
+    def shutdown(self) -> None:
+        """关闭执行器（下次使用时重新创建）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# 全局工作池（EXECUTOR_PROCESS_WORKERS 为0时批量任务也使用线程池）
+cpu_pool = WorkerPool(
+    "cpu", "thread", settings.EXECUTOR_THREAD_WORKERS, settings.EXECUTOR_THREAD_QUEUE_LIMIT
+)
+batch_pool = WorkerPool(
+    "batch",
+    "process" if settings.EXECUTOR_PROCESS_WORKERS > 0 else "thread",
+    settings.EXECUTOR_PROCESS_WORKERS or settings.EXECUTOR_THREAD_WORKERS,
+    settings.EXECUTOR_PROCESS_QUEUE_LIMIT
+)
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    """所有工作池的统计信息"""
+    return {pool.name: pool.stats() for pool in (cpu_pool, batch_pool)}
+
+
+def shutdown_pools() -> None:
+    """关闭所有工作池"""
+    cpu_pool.shutdown()
+    batch_pool.shutdown()
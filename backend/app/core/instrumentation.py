@@ -0,0 +1,127 @@
+"""
+结构化日志与性能追踪模块
+
+- 请求ID：每个请求分配一个ID（可由 X-Request-ID 头传入），写入所有日志行
+- 计时span：按层记录耗时（如 Layer 0 质量计算、Layer 1 归一化），
+  仅在开启追踪或 DEBUG 日志时计时，否则返回共享的空上下文
+- 调试数据：通过 debug_payload 延迟构建，日志级别未开启时不做任何格式化
+"""
+import logging
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 应用日志的根logger，各模块使用 logging.getLogger(__name__)（均位于 "app" 之下）
+APP_LOGGER_NAME = "app"
+span_logger = logging.getLogger("app.trace")
+
+# 当前请求ID与当前请求的span记录
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+_trace_var: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("trace", default=None)
+
+_NULL_SPAN = nullcontext()
+
+
+class RequestIdFilter(logging.Filter):
+    """为日志记录附加当前请求ID"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+def configure_logging(level: str = "INFO") -> None:
+    """
+    配置应用日志（只配置 "app" logger，不影响 uvicorn 自身的日志）
+
+    参数：
+        level: 日志级别名称，如 "INFO"/"DEBUG"
+    """
+    logger = logging.getLogger(APP_LOGGER_NAME)
+    logger.setLevel(level.upper())
+
+    if not any(isinstance(f, RequestIdFilter) for h in logger.handlers for f in h.filters):
+        handler = logging.StreamHandler()
+        handler.addFilter(RequestIdFilter())
+        handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"
+        ))
+        logger.addHandler(handler)
+    logger.propagate = False
+
+
+def new_request_id() -> str:
+    """生成新的请求ID"""
+    return uuid.uuid4().hex[:16]
+
+
+# ============================================================================
+# 计时span
+# ============================================================================
+
+def span(name: str):
+    """
+    记录一段代码的耗时
+
+    未开启追踪且 app.trace 未开启 DEBUG 时直接返回空上下文，不调用计时器。
+
+    用法：
+        with span("layer0.instrument_masses"):
+            ...
+    """
+    if _trace_var.get() is None and not span_logger.isEnabledFor(logging.DEBUG):
+        return _NULL_SPAN
+    return _timed_span(name)
+
+
+@contextmanager
+def _timed_span(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        trace = _trace_var.get()
+        if trace is not None:
+            trace.append((name, elapsed_ms))
+        span_logger.debug("%s %.3fms", name, elapsed_ms)
+
+
+def start_trace():
+    """开启当前上下文的span记录，返回用于 stop_trace 的令牌"""
+    return _trace_var.set([])
+
+
+def stop_trace(token) -> List[Tuple[str, float]]:
+    """结束span记录，返回 [(名称, 毫秒), ...]"""
+    trace = _trace_var.get() or []
+    _trace_var.reset(token)
+    return trace
+
+
+def server_timing_header(trace: List[Tuple[str, float]]) -> str:
+    """将span记录格式化为 Server-Timing 响应头"""
+    return ", ".join(f"{name};dur={elapsed:.3f}" for name, elapsed in trace)
+
+
+# ============================================================================
+# 延迟构建的调试数据
+# ============================================================================
+
+def debug_payload(
+    logger: logging.Logger,
+    message: str,
+    builder: Callable[[], Dict[str, Any]]
+) -> None:
+    """
+    输出调试数据，builder 只在 DEBUG 级别开启时才会被调用
+
+    参数：
+        logger: 目标logger
+        message: 日志说明
+        builder: 返回调试数据字典的无参函数
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("%s %s", message, builder())
@@ -1,17 +1,106 @@
 """
 数据库连接模块
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 import os
 
+
+# ============================================================================
+# SQLite 性能参数
+# ============================================================================
+
+SQLITE_JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SQLITE_SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def sqlite_pragmas(
+    journal_mode: str = settings.SQLITE_JOURNAL_MODE,
+    synchronous: str = settings.SQLITE_SYNCHRONOUS,
+    busy_timeout_ms: int = settings.SQLITE_BUSY_TIMEOUT_MS,
+    cache_size_kb: int = settings.SQLITE_CACHE_SIZE_KB,
+    mmap_size_mb: int = settings.SQLITE_MMAP_SIZE_MB
+) -> List[str]:
+    """
+    每个新连接上执行的 PRAGMA 语句
+
+    - journal_mode=WAL：读写互不阻塞，写事务只追加WAL文件
+    - synchronous=NORMAL：WAL模式下只在检查点时fsync，断电最多丢失最近的事务，不会损坏数据库
+    - busy_timeout：遇到写锁时等待而不是立即报 database is locked
+    - cache_size / mmap_size：页缓存大小（负数表示KB）和内存映射读取的字节数
+    """
+    journal_mode = journal_mode.upper()
+    synchronous = synchronous.upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f"不支持的SQLite日志模式：{journal_mode}")
+    if synchronous not in SQLITE_SYNCHRONOUS_LEVELS:
+        raise ValueError(f"不支持的SQLite同步级别：{synchronous}")
+
+    return [
+        f"PRAGMA journal_mode={journal_mode}",
+        f"PRAGMA synchronous={synchronous}",
+        f"PRAGMA busy_timeout={int(busy_timeout_ms)}",
+        f"PRAGMA cache_size=-{int(cache_size_kb)}",
+        f"PRAGMA mmap_size={int(mmap_size_mb) * 1024 * 1024}"
+    ]
+
+
+def create_engine(
+    url: str = settings.DATABASE_URL,
+    echo: bool = settings.DATABASE_ECHO,
+    pragmas: Optional[List[str]] = None,
+    **pool_options: Any
+) -> AsyncEngine:
+    """
+    创建异步数据库引擎
+
+    参数：
+        url: 数据库URL
+        echo: 是否输出全部SQL语句
+        pragmas: SQLite连接建立时执行的PRAGMA语句，默认取 sqlite_pragmas()；传空列表则不设置
+        pool_options: 连接池参数，默认取 Settings 中的 DATABASE_POOL_*（SQLite内存数据库忽略）
+    """
+    database_url = make_url(url)
+    is_sqlite = database_url.get_backend_name() == "sqlite"
+    options: Dict[str, Any] = {"echo": echo, "future": True}
+
+    # SQLite内存数据库使用单连接的静态池，不接受连接池大小参数；
+    # 其余URL显式使用队列池（SQLAlchemy 2.0 对SQLite文件默认使用 NullPool，同样不接受这些参数）
+    if not (is_sqlite and database_url.database in (None, "", ":memory:")):
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE
+        )
+    options.update(pool_options)
+
+    new_engine = create_async_engine(url, **options)
+
+    if is_sqlite:
+        statements = sqlite_pragmas() if pragmas is None else pragmas
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for statement in statements:
+                    cursor.execute(statement)
+            finally:
+                cursor.close()
+
+    return new_engine
+
+
 # 创建数据库引擎
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    future=True
-)
+engine = create_engine()
 
 # 创建会话工厂
 AsyncSessionLocal = async_sessionmaker(
@@ -26,12 +115,23 @@ Base = declarative_base()
 
 async def init_db():
     """初始化数据库"""
-    # 确保数据目录存在
-    os.makedirs("./data", exist_ok=True)
-    
+    # 确保SQLite数据库文件所在目录存在
+    database_url = make_url(settings.DATABASE_URL)
+    if database_url.get_backend_name() == "sqlite" and database_url.database not in (None, "", ":memory:"):
+        os.makedirs(os.path.dirname(os.path.abspath(database_url.database)), exist_ok=True)
+
     # 创建所有表
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all 不会为已存在的表补建新增的索引
+        await conn.run_sync(_create_missing_indexes)
+
+
+def _create_missing_indexes(connection):
+    """为已存在的表创建模型中新增的索引"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
 
 
 async def get_db():
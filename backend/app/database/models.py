@@ -1,7 +1,7 @@
 """
 数据库模型
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, JSON
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, JSON, UniqueConstraint, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.database.connection import Base
 
@@ -9,6 +9,10 @@ from app.database.connection import Base
 class HPLCAnalysis(Base):
     """HPLC分析记录"""
     __tablename__ = "hplc_analyses"
+    __table_args__ = (
+        # 列表接口按 (created_at, id) 倒序键集分页
+        Index("ix_hplc_analyses_created_at_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False)
@@ -17,14 +21,14 @@ class HPLCAnalysis(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # 分析参数
-    solvent_a = Column(String(100))
-    solvent_b = Column(String(100))
+    solvent_a = Column(String(100), index=True)
+    solvent_b = Column(String(100), index=True)
     flow_rate = Column(Float)  # mL/min
     column_type = Column(String(100))
     temperature = Column(Float)  # ℃
     
     # 绿色化学评分
-    green_score = Column(Float)
+    green_score = Column(Float, index=True)
     eco_scale_score = Column(Float)
     
     # 分析数据（JSON格式存储）
@@ -53,3 +57,133 @@ class GreenChemistryMetric(Base):
     total_score = Column(Float)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class WeightScheme(Base):
+    """用户自定义权重方案（内置方案定义在 scoring_service 中，不入库）"""
+    __tablename__ = "weight_schemes"
+    __table_args__ = (UniqueConstraint("category", "name", name="uq_weight_scheme_category_name"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    category = Column(String(50), nullable=False)  # safety/health/environment/instrument_stage/prep_stage/final
+    name = Column(String(100), nullable=False)
+    description = Column(Text)
+    weights = Column(JSON, nullable=False)  # 如 {"S1": 0.25, "S2": 0.25, "S3": 0.25, "S4": 0.25}
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class Reagent(Base):
+    """试剂库：试剂的密度和9个小因子，评分请求可按ID或名称引用"""
+    __tablename__ = "reagents"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(200), nullable=False, unique=True)
+    aliases = Column(JSON)  # 其他名称，如 ["MeOH", "甲醇"]
+    density = Column(Float, nullable=False)  # g/mL
+    description = Column(Text)
+    
+    # 小因子（0-1）
+    S1 = Column(Float, nullable=False)
+    S2 = Column(Float, nullable=False)
+    S3 = Column(Float, nullable=False)
+    S4 = Column(Float, nullable=False)
+    H1 = Column(Float, nullable=False)
+    H2 = Column(Float, nullable=False)
+    E1 = Column(Float, nullable=False)
+    E2 = Column(Float, nullable=False)
+    E3 = Column(Float, nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class ScoringResult(Base):
+    """完整评分结果（小因子见 ScoringResultSubFactor）"""
+    __tablename__ = "scoring_results"
+    __table_args__ = (
+        # 指定方案组合下按Score₃排名；不限方案时按Score₃范围查询
+        Index("ix_scoring_results_scheme_score3", "scheme_key", "score3", "id"),
+        Index("ix_scoring_results_score3", "score3", "id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    analysis_id = Column(Integer, index=True)  # 关联的HPLC分析记录（可选）
+    name = Column(String(200))
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    
+    # 阶段总分与最终总分
+    score1 = Column(Float, nullable=False)
+    score2 = Column(Float, nullable=False)
+    score3 = Column(Float, nullable=False)
+    
+    # 大因子（Layer 3）
+    instrument_S = Column(Float)
+    instrument_H = Column(Float)
+    instrument_E = Column(Float)
+    preparation_S = Column(Float)
+    preparation_H = Column(Float)
+    preparation_E = Column(Float)
+    
+    # P/R/D因子
+    instrument_P = Column(Float)
+    instrument_R = Column(Float)
+    instrument_D = Column(Float)
+    pretreatment_P = Column(Float)
+    pretreatment_R = Column(Float)
+    pretreatment_D = Column(Float)
+    
+    # 权重方案；scheme_key 为六个方案名称按固定顺序以"|"连接，用于按方案组合检索
+    safety_scheme = Column(String(100), nullable=False)
+    health_scheme = Column(String(100), nullable=False)
+    environment_scheme = Column(String(100), nullable=False)
+    instrument_stage_scheme = Column(String(100), nullable=False)
+    prep_stage_scheme = Column(String(100), nullable=False)
+    final_scheme = Column(String(100), nullable=False)
+    scheme_key = Column(String(620), nullable=False)
+
+
+class ScoringResultSubFactor(Base):
+    """评分结果的小因子得分（每个结果 3个阶段 × 9个小因子）"""
+    __tablename__ = "scoring_result_sub_factors"
+    __table_args__ = (
+        # 按小因子得分范围检索
+        Index("ix_scoring_result_sub_factors_value", "stage", "factor", "value"),
+    )
+    
+    result_id = Column(Integer, ForeignKey("scoring_results.id", ondelete="CASCADE"), primary_key=True)
+    stage = Column(String(20), primary_key=True)  # instrument/preparation/merged
+    factor = Column(String(10), primary_key=True)  # S1-S4/H1-H2/E1-E3
+    value = Column(Float, nullable=False)
+
+
+class MethodRecord(Base):
+    """桌面端的方法/因子/梯度数据（每条记录单独保存，支持增量同步）"""
+    __tablename__ = "method_records"
+    __table_args__ = (
+        UniqueConstraint("collection", "key", name="uq_method_record_collection_key"),
+        # 增量同步按全局修订号拉取变更
+        Index("ix_method_records_revision", "revision"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    collection = Column(String(50), nullable=False)  # methods/factors/gradients
+    key = Column(String(200), nullable=False)  # 客户端的记录标识
+    data = Column(JSON)  # 删除后为空
+    deleted = Column(Boolean, nullable=False, default=False)  # 删除标记，同步时下发给其他客户端
+    
+    # 变更追踪：version 为该记录的修改次数（乐观并发控制），revision 为全局递增的修订号
+    version = Column(Integer, nullable=False)
+    revision = Column(Integer, nullable=False)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class StoreCounter(Base):
+    """全局递增计数器（如方法数据的修订号）"""
+    __tablename__ = "store_counters"
+    
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,36 @@
+"""
+键集（keyset）分页游标
+
+游标为排序键取值的JSON经URL安全base64编码后的字符串，对客户端不透明。
+查询时用 (排序键) > (游标值) 代替 OFFSET，翻页耗时与页码无关。
+"""
+import base64
+import json
+from typing import Any, List
+
+
+def encode_cursor(*values: Any) -> str:
+    """将排序键取值编码为游标"""
+    raw = json.dumps(list(values), separators=(",", ":"), default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    解码游标
+
+    参数：
+        cursor: encode_cursor 生成的游标
+        size: 排序键个数
+
+    异常：
+        ValueError: 游标格式无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"无效的分页游标：{cursor}") from None
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError(f"无效的分页游标：{cursor}")
+    return values
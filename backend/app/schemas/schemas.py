@@ -2,7 +2,7 @@
 Pydantic数据模型
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal, Union
 from datetime import datetime
 
 
@@ -17,6 +17,38 @@ class HPLCAnalysisCreate(BaseModel):
     temperature: float = Field(..., description="温度(℃)")
 
 
+class HPLCAnalysisBulkCreate(BaseModel):
+    """批量创建HPLC分析请求"""
+    analyses: List[HPLCAnalysisCreate] = Field(..., min_length=1, description="分析记录列表")
+
+
+class MethodRecordWrite(BaseModel):
+    """写入单条方法数据记录请求"""
+    data: Any = Field(..., description="记录内容（任意JSON）")
+    base_version: Optional[int] = Field(
+        None, ge=0, description="客户端所见的版本，与库中不一致时返回409；0表示记录应当不存在；不传则直接覆盖"
+    )
+
+
+class MethodRecordChange(BaseModel):
+    """增量同步上传的一条变更"""
+    collection: Literal["methods", "factors", "gradients"] = Field(..., description="数据集合")
+    key: str = Field(..., min_length=1, max_length=200, description="记录键")
+    data: Any = Field(None, description="记录内容（删除时忽略）")
+    deleted: bool = Field(False, description="是否删除该记录")
+    base_version: Optional[int] = Field(None, ge=0, description="客户端所见的版本（同 MethodRecordWrite）")
+
+
+class MethodStoreSyncRequest(BaseModel):
+    """方法数据增量同步请求：先写入本地变更，再拉取 since 之后的远端变更"""
+    since: int = Field(0, ge=0, description="上次同步返回的修订号，0表示首次同步")
+    changes: List[MethodRecordChange] = Field(default_factory=list, description="本地变更")
+    collections: Optional[List[Literal["methods", "factors", "gradients"]]] = Field(
+        None, description="只拉取这些集合的变更"
+    )
+    limit: Optional[int] = Field(None, ge=1, description="拉取的最大变更数（默认及上限见 METHOD_STORE_SYNC_PAGE_SIZE）")
+
+
 class HPLCAnalysisResponse(BaseModel):
     """HPLC分析响应"""
     id: int
@@ -41,6 +73,18 @@ class GreenChemistryRequest(BaseModel):
     solvent_b: str = Field(..., description="溶剂B名称")
     ratio_a: float = Field(0.5, description="溶剂A比例", ge=0, le=1)
     volume_ml: float = Field(1.0, description="总体积(mL)", gt=0)
+    strict: bool = Field(False, description="溶剂不在数据库中时报错（默认按中等水平5.0计算）")
+
+
+class SolventGridRequest(BaseModel):
+    """溶剂体系网格评分请求（溶剂对 × A比例 × 体积）"""
+    solvents: Optional[List[str]] = Field(None, min_length=2, description="参与组合的溶剂，默认为溶剂数据库中的全部溶剂")
+    ratio_step: float = Field(0.01, gt=0, le=0.5, description="溶剂A比例的步长（0-1等分）")
+    volume_min_ml: float = Field(1.0, gt=0, description="最小总体积(mL)")
+    volume_max_ml: Optional[float] = Field(None, gt=0, description="最大总体积(mL)，默认等于最小体积")
+    volume_points: int = Field(1, ge=1, le=1000, description="体积网格点数（在最小和最大体积之间均分）")
+    top: int = Field(20, ge=0, le=1000, description="排名表返回的组合数")
+    include_matrix: bool = Field(True, description="是否返回完整的评分矩阵（热图数据）")
 
 
 class EcoScaleRequest(BaseModel):
@@ -55,6 +99,44 @@ class ChromatogramAnalysisRequest(BaseModel):
     """色谱图分析请求"""
     retention_times: List[float] = Field(..., description="保留时间列表")
     peak_areas: List[float] = Field(..., description="峰面积列表")
+    peak_widths: Optional[List[float]] = Field(None, description="半峰宽列表(可选，给出时按USP计算分离度)")
+
+
+class ChromatogramProcessingOptions(BaseModel):
+    """色谱原始信号处理参数（基线校正、平滑、峰检测）"""
+    baseline: Literal["rolling", "none"] = Field("rolling", description="基线校正方法")
+    baseline_window: float = Field(1.0, gt=0, description="基线窗口(分钟)，应大于最宽的峰")
+    smoothing: Literal["savgol", "none"] = Field("savgol", description="平滑方法")
+    smooth_window: int = Field(11, ge=3, description="Savitzky-Golay窗口(采样点数)")
+    polyorder: int = Field(2, ge=1, le=5, description="Savitzky-Golay多项式阶数")
+    min_snr: float = Field(3.0, gt=0, description="峰的最小信噪比")
+    min_width: float = Field(0.0, ge=0, description="最小半峰宽(分钟)")
+
+
+class ChromatogramTraceRequest(ChromatogramProcessingOptions):
+    """色谱原始信号处理请求（信号随请求上传）"""
+    signal: Union[List[float], str] = Field(..., description="检测器信号，数值列表或base64编码的小端二进制缓冲区")
+    sample_rate_hz: float = Field(..., gt=0, description="采样频率(Hz)")
+    start_time: float = Field(0.0, description="第一个采样点的保留时间(分钟)")
+    dtype: Literal["float32", "float64"] = Field("float32", description="二进制缓冲区的数据类型")
+
+
+class ChromatogramBatchRun(BaseModel):
+    """批量分析中的一个运行：已上传信号的分析记录ID，或内联信号"""
+    name: Optional[str] = Field(None, description="运行名称（如进样序号）")
+    analysis_id: Optional[int] = Field(None, description="已上传信号的HPLC分析记录ID")
+    signal: Optional[Union[List[float], str]] = Field(None, description="检测器信号，数值列表或base64编码的小端二进制缓冲区")
+    sample_rate_hz: Optional[float] = Field(None, gt=0, description="内联信号的采样频率(Hz)")
+    start_time: float = Field(0.0, description="第一个采样点的保留时间(分钟)")
+    dtype: Literal["float32", "float64"] = Field("float32", description="二进制缓冲区的数据类型")
+
+
+class ChromatogramBatchRequest(ChromatogramProcessingOptions):
+    """色谱批量分析请求（所有运行使用相同的处理参数）"""
+    runs: List[ChromatogramBatchRun] = Field(..., min_length=1, description="运行列表（按进样顺序）")
+    target_retention_times: Optional[List[float]] = Field(None, description="汇总的目标保留时间(分钟)，默认按各运行主峰汇总")
+    rt_window: float = Field(0.2, gt=0, description="目标保留时间的匹配窗口(分钟)")
+    include_peaks: bool = Field(False, description="是否返回每个运行的峰列表")
 
 
 class ChromatogramAnalysisResponse(BaseModel):
@@ -97,16 +179,22 @@ class InstrumentAnalysisData(BaseModel):
     time_points: List[float] = Field(..., description="梯度时间点(分钟)")
     composition: Dict[str, List[float]] = Field(..., description="试剂组成百分比")
     flow_rate: float = Field(..., gt=0, description="流速(mL/min)")
-    densities: Dict[str, float] = Field(..., description="试剂密度(g/mL)")
-    factor_matrix: Dict[str, ReagentFactors] = Field(..., description="试剂因子矩阵")
+    densities: Dict[str, float] = Field(default_factory=dict, description="试剂密度(g/mL)，缺少的试剂从试剂库补全")
+    factor_matrix: Dict[str, ReagentFactors] = Field(default_factory=dict, description="试剂因子矩阵，缺少的试剂从试剂库补全")
+    reagents: Dict[str, Union[int, str]] = Field(
+        default_factory=dict, description="试剂 → 试剂库ID或名称（未列出的试剂按自身名称查找）"
+    )
     curve_types: List[str] = Field(default=None, description="曲线类型列表(可选，默认为linear)")
 
 
 class PreparationData(BaseModel):
     """样品前处理阶段数据"""
     volumes: Dict[str, float] = Field(..., description="试剂体积(mL)")
-    densities: Dict[str, float] = Field(..., description="试剂密度(g/mL)")
-    factor_matrix: Dict[str, ReagentFactors] = Field(..., description="试剂因子矩阵")
+    densities: Dict[str, float] = Field(default_factory=dict, description="试剂密度(g/mL)，缺少的试剂从试剂库补全")
+    factor_matrix: Dict[str, ReagentFactors] = Field(default_factory=dict, description="试剂因子矩阵，缺少的试剂从试剂库补全")
+    reagents: Dict[str, Union[int, str]] = Field(
+        default_factory=dict, description="试剂 → 试剂库ID或名称（未列出的试剂按自身名称查找）"
+    )
 
 
 class FullScoreRequest(BaseModel):
@@ -131,6 +219,88 @@ class FullScoreRequest(BaseModel):
     final_scheme: str = Field("Standard", description="最终汇总权重方案")
 
 
+class BatchFullScoreRequest(BaseModel):
+    """批量完整评分请求（每项按 FullScoreRequest 单独校验，错误不影响其他项）"""
+    methods: List[Dict[str, Any]] = Field(..., min_length=1, description="方法列表，每项结构同 FullScoreRequest")
+
+
+class SchemeSweepRequest(FullScoreRequest):
+    """权重方案扫描请求（权重方案字段被忽略，遍历所有组合）"""
+    percentiles: List[float] = Field([5, 25, 50, 75, 95], description="需要返回的百分位数(0-100)")
+    include_values: bool = Field(False, description="是否返回全部组合的Score₃")
+
+
+class ScoringResultCreate(FullScoreRequest):
+    """评分并保存结果请求中的单个方法"""
+    name: Optional[str] = Field(None, max_length=200, description="方法名称")
+    analysis_id: Optional[int] = Field(None, description="关联的HPLC分析记录ID")
+
+
+class ScoringResultBatchCreate(BaseModel):
+    """评分并保存结果请求（每项按 ScoringResultCreate 单独校验，错误不影响其他项）"""
+    methods: List[Dict[str, Any]] = Field(..., min_length=1, description="方法列表，每项结构同 ScoringResultCreate")
+
+
+class InstrumentAnalysisDelta(BaseModel):
+    """仪器分析阶段数据变更（字典字段按试剂合并，试剂值为null表示移除）"""
+    time_points: Optional[List[float]] = Field(None, description="梯度时间点(分钟)")
+    composition: Optional[Dict[str, Optional[List[float]]]] = Field(None, description="试剂组成百分比")
+    flow_rate: Optional[float] = Field(None, gt=0, description="流速(mL/min)")
+    densities: Optional[Dict[str, Optional[float]]] = Field(None, description="试剂密度(g/mL)")
+    factor_matrix: Optional[Dict[str, Optional[ReagentFactors]]] = Field(None, description="试剂因子矩阵")
+    curve_types: Optional[List[str]] = Field(None, description="曲线类型列表")
+
+
+class PreparationDelta(BaseModel):
+    """样品前处理阶段数据变更（字典字段按试剂合并，试剂值为null表示移除）"""
+    volumes: Optional[Dict[str, Optional[float]]] = Field(None, description="试剂体积(mL)")
+    densities: Optional[Dict[str, Optional[float]]] = Field(None, description="试剂密度(g/mL)")
+    factor_matrix: Optional[Dict[str, Optional[ReagentFactors]]] = Field(None, description="试剂因子矩阵")
+
+
+class ScoringSessionDelta(BaseModel):
+    """增量评分会话的变更（只需提供发生变化的字段）"""
+    instrument: Optional[InstrumentAnalysisDelta] = Field(None, description="仪器分析数据变更")
+    preparation: Optional[PreparationDelta] = Field(None, description="样品前处理数据变更")
+    p_factor: Optional[float] = Field(None, ge=0, description="仪器分析P因子")
+    pretreatment_p_factor: Optional[float] = Field(None, ge=0, description="前处理P因子")
+    instrument_r_factor: Optional[float] = Field(None, ge=0, description="仪器分析阶段R因子")
+    instrument_d_factor: Optional[float] = Field(None, ge=0, description="仪器分析阶段D因子")
+    pretreatment_r_factor: Optional[float] = Field(None, ge=0, description="前处理阶段R因子")
+    pretreatment_d_factor: Optional[float] = Field(None, ge=0, description="前处理阶段D因子")
+    safety_scheme: Optional[str] = Field(None, description="安全因子权重方案")
+    health_scheme: Optional[str] = Field(None, description="健康因子权重方案")
+    environment_scheme: Optional[str] = Field(None, description="环境因子权重方案")
+    instrument_stage_scheme: Optional[str] = Field(None, description="仪器分析阶段权重方案")
+    prep_stage_scheme: Optional[str] = Field(None, description="前处理阶段权重方案")
+    final_scheme: Optional[str] = Field(None, description="最终汇总权重方案")
+
+
+class PumpTraceData(BaseModel):
+    """泵组成轨迹数据（高分辨率积分模式）"""
+    sample_rate_hz: float = Field(..., gt=0, description="采样频率(Hz)")
+    composition: Dict[str, Union[List[float], str]] = Field(
+        ..., description="各试剂组成百分比轨迹，数值列表或base64编码的小端二进制缓冲区"
+    )
+    flow_rate: Union[float, List[float], str] = Field(
+        ..., description="流速(mL/min)，常数或同步采样的流速轨迹（数值列表或base64缓冲区）"
+    )
+    densities: Dict[str, float] = Field(default_factory=dict, description="试剂密度(g/mL)，缺少的试剂从试剂库补全")
+    factor_matrix: Dict[str, ReagentFactors] = Field(
+        default_factory=dict, description="试剂因子矩阵(评分时必填)，缺少的试剂从试剂库补全"
+    )
+    reagents: Dict[str, Union[int, str]] = Field(
+        default_factory=dict, description="试剂 → 试剂库ID或名称（未列出的试剂按自身名称查找）"
+    )
+    dtype: Literal["float32", "float64"] = Field("float32", description="二进制缓冲区的数据类型")
+    method: Literal["trapezoid", "simpson"] = Field("trapezoid", description="数值积分方法")
+
+
+class TraceFullScoreRequest(FullScoreRequest):
+    """使用泵组成轨迹计算仪器分析阶段质量的完整评分请求"""
+    instrument: PumpTraceData = Field(..., description="仪器分析泵组成轨迹")
+
+
 class FullScoreResponse(BaseModel):
     """完整评分响应"""
     instrument: Dict[str, Any] = Field(..., description="仪器分析阶段结果")
@@ -150,6 +320,30 @@ class WeightSchemesResponse(BaseModel):
     final: List[str]
 
 
+class WeightSchemeCreate(BaseModel):
+    """创建/更新自定义权重方案请求"""
+    category: Literal["safety", "health", "environment", "instrument_stage", "prep_stage", "final"] = Field(
+        ..., description="权重类别"
+    )
+    name: str = Field(..., min_length=1, max_length=100, description="方案名称（不能与内置方案同名）")
+    weights: Dict[str, float] = Field(..., description="权重值，权重项须与类别一致且总和为1")
+    description: Optional[str] = Field(None, description="方案说明")
+
+
+class ReagentCreate(BaseModel):
+    """创建/更新试剂库条目请求（按名称匹配）"""
+    name: str = Field(..., min_length=1, max_length=200, description="试剂名称")
+    aliases: List[str] = Field(default_factory=list, description="其他名称，如 MeOH、甲醇")
+    density: float = Field(..., gt=0, description="密度(g/mL)")
+    factors: ReagentFactors = Field(..., description="9个小因子")
+    description: Optional[str] = Field(None, description="说明")
+
+
+class ReagentBatchCreate(BaseModel):
+    """批量创建/更新试剂库条目请求"""
+    reagents: List[ReagentCreate] = Field(..., min_length=1, description="试剂列表")
+
+
 class WeightDetailsResponse(BaseModel):
     """权重详情响应"""
     category: str
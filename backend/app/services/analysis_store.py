@@ -0,0 +1,98 @@
+"""
+HPLC分析记录批量写入模块
+
+导入历史方法时逐条 add + commit + refresh 会为每条记录开一个事务并多一次查询。
+这里先批量计算绿色评分，再按块用 executemany 插入（INSERT ... RETURNING id），
+每块一个事务，不逐条 refresh。
+"""
+from typing import Any, Dict, List, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import HPLCAnalysis
+from app.services.green_chemistry import analyzer
+
+
+class BulkInsertError(RuntimeError):
+    """批量写入中途失败（此前已提交的块不会回滚）"""
+
+    def __init__(self, message: str, inserted_ids: List[int]):
+        super().__init__(message)
+        self.inserted_ids = inserted_ids
+
+
+def analysis_rows(analyses: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    将 HPLCAnalysisCreate 的字段字典转换为插入行，并批量计算绿色评分
+
+    评分口径与单条创建接口一致（溶剂A比例0.5，体积取流速）
+    """
+    scores = analyzer.calculate_solvent_scores_batch(
+        [item["solvent_a"] for item in analyses],
+        [item["solvent_b"] for item in analyses],
+        ratio_a=0.5,
+        volumes_ml=[item["flow_rate"] for item in analyses]
+    )
+    return [
+        {
+            "name": item["name"],
+            "description": item.get("description"),
+            "solvent_a": item["solvent_a"],
+            "solvent_b": item["solvent_b"],
+            "flow_rate": item["flow_rate"],
+            "column_type": item["column_type"],
+            "temperature": item["temperature"],
+            "green_score": score
+        }
+        for item, score in zip(analyses, scores)
+    ]
+
+
+async def insert_analysis_rows(
+    db: AsyncSession,
+    rows: Sequence[Dict[str, Any]],
+    chunk_size: int
+) -> List[int]:
+    """
+    按块插入 analysis_rows 生成的行
+
+    参数：
+        rows: 插入行
+        chunk_size: 每个事务插入的记录数
+
+    返回：
+        List[int]: 与输入顺序一致的记录ID
+
+    异常：
+        BulkInsertError: 某一块写入失败；inserted_ids 为此前已提交的记录ID
+    """
+    chunk_size = max(1, chunk_size)
+    ids: List[int] = []
+
+    for start in range(0, len(rows), chunk_size):
+        try:
+            result = await db.execute(
+                insert(HPLCAnalysis).returning(HPLCAnalysis.id, sort_by_parameter_order=True),
+                list(rows[start:start + chunk_size])
+            )
+            chunk_ids = list(result.scalars().all())
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise BulkInsertError(
+                f"第 {start + 1}-{min(start + chunk_size, len(rows))} 条记录写入失败: {e}",
+                ids
+            ) from e
+        ids.extend(chunk_ids)
+
+    return ids
+
+
+async def bulk_create_analyses(
+    db: AsyncSession,
+    analyses: Sequence[Dict[str, Any]],
+    chunk_size: int
+) -> List[int]:
+    """批量计算绿色评分并按块插入（见 analysis_rows / insert_analysis_rows）"""
+    return await insert_analysis_rows(db, analysis_rows(analyses), chunk_size)
@@ -0,0 +1,267 @@
+"""
+色谱信号处理模块
+
+对检测器原始信号（均匀采样，单次运行可达数十万至上百万点）做完整的峰处理：
+
+1. 基线校正：滚动开运算（窗口内最小值再取最大值）后做滑动平均，窗口应大于最宽的峰
+2. 平滑：Savitzky-Golay 滤波，保持峰高和峰面积
+3. 噪声估计：一阶差分的中位数绝对偏差（MAD），不受峰的影响
+4. 峰检测：scipy.signal.find_peaks，按信噪比（显著性 ≥ min_snr × 噪声）和最小峰宽筛选
+5. 积分：从峰顶向两侧延伸到信号回落至噪声水平处，相邻峰在谷点垂直分割，梯形法则积分
+6. 系统适用性参数（USP <621>，半峰宽法）：
+   - 理论塔板数 N = 5.54 × (t_R / W_h)²
+   - 分离度 Rs = 1.18 × (t_R2 - t_R1) / (W_h1 + W_h2)
+   - 拖尾因子 T = W_0.05 / (2f)，W_0.05 为5%峰高处的峰宽，f 为其中峰前沿到峰顶的距离
+
+所有逐点运算都是向量化的 NumPy/SciPy 调用（滤波器均为 O(N)），
+逐峰的量由 peak_widths 等函数按峰数组一次算出，1M 点的信号可在1秒内处理完。
+时间单位均为分钟。
+"""
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from scipy import ndimage, signal as sp_signal
+
+from app.core.config import settings
+from app.services.trace_integration import as_trace_array
+
+
+BASELINE_METHODS = ("none", "rolling")
+SMOOTHING_METHODS = ("none", "savgol")
+
+# 高斯峰：基线宽度 W_b = 4σ，半峰宽 W_h = 2√(2ln2)σ
+HALF_HEIGHT_PLATE_CONSTANT = 5.54
+HALF_HEIGHT_RESOLUTION_CONSTANT = 1.18
+
+# MAD → 标准差；一阶差分的噪声为原信号的 √2 倍
+_MAD_TO_SIGMA = 1.4826
+
+
+def estimate_noise(values: np.ndarray) -> float:
+    """由一阶差分的中位数绝对偏差估计白噪声标准差（峰只占少数样本，不影响估计）"""
+    diff = np.diff(values)
+    if diff.size == 0:
+        return 0.0
+    mad = np.median(np.abs(diff - np.median(diff)))
+    return float(_MAD_TO_SIGMA * mad / np.sqrt(2.0))
+
+
+def rolling_baseline(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    滚动开运算基线
+
+    窗口内最小值滤波再最大值滤波得到贴着信号下沿的包络，再以同一窗口滑动平均去掉台阶，
+    最后整体上移到噪声中心
+    """
+    window = max(int(window), 3)
+    lower = ndimage.minimum_filter1d(values, size=window, mode="nearest")
+    opened = ndimage.maximum_filter1d(lower, size=window, mode="nearest")
+    smoothed = ndimage.uniform_filter1d(opened, size=window, mode="nearest")
+    # 开运算贴着噪声的下沿；峰只占少数样本，残差的中位数即噪声中心相对包络的偏移
+    return smoothed + np.median(values - smoothed)
+
+
+def _odd_window(points: int, minimum: int) -> int:
+    points = max(int(points), minimum)
+    return points if points % 2 else points + 1
+
+
+def _apex_offsets(values: np.ndarray, peaks: np.ndarray) -> np.ndarray:
+    """三点抛物线插值得到峰顶相对采样点的亚采样偏移（-0.5 ~ 0.5）"""
+    inner = (peaks > 0) & (peaks < values.size - 1)
+    offsets = np.zeros(peaks.size)
+    if inner.any():
+        p = peaks[inner]
+        left, center, right = values[p - 1], values[p], values[p + 1]
+        denominator = left - 2.0 * center + right
+        with np.errstate(divide="ignore", invalid="ignore"):
+            offset = np.where(denominator != 0, 0.5 * (left - right) / denominator, 0.0)
+        offsets[inner] = np.clip(offset, -0.5, 0.5)
+    return offsets
+
+
+def _integration_bounds(smoothed: np.ndarray, peaks: np.ndarray, level: float):
+    """
+    峰的积分起止点（样本下标）
+
+    从峰顶向两侧找到信号不高于 level 的第一个点；相邻峰的起止点不越过两峰间的谷点
+    """
+    n = smoothed.size
+    index = np.arange(n)
+    below = smoothed <= level
+    last_below = np.maximum.accumulate(np.where(below, index, 0))
+    next_below = np.minimum.accumulate(np.where(below, index, n - 1)[::-1])[::-1]
+    left = last_below[peaks]
+    right = next_below[peaks]
+
+    if peaks.size > 1:
+        # 标签 k（1起）覆盖 [peaks[k-1], peaks[k])，取每段的最小值位置即谷点
+        marks = np.zeros(n, dtype=np.int64)
+        marks[peaks] = 1
+        labels = np.cumsum(marks)
+        valleys = np.array(
+            ndimage.minimum_position(smoothed, labels=labels, index=np.arange(1, peaks.size)),
+            dtype=np.int64
+        ).reshape(-1)
+        left[1:] = np.maximum(left[1:], valleys)
+        right[:-1] = np.minimum(right[:-1], valleys)
+    return left, right
+
+
+def usp_resolution(retention_times: np.ndarray, half_widths: np.ndarray) -> np.ndarray:
+    """相邻峰的USP分离度（半峰宽法），长度为峰数-1"""
+    retention_times = np.asarray(retention_times, dtype=np.float64)
+    half_widths = np.asarray(half_widths, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return HALF_HEIGHT_RESOLUTION_CONSTANT * np.diff(retention_times) / (half_widths[1:] + half_widths[:-1])
+
+
+def process_chromatogram(
+    values: Union[Sequence[float], str, np.ndarray],
+    sample_rate_hz: float,
+    start_time: float = 0.0,
+    dtype: str = "float32",
+    baseline: str = "rolling",
+    baseline_window: float = 1.0,
+    smoothing: str = "savgol",
+    smooth_window: int = 11,
+    polyorder: int = 2,
+    min_snr: float = 3.0,
+    min_width: float = 0.0,
+    max_peaks: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    处理一条色谱信号：基线校正、平滑、峰检测、积分和系统适用性参数
+
+    参数：
+        values: 信号（数值列表、base64编码的小端二进制缓冲区或数组，可为内存映射数组）
+        sample_rate_hz: 采样频率(Hz)
+        start_time: 第一个采样点的保留时间(分钟)
+        dtype: 二进制缓冲区的数据类型
+        baseline: "rolling"（滚动开运算）或 "none"
+        baseline_window: 基线窗口(分钟)，应大于最宽的峰
+        smoothing: "savgol" 或 "none"
+        smooth_window: Savitzky-Golay 窗口（采样点数，取奇数）
+        polyorder: Savitzky-Golay 多项式阶数
+        min_snr: 峰的最小信噪比（显著性 / 噪声）
+        min_width: 最小半峰宽(分钟)
+        max_peaks: 最多保留的峰数（按显著性），默认 CHROMATOGRAM_MAX_PEAKS
+
+    返回：
+        与 analyze_chromatogram 相同的汇总字段，另含噪声、处理参数和每个峰的
+        起止时间、峰高、半峰宽、塔板数、拖尾因子、与前一峰的分离度
+    """
+    if baseline not in BASELINE_METHODS:
+        raise ValueError(f"不支持的基线校正方法：{baseline}，可选 {', '.join(BASELINE_METHODS)}")
+    if smoothing not in SMOOTHING_METHODS:
+        raise ValueError(f"不支持的平滑方法：{smoothing}，可选 {', '.join(SMOOTHING_METHODS)}")
+    if sample_rate_hz <= 0:
+        raise ValueError("采样频率必须大于0")
+    max_peaks = max_peaks or settings.CHROMATOGRAM_MAX_PEAKS
+
+    raw = np.asarray(as_trace_array(values, dtype), dtype=np.float64)
+    if raw.ndim != 1 or raw.size < 3:
+        raise ValueError("色谱信号至少需要3个采样点")
+    if not np.isfinite(raw).all():
+        raise ValueError("色谱信号包含NaN或无穷大")
+
+    dt = 1.0 / (sample_rate_hz * 60.0)  # 每个采样间隔的分钟数
+
+    if baseline == "rolling":
+        baseline_values = rolling_baseline(raw, _odd_window(round(baseline_window / dt), 3))
+        corrected = raw - baseline_values
+    else:
+        corrected = raw
+
+    if smoothing == "savgol":
+        window = min(_odd_window(smooth_window, polyorder + 2), raw.size if raw.size % 2 else raw.size - 1)
+        if window <= polyorder:
+            smoothed = corrected
+        else:
+            smoothed = sp_signal.savgol_filter(corrected, window, polyorder, mode="interp")
+    else:
+        smoothed = corrected
+
+    noise = estimate_noise(corrected)
+    threshold = min_snr * noise if noise > 0 else np.finfo(np.float64).eps * max(np.abs(smoothed).max(), 1.0)
+
+    peaks, properties = sp_signal.find_peaks(
+        smoothed,
+        height=threshold,
+        prominence=threshold,
+        width=max(min_width / dt, 1.0)
+    )
+    if peaks.size > max_peaks:
+        keep = np.sort(np.argsort(properties["prominences"])[::-1][:max_peaks])
+        peaks = peaks[keep]
+        properties = {key: value[keep] for key, value in properties.items()}
+
+    if peaks.size == 0:
+        peak_list: List[Dict[str, Any]] = []
+        retention = heights = areas = half_widths = np.empty(0)
+    else:
+        heights = smoothed[peaks]
+        left, right = _integration_bounds(smoothed, peaks, noise)
+
+        # USP：峰宽在基线以上峰高的一定比例处测量（而非相对突出度），且不越过积分边界（相邻峰的谷点）
+        height_data = (heights, left.astype(np.intp), right.astype(np.intp))
+        half_widths = sp_signal.peak_widths(smoothed, peaks, rel_height=0.5, prominence_data=height_data)[0] * dt
+        base_widths, _, base_left, _ = sp_signal.peak_widths(
+            smoothed, peaks, rel_height=0.95, prominence_data=height_data
+        )
+
+        apex = peaks + _apex_offsets(smoothed, peaks)
+        retention = start_time + apex * dt
+
+        cumulative = np.concatenate(([0.0], np.cumsum((corrected[1:] + corrected[:-1]) * (0.5 * dt))))
+        areas = cumulative[right] - cumulative[left]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            plates = HALF_HEIGHT_PLATE_CONSTANT * (retention / half_widths) ** 2
+            tailing = base_widths / (2.0 * (apex - base_left))
+        resolution = np.concatenate(([np.nan], usp_resolution(retention, half_widths)))
+        total = areas.sum()
+
+        peak_list = [
+            {
+                "retention_time": round(float(retention[i]), 4),
+                "start_time": round(float(start_time + left[i] * dt), 4),
+                "end_time": round(float(start_time + right[i] * dt), 4),
+                "height": round(float(heights[i]), 4),
+                "area": round(float(areas[i]), 4),
+                "percentage": round(float(areas[i] / total * 100), 2) if total > 0 else 0,
+                "width_half": round(float(half_widths[i]), 5),
+                "plates": round(float(plates[i]), 1) if np.isfinite(plates[i]) else None,
+                "tailing": round(float(tailing[i]), 3) if np.isfinite(tailing[i]) else None,
+                "resolution": round(float(resolution[i]), 3) if np.isfinite(resolution[i]) else None,
+                "snr": round(float(heights[i] / noise), 1) if noise > 0 else None
+            }
+            for i in range(peaks.size)
+        ]
+
+    total_area = float(areas.sum()) if peaks.size else 0.0
+    main = int(np.argmax(areas)) if peaks.size else None
+    resolutions = [peak["resolution"] for peak in peak_list[1:] if peak["resolution"] is not None]
+
+    return {
+        "num_peaks": len(peak_list),
+        "main_peak_retention_time": peak_list[main]["retention_time"] if main is not None else None,
+        "main_peak_area": peak_list[main]["area"] if main is not None else None,
+        "total_area": round(total_area, 4),
+        "purity_percentage": round(float(areas[main] / total_area * 100), 2) if main is not None and total_area > 0 else 0,
+        "average_resolution": round(float(np.mean(resolutions)), 3) if resolutions else 0,
+        "min_resolution": round(float(np.min(resolutions)), 3) if resolutions else None,
+        "noise": noise,
+        "num_samples": int(raw.size),
+        "duration_min": round((raw.size - 1) * dt, 4),
+        "processing": {
+            "baseline": baseline,
+            "baseline_window": baseline_window,
+            "smoothing": smoothing,
+            "smooth_window": smooth_window,
+            "polyorder": polyorder,
+            "min_snr": min_snr,
+            "min_width": min_width
+        },
+        "peaks": peak_list
+    }
@@ -0,0 +1,233 @@
+"""
+色谱批量分析模块
+
+质控序列一次产生数百个色谱运行。批量分析把运行按顺序分成若干块，
+同时提交到批量工作池（进程池），每个工作进程逐个调用 process_chromatogram，
+吞吐量随工作进程数增加；已上传的信号只传递文件路径，在工作进程中以内存映射打开。
+
+跨运行汇总按目标保留时间匹配各运行中的峰（窗口内距离最近的峰）：
+- 保留时间：均值、标准差、极差、漂移（最后一个运行减第一个运行）和逐运行斜率
+- 峰面积：均值、标准差、RSD%
+未给出目标保留时间时以各运行的主峰（面积最大的峰）汇总。
+峰的匹配在工作进程中完成，只有汇总字段和匹配到的峰返回主进程。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import HPLCAnalysis
+from app.services import trace_store
+from app.services.chromatogram import process_chromatogram
+from app.services.trace_integration import SUPPORTED_DTYPES
+
+
+async def resolve_runs(db: AsyncSession, runs: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    把请求中的运行整理为工作进程可直接处理的描述
+
+    参数：
+        runs: [{"analysis_id"} 或 {"signal", "sample_rate_hz", "start_time", "dtype"}，可带 "name"]
+
+    返回：
+        与输入顺序一致的描述；已上传的信号替换为文件路径和元数据，
+        无效的运行（未给出信号、记录不存在或未上传信号）为 {"name", "error"}
+    """
+    ids = {run["analysis_id"] for run in runs if run.get("analysis_id") is not None}
+    traces = {}
+    if ids:
+        rows = await db.execute(
+            select(HPLCAnalysis.id, HPLCAnalysis.raw_data).where(HPLCAnalysis.id.in_(ids))
+        )
+        traces = {row.id: (row.raw_data or {}).get("trace") for row in rows}
+
+    resolved = []
+    for run in runs:
+        analysis_id = run.get("analysis_id")
+        name = run.get("name")
+        if analysis_id is not None:
+            meta = traces.get(analysis_id)
+            if meta is None:
+                resolved.append({"name": name, "error": f"分析记录 {analysis_id} 不存在或未上传信号"})
+                continue
+            resolved.append({
+                "name": name if name is not None else analysis_id,
+                "path": trace_store.trace_path(meta),
+                "dtype": meta["dtype"],
+                "num_samples": meta["num_samples"],
+                "sample_rate_hz": meta["sample_rate_hz"],
+                "start_time": meta["start_time"]
+            })
+        elif run.get("signal") is None:
+            resolved.append({"name": name, "error": "每个运行需给出 analysis_id 或 signal"})
+        elif run.get("sample_rate_hz") is None:
+            resolved.append({"name": name, "error": "内联信号需给出 sample_rate_hz"})
+        else:
+            resolved.append({
+                "name": name,
+                "signal": run["signal"],
+                "dtype": run.get("dtype", "float32"),
+                "sample_rate_hz": run["sample_rate_hz"],
+                "start_time": run.get("start_time", 0.0)
+            })
+    return resolved
+
+
+def _match_targets(
+    peaks: List[Dict[str, Any]],
+    targets: Optional[Sequence[float]],
+    rt_window: float
+) -> List[Optional[Dict[str, float]]]:
+    """每个目标保留时间在窗口内距离最近的峰；未给出目标时返回主峰"""
+    if not peaks:
+        return [None] * (len(targets) if targets else 1)
+    if not targets:
+        main = max(peaks, key=lambda peak: peak["area"])
+        return [{"retention_time": main["retention_time"], "area": main["area"]}]
+
+    retention = np.array([peak["retention_time"] for peak in peaks])
+    distance = np.abs(retention[None, :] - np.asarray(targets, dtype=np.float64)[:, None])
+    nearest = np.argmin(distance, axis=1)
+    return [
+        {"retention_time": peaks[i]["retention_time"], "area": peaks[i]["area"]}
+        if distance[j, i] <= rt_window else None
+        for j, i in enumerate(nearest)
+    ]
+
+
+def analyze_runs(
+    runs: Sequence[Dict[str, Any]],
+    options: Dict[str, Any],
+    targets: Optional[Sequence[float]] = None,
+    rt_window: float = 0.2,
+    include_peaks: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    处理一块运行（在工作进程中调用）
+
+    返回：
+        每个运行 {"success": True, "name", "data": 汇总字段 + matched_peaks} 或
+        {"success": False, "name", "error"}；data 中的 peaks 仅在 include_peaks 时保留
+    """
+    results = []
+    for run in runs:
+        if "error" in run:
+            results.append({"name": run["name"], "success": False, "error": run["error"]})
+            continue
+        try:
+            if "path" in run:
+                values = np.memmap(
+                    run["path"], dtype=SUPPORTED_DTYPES[run["dtype"]], mode="r", shape=(run["num_samples"],)
+                )
+            else:
+                values = run["signal"]
+            data = process_chromatogram(
+                values,
+                run["sample_rate_hz"],
+                start_time=run["start_time"],
+                dtype=run["dtype"],
+                **options
+            )
+        except (ValueError, OSError) as e:
+            results.append({"name": run["name"], "success": False, "error": str(e)})
+            continue
+
+        data["matched_peaks"] = _match_targets(data["peaks"], targets, rt_window)
+        if not include_peaks:
+            del data["peaks"]
+        results.append({"name": run["name"], "success": True, "data": data})
+    return results
+
+
+def _stats(values: np.ndarray) -> Dict[str, Optional[float]]:
+    mean = float(values.mean())
+    sd = float(values.std(ddof=1)) if values.size > 1 else None
+    return {
+        "mean": round(mean, 4),
+        "sd": round(sd, 4) if sd is not None else None,
+        "rsd": round(sd / mean * 100, 3) if sd is not None and mean != 0 else None
+    }
+
+
+def aggregate_runs(results: Sequence[Dict[str, Any]], targets: Optional[Sequence[float]] = None) -> Dict[str, Any]:
+    """
+    跨运行汇总
+
+    返回：
+        {"targets": [每个目标的 found/missing、保留时间统计和漂移、面积统计和RSD], "total_area": 统计}
+        运行序号为在请求中的位置
+    """
+    succeeded = [(index, item["data"]) for index, item in enumerate(results) if item["success"]]
+    summaries = []
+    for j, target in enumerate(targets or [None]):
+        found = [(index, data["matched_peaks"][j]) for index, data in succeeded if data["matched_peaks"][j]]
+        summary: Dict[str, Any] = {
+            "target_retention_time": target,
+            "found": len(found),
+            "missing_runs": [index for index, data in succeeded if not data["matched_peaks"][j]]
+        }
+        if found:
+            order = np.array([index for index, _ in found], dtype=np.float64)
+            retention = np.array([peak["retention_time"] for _, peak in found])
+            areas = np.array([peak["area"] for _, peak in found])
+            rt_stats = _stats(retention)
+            summary["retention_time"] = {
+                "mean": rt_stats["mean"],
+                "sd": rt_stats["sd"],
+                "min": round(float(retention.min()), 4),
+                "max": round(float(retention.max()), 4),
+                "range": round(float(retention.max() - retention.min()), 4),
+                "drift": round(float(retention[-1] - retention[0]), 4),
+                "slope_per_run": round(float(np.polyfit(order, retention, 1)[0]), 6) if len(found) > 1 else None
+            }
+            summary["area"] = _stats(areas)
+        summaries.append(summary)
+
+    totals = np.array([data["total_area"] for _, data in succeeded])
+    return {
+        "targets": summaries,
+        "total_area": _stats(totals) if totals.size else None
+    }
+
+
+async def analyze_batch(
+    runs: Sequence[Dict[str, Any]],
+    options: Dict[str, Any],
+    run: Callable[..., Awaitable[Any]],
+    workers: int = 1,
+    targets: Optional[Sequence[float]] = None,
+    rt_window: float = 0.2,
+    include_peaks: bool = False
+) -> Dict[str, Any]:
+    """
+    并行处理一批运行并汇总
+
+    参数：
+        runs: resolve_runs 的结果
+        options: process_chromatogram 的处理参数
+        run: 在工作池中执行函数的协程函数，如 functools.partial(batch_pool.run, limit=False)
+        workers: 分块数（工作进程数），各块同时提交
+
+    返回：
+        {"total", "succeeded", "failed", "results": [{"index", "name", "success", "data"|"error"}], "aggregates"}
+    """
+    size = max(1, -(-len(runs) // max(1, workers)))
+    chunks = [runs[start:start + size] for start in range(0, len(runs), size)]
+    processed = await asyncio.gather(*(
+        run(analyze_runs, chunk, options, targets, rt_window, include_peaks) for chunk in chunks
+    ))
+
+    results = [
+        {"index": index, **item}
+        for index, item in enumerate(item for chunk in processed for item in chunk)
+    ]
+    succeeded = sum(1 for item in results if item["success"])
+    return {
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results,
+        "aggregates": aggregate_runs(results, targets)
+    }
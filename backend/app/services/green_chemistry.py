@@ -2,9 +2,11 @@
 绿色化学分析核心模块
 """
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from dataclasses import dataclass
 
+from app.services.chromatogram import usp_resolution
+
 
 @dataclass
 class SolventProperties:
@@ -27,6 +29,47 @@ SOLVENT_DATABASE = {
     "异丙醇": SolventProperties("异丙醇", 4.5, 3.0, 4.5, 8.0),
 }
 
+# 溶剂数据库中没有的溶剂按中等水平（5.0）计算
+DEFAULT_SOLVENT_PROPERTIES = SolventProperties("", 5.0, 5.0, 5.0, 5.0)
+
+
+def _green_scores(
+    props_a: np.ndarray,
+    props_b: np.ndarray,
+    ratio_a: Any,
+    volumes: Any
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    综合绿色评分（overall_green_score），单点、批量和网格计算共用
+    
+    Args:
+        props_a / props_b: 溶剂A/B的属性，最后一维为 [危险性, 环境影响, 健康危害, 可回收性]
+        ratio_a: 溶剂A的比例（0-1），与属性去掉最后一维后的形状广播
+        volumes: 总体积（mL），与加权属性去掉最后一维后的形状广播
+    
+    Returns:
+        (加权平均属性, 评分)；评分用 np.round 保留两位小数，
+        恰好在两个候选值中间的数与内置 round 可能相差0.01
+    """
+    ratio_a = np.asarray(ratio_a, dtype=np.float64)[..., None]
+    weighted = ratio_a * props_a + (1 - ratio_a) * props_b
+    hazard, environmental, health, recyclability = np.moveaxis(weighted, -1, 0)
+    
+    # 体积惩罚（使用越多越不环保），最大2倍惩罚
+    volume_penalty = np.minimum(np.asarray(volumes, dtype=np.float64) / 100, 2.0)
+    
+    # 综合评分（0-100，100为最绿色）
+    green_score = 100 - (
+        (hazard * 0.3 + environmental * 0.3 + health * 0.2) * 10 * volume_penalty
+        - recyclability * 0.2 * 10
+    )
+    return weighted, np.round(np.clip(green_score, 0, 100), 2)
+
+
+def _properties(props: SolventProperties) -> Tuple[float, float, float, float]:
+    """[危险性, 环境影响, 健康危害, 可回收性]"""
+    return (props.hazard_score, props.environmental_impact, props.health_hazard, props.recyclability)
+
 
 class GreenChemistryAnalyzer:
     """绿色化学分析器"""
@@ -39,8 +82,9 @@ class GreenChemistryAnalyzer:
         solvent_a: str,
         solvent_b: str,
         ratio_a: float = 0.5,
-        volume_ml: float = 1.0
-    ) -> Dict[str, float]:
+        volume_ml: float = 1.0,
+        strict: bool = False
+    ) -> Dict[str, Any]:
         """
         计算溶剂系统的绿色化学评分
         
@@ -49,41 +93,159 @@ class GreenChemistryAnalyzer:
             solvent_b: 溶剂B名称
             ratio_a: 溶剂A的比例（0-1）
             volume_ml: 总体积（mL）
+            strict: 溶剂不在数据库中时报错，而不是按默认值（5.0）计算
         
         Returns:
-            包含各项评分的字典
+            包含各项评分的字典，unknown_solvents 列出按默认值计算的溶剂
         """
-        ratio_b = 1 - ratio_a
-        
         # 获取溶剂属性
-        props_a = self.solvent_db.get(solvent_a, SolventProperties(solvent_a, 5.0, 5.0, 5.0, 5.0))
-        props_b = self.solvent_db.get(solvent_b, SolventProperties(solvent_b, 5.0, 5.0, 5.0, 5.0))
+        unknown = [name for name in dict.fromkeys((solvent_a, solvent_b)) if name not in self.solvent_db]
+        if unknown and strict:
+            raise ValueError(f"溶剂数据库中没有：{', '.join(unknown)}（可选 {', '.join(self.solvent_db)}）")
+        props_a = self.solvent_db.get(solvent_a, DEFAULT_SOLVENT_PROPERTIES)
+        props_b = self.solvent_db.get(solvent_b, DEFAULT_SOLVENT_PROPERTIES)
         
         # 加权平均计算
-        hazard = ratio_a * props_a.hazard_score + ratio_b * props_b.hazard_score
-        environmental = ratio_a * props_a.environmental_impact + ratio_b * props_b.environmental_impact
-        health = ratio_a * props_a.health_hazard + ratio_b * props_b.health_hazard
-        recyclability = ratio_a * props_a.recyclability + ratio_b * props_b.recyclability
-        
-        # 体积惩罚（使用越多越不环保）
-        volume_penalty = min(volume_ml / 100, 2.0)  # 最大2倍惩罚
-        
-        # 综合评分（0-100，100为最绿色）
-        green_score = 100 - (
-            (hazard * 0.3 + environmental * 0.3 + health * 0.2) * 10 * volume_penalty
-            - recyclability * 0.2 * 10
+        weighted, green_score = _green_scores(
+            np.array(_properties(props_a)), np.array(_properties(props_b)), ratio_a, volume_ml
         )
-        green_score = max(0, min(100, green_score))
+        hazard, environmental, health, recyclability = weighted.tolist()
+        volume_penalty = min(volume_ml / 100, 2.0)
         
         return {
             "hazard_score": round(10 - hazard, 2),
             "environmental_score": round(10 - environmental, 2),
             "health_score": round(10 - health, 2),
             "recyclability_score": round(recyclability, 2),
-            "overall_green_score": round(green_score, 2),
-            "volume_penalty": round(volume_penalty, 2)
+            "overall_green_score": float(green_score),
+            "volume_penalty": round(volume_penalty, 2),
+            "unknown_solvents": unknown
         }
     
+    def calculate_solvent_scores_batch(
+        self,
+        solvents_a: List[str],
+        solvents_b: List[str],
+        ratio_a: float = 0.5,
+        volumes_ml: Optional[List[float]] = None
+    ) -> List[float]:
+        """
+        批量计算溶剂系统的综合绿色评分（overall_green_score）
+        
+        公式与 calculate_solvent_score 相同，按数组一次计算
+        
+        Args:
+            solvents_a: 各条记录的溶剂A名称
+            solvents_b: 各条记录的溶剂B名称
+            ratio_a: 溶剂A的比例（0-1）
+            volumes_ml: 各条记录的总体积（mL），默认均为1.0
+        
+        Returns:
+            各条记录的综合评分（保留两位小数）
+        """
+        def properties(names: List[str]) -> np.ndarray:
+            # 每种溶剂只查一次：(n, 4) 的 [危险性, 环境影响, 健康危害, 可回收性]
+            table = {name: _properties(self.solvent_db.get(name, DEFAULT_SOLVENT_PROPERTIES)) for name in set(names)}
+            return np.array([table[name] for name in names], dtype=np.float64).reshape(len(names), 4)
+        
+        volumes = np.ones(len(solvents_a)) if volumes_ml is None else np.asarray(volumes_ml, dtype=np.float64)
+        _, green_score = _green_scores(properties(solvents_a), properties(solvents_b), ratio_a, volumes)
+        return green_score.tolist()
+    
+    def calculate_solvent_score_grid(
+        self,
+        solvents: Optional[Sequence[str]] = None,
+        ratios: Optional[Sequence[float]] = None,
+        volumes_ml: Sequence[float] = (1.0,),
+        top: int = 20,
+        include_matrix: bool = True
+    ) -> Dict[str, Any]:
+        """
+        在 溶剂对 × A比例 × 体积 网格上计算综合绿色评分（overall_green_score）
+        
+        公式与 calculate_solvent_score 相同。四项属性对比例是线性的，
+        整个网格按 (溶剂对, 比例, 体积) 广播一次计算。
+        (A, B, r) 与 (B, A, 1-r) 相同，因此只取 A 在 B 之前的无序溶剂对，比例覆盖0-1即可。
+        
+        Args:
+            solvents: 参与组合的溶剂，默认为溶剂数据库中的全部溶剂
+            ratios: 溶剂A的比例网格（0-1），默认 0, 0.01, ..., 1
+            volumes_ml: 总体积网格（mL）
+            top: 排名表返回的组合数
+            include_matrix: 是否返回完整的评分矩阵
+        
+        Returns:
+            {"solvents", "pairs": [[A, B]], "ratios", "volumes_ml",
+             "ranking": 评分从高到低的前 top 个组合（同分按网格顺序）,
+             "pair_matrix": 溶剂×溶剂 的最高评分（对角线为 None），
+             "matrix": [体积][溶剂对][比例] 的评分（热图数据）}
+        """
+        solvents = list(dict.fromkeys(self.solvent_db if solvents is None else solvents))
+        unknown = [name for name in solvents if name not in self.solvent_db]
+        if unknown:
+            raise ValueError(f"溶剂数据库中没有：{', '.join(unknown)}（可选 {', '.join(self.solvent_db)}）")
+        if len(solvents) < 2:
+            raise ValueError("至少需要2种溶剂")
+        
+        ratio_a = np.arange(101) / 100 if ratios is None else np.asarray(ratios, dtype=np.float64)
+        volumes = np.asarray(volumes_ml, dtype=np.float64)
+        if ratio_a.size == 0 or volumes.size == 0:
+            raise ValueError("比例和体积网格不能为空")
+        if ((ratio_a < 0) | (ratio_a > 1)).any():
+            raise ValueError("溶剂A的比例必须在0-1之间")
+        if (volumes <= 0).any():
+            raise ValueError("体积必须大于0")
+        
+        # (S, 4) 的 [危险性, 环境影响, 健康危害, 可回收性]
+        props = np.array([_properties(self.solvent_db[name]) for name in solvents])
+        first, second = np.triu_indices(len(solvents), k=1)
+        
+        # 加权属性 (P, R, 4)，评分 (V, P, R)
+        _, green_score = _green_scores(
+            props[first][:, None, :], props[second][:, None, :], ratio_a, volumes[:, None, None]
+        )
+        
+        # 排名：argpartition 取前 top 个，分界分数上的同分组合按网格顺序截取，结果确定
+        flat = green_score.ravel()
+        top = min(max(top, 0), flat.size)
+        if top:
+            threshold = flat[np.argpartition(flat, flat.size - top)[flat.size - top]]
+            above = np.flatnonzero(flat > threshold)
+            tied = np.flatnonzero(flat == threshold)[:top - above.size]
+            selected = np.concatenate((above, tied))
+            selected = selected[np.lexsort((selected, -flat[selected]))]
+        else:
+            selected = np.empty(0, dtype=np.intp)
+        volume_index, pair_index, ratio_index = np.unravel_index(selected, green_score.shape)
+        ranking = [
+            {
+                "solvent_a": solvents[first[p]],
+                "solvent_b": solvents[second[p]],
+                "ratio_a": float(ratio_a[r]),
+                "volume_ml": float(volumes[v]),
+                "overall_green_score": float(flat[i])
+            }
+            for i, v, p, r in zip(selected, volume_index, pair_index, ratio_index)
+        ]
+        
+        pair_best = green_score.max(axis=(0, 2))
+        pair_matrix = np.full((len(solvents), len(solvents)), np.nan)
+        pair_matrix[first, second] = pair_best
+        pair_matrix[second, first] = pair_best
+        
+        result = {
+            "solvents": solvents,
+            "pairs": [[solvents[i], solvents[j]] for i, j in zip(first, second)],
+            "ratios": ratio_a.tolist(),
+            "volumes_ml": volumes.tolist(),
+            "num_combinations": int(flat.size),
+            "ranking": ranking,
+            "pair_matrix": [[None if np.isnan(value) else float(value) for value in row] for row in pair_matrix]
+        }
+        if include_matrix:
+            result["matrix"] = green_score.tolist()
+        return result
+    
     def calculate_eco_scale(
         self,
         yield_percentage: float,
@@ -163,7 +325,8 @@ class GreenChemistryAnalyzer:
     def analyze_chromatogram(
         self,
         retention_times: List[float],
-        peak_areas: List[float]
+        peak_areas: List[float],
+        peak_widths: Optional[List[float]] = None
     ) -> Dict[str, any]:
         """
         分析色谱图数据
@@ -171,12 +334,16 @@ class GreenChemistryAnalyzer:
         Args:
             retention_times: 保留时间列表
             peak_areas: 峰面积列表
+            peak_widths: 半峰宽列表（可选）；给出时分辨率按USP半峰宽法计算，
+                否则为相邻峰的保留时间差。原始信号请使用 chromatogram.process_chromatogram
         
         Returns:
             分析结果
         """
         if len(retention_times) != len(peak_areas):
             raise ValueError("保留时间和峰面积数量不匹配")
+        if peak_widths is not None and len(peak_widths) != len(retention_times):
+            raise ValueError("保留时间和半峰宽数量不匹配")
         
         rt_array = np.array(retention_times)
         area_array = np.array(peak_areas)
@@ -191,10 +358,10 @@ class GreenChemistryAnalyzer:
         purity = (main_peak_area / total_area * 100) if total_area > 0 else 0
         
         # 分辨率计算（相邻峰）
-        resolutions = []
-        for i in range(len(rt_array) - 1):
-            res = abs(rt_array[i+1] - rt_array[i])
-            resolutions.append(res)
+        if peak_widths is not None:
+            resolutions = [float(res) for res in usp_resolution(rt_array, peak_widths) if np.isfinite(res)]
+        else:
+            resolutions = [abs(rt_array[i+1] - rt_array[i]) for i in range(len(rt_array) - 1)]
         
         return {
             "num_peaks": len(retention_times),
@@ -0,0 +1,284 @@
+"""
+方法数据存储模块
+
+桌面端原先把方法、因子、梯度等全部数据放在一个 app_data.json 中，每次保存都整体重写。
+这里改为每条记录一行（method_records 表），按 (collection, key) 单独写入：
+
+- version：该记录的修改次数。写入时可带上客户端所见的版本（base_version），
+  与库中不一致说明其他客户端已修改过，返回冲突而不是静默覆盖
+- revision：全局递增的修订号，每次变更分配一个新值。客户端记住上次同步到的修订号，
+  下次只拉取 revision 更大的记录（含删除标记），不再传输整个数据集
+
+修订号由 store_counters 表中的计数器分配（UPDATE ... RETURNING），
+计数器行在提交前一直持有写锁，因此修订号的提交顺序与分配顺序一致，增量拉取不会漏掉变更。
+
+读取现有记录时还未持有写锁，期间其他请求可能已写入同一记录：更新带上读到的版本作为条件，
+插入依赖 (collection, key) 唯一约束，未写入的变更按冲突返回，不会覆盖其他客户端的修改。
+"""
+import json
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.database.models import MethodRecord, StoreCounter
+
+
+STORE_COLLECTIONS = ("methods", "factors", "gradients")
+REVISION_COUNTER = "method_records"
+
+RECORD_COLUMNS = (
+    MethodRecord.collection,
+    MethodRecord.key,
+    MethodRecord.data,
+    MethodRecord.deleted,
+    MethodRecord.version,
+    MethodRecord.revision,
+    MethodRecord.updated_at
+)
+
+
+def _record_dict(row) -> Dict[str, Any]:
+    item = {column.key: getattr(row, column.key) for column in RECORD_COLUMNS}
+    item["updated_at"] = item["updated_at"].isoformat() if item["updated_at"] else None
+    return item
+
+
+def validate_change(change: Dict[str, Any]) -> None:
+    """
+    校验一条变更 {"collection", "key", "data", "deleted", "base_version"}
+
+    异常：
+        ValueError: 集合未知、键为空或数据超出 METHOD_STORE_MAX_RECORD_BYTES
+    """
+    if change["collection"] not in STORE_COLLECTIONS:
+        raise ValueError(f"未知的数据集合：{change['collection']}（可选 {', '.join(STORE_COLLECTIONS)}）")
+    if not change["key"]:
+        raise ValueError("记录键不能为空")
+    if not change.get("deleted"):
+        size = len(json.dumps(change.get("data"), ensure_ascii=False).encode("utf-8"))
+        if size > settings.METHOD_STORE_MAX_RECORD_BYTES:
+            raise ValueError(
+                f"记录 {change['collection']}/{change['key']} 的数据为 {size} 字节，"
+                f"超过上限 {settings.METHOD_STORE_MAX_RECORD_BYTES} 字节"
+            )
+
+
+async def _allocate_revisions(db: AsyncSession, count: int) -> int:
+    """分配 count 个连续的修订号，返回第一个"""
+    stmt = (
+        update(StoreCounter)
+        .where(StoreCounter.name == REVISION_COUNTER)
+        .values(value=StoreCounter.value + count)
+        .returning(StoreCounter.value)
+    )
+    last = (await db.execute(stmt)).scalar_one_or_none()
+    if last is None:
+        # 首次写入时创建计数器；并发创建失败的一方回退到UPDATE
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(StoreCounter).values(name=REVISION_COUNTER, value=count))
+            last = count
+        except IntegrityError:
+            last = (await db.execute(stmt)).scalar_one()
+    return last - count + 1
+
+
+def _conflict(identity, current) -> Dict[str, Any]:
+    return {
+        "collection": identity[0],
+        "key": identity[1],
+        "success": False,
+        "conflict": True,
+        "current": _record_dict(current) if current is not None else None
+    }
+
+
+async def _current_record(db: AsyncSession, identity):
+    return (await db.execute(
+        select(*RECORD_COLUMNS).where(MethodRecord.collection == identity[0], MethodRecord.key == identity[1])
+    )).first()
+
+
+async def _write_change(db: AsyncSession, change: Dict[str, Any], current, values: Dict[str, Any]) -> Optional[int]:
+    """
+    写入一条变更，返回写入后的版本；未写入时返回 None
+
+    更新以读取时的版本为条件（base_version 为 None 时不检查版本，版本在库中加1）；
+    插入在保存点内进行，并发插入同一记录违反唯一约束时回滚保存点
+    """
+    if current is None:
+        try:
+            async with db.begin_nested():
+                await db.execute(
+                    insert(MethodRecord).values(collection=change["collection"], key=change["key"], version=1, **values)
+                )
+        except IntegrityError:
+            return None
+        return 1
+
+    stmt = update(MethodRecord).where(MethodRecord.id == current.id)
+    if change.get("base_version") is not None:
+        stmt = stmt.where(MethodRecord.version == current.version)
+    stmt = stmt.values(version=MethodRecord.version + 1, **values).returning(MethodRecord.version)
+    return (await db.execute(stmt.execution_options(synchronize_session=False))).scalar_one_or_none()
+
+
+async def apply_changes(db: AsyncSession, changes: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    在一个事务中写入一组变更（逐条插入/更新，删除只打标记）
+
+    参数：
+        changes: [{"collection", "key", "data", "deleted", "base_version"}]，
+                 base_version 为 None 时不检查版本（后写覆盖），0 表示记录应当不存在
+
+    返回：
+        与输入顺序一致的结果：
+        - 成功：{"collection", "key", "success": True, "changed", "version", "revision", "deleted"}
+          （内容与库中相同或删除不存在的记录时 changed 为 False，不分配新修订号）
+        - 冲突：{"collection", "key", "success": False, "conflict": True, "current": 库中的记录或None}
+          （包括读取之后被其他请求抢先写入的记录，以及并发首次写入同一记录时后到的一方）
+
+    异常：
+        ValueError: 变更无效（见 validate_change）或同一记录在一次请求中出现多次
+    """
+    seen = set()
+    for change in changes:
+        validate_change(change)
+        identity = (change["collection"], change["key"])
+        if identity in seen:
+            raise ValueError(f"同一记录在一次请求中出现多次：{identity[0]}/{identity[1]}")
+        seen.add(identity)
+
+    if not changes:
+        return []
+
+    rows = await db.execute(
+        select(MethodRecord.id, *RECORD_COLUMNS)
+        .where(tuple_(MethodRecord.collection, MethodRecord.key).in_(list(seen)))
+    )
+    existing = {(row.collection, row.key): row for row in rows}
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(changes)
+    pending = []
+    for position, change in enumerate(changes):
+        identity = (change["collection"], change["key"])
+        current = existing.get(identity)
+        current_version = current.version if current is not None else 0
+        base_version = change.get("base_version")
+        deleted = bool(change.get("deleted"))
+        outcome = {"collection": identity[0], "key": identity[1]}
+
+        if base_version is not None and base_version != current_version:
+            outcome = _conflict(identity, current)
+        elif (
+            (deleted and (current is None or current.deleted))
+            or (not deleted and current is not None and not current.deleted and current.data == change.get("data"))
+        ):
+            outcome.update(
+                success=True,
+                changed=False,
+                version=current_version,
+                revision=current.revision if current is not None else None,
+                deleted=deleted
+            )
+        else:
+            pending.append((position, change, current))
+            continue
+        results[position] = outcome
+
+    if pending:
+        revision = await _allocate_revisions(db, len(pending))
+        for offset, (position, change, current) in enumerate(pending):
+            identity = (change["collection"], change["key"])
+            deleted = bool(change.get("deleted"))
+            values = {
+                "data": None if deleted else change.get("data"),
+                "deleted": deleted,
+                "revision": revision + offset
+            }
+            version = await _write_change(db, change, current, values)
+            if version is None:
+                results[position] = _conflict(identity, await _current_record(db, identity))
+                continue
+            results[position] = {
+                "collection": identity[0],
+                "key": identity[1],
+                "success": True,
+                "changed": True,
+                "version": version,
+                "revision": values["revision"],
+                "deleted": deleted
+            }
+
+    await db.commit()
+    return results
+
+
+async def get_record(db: AsyncSession, collection: str, key: str) -> Optional[Dict[str, Any]]:
+    """获取单条记录（已删除的记录返回 None）"""
+    row = (await db.execute(
+        select(*RECORD_COLUMNS).where(
+            MethodRecord.collection == collection,
+            MethodRecord.key == key,
+            MethodRecord.deleted.is_(False)
+        )
+    )).first()
+    return _record_dict(row) if row is not None else None
+
+
+async def list_records(db: AsyncSession, collection: str) -> List[Dict[str, Any]]:
+    """列出集合中未删除的全部记录（按键排序）"""
+    if collection not in STORE_COLLECTIONS:
+        raise ValueError(f"未知的数据集合：{collection}（可选 {', '.join(STORE_COLLECTIONS)}）")
+    rows = await db.execute(
+        select(*RECORD_COLUMNS)
+        .where(MethodRecord.collection == collection, MethodRecord.deleted.is_(False))
+        .order_by(MethodRecord.key)
+    )
+    return [_record_dict(row) for row in rows]
+
+
+async def changes_since(
+    db: AsyncSession,
+    since: int = 0,
+    limit: Optional[int] = None,
+    collections: Optional[Sequence[str]] = None,
+    exclude_revisions: Sequence[int] = ()
+) -> Dict[str, Any]:
+    """
+    拉取修订号大于 since 的变更（按修订号升序）
+
+    参数：
+        since: 客户端上次同步到的修订号；0 表示首次同步，只返回未删除的记录
+        limit: 每页最大条数，默认 METHOD_STORE_SYNC_PAGE_SIZE
+        collections: 只拉取这些集合
+        exclude_revisions: 不返回的修订号（同一请求中客户端刚上传的变更）
+
+    返回：
+        {"changes": [...], "revision": 下次同步传入的 since, "has_more": 是否还有下一页}
+    """
+    limit = limit or settings.METHOD_STORE_SYNC_PAGE_SIZE
+    for collection in collections or ():
+        if collection not in STORE_COLLECTIONS:
+            raise ValueError(f"未知的数据集合：{collection}（可选 {', '.join(STORE_COLLECTIONS)}）")
+
+    stmt = select(*RECORD_COLUMNS).where(MethodRecord.revision > since)
+    if since <= 0:
+        stmt = stmt.where(MethodRecord.deleted.is_(False))
+    if collections:
+        stmt = stmt.where(MethodRecord.collection.in_(list(collections)))
+    if exclude_revisions:
+        stmt = stmt.where(MethodRecord.revision.not_in(list(exclude_revisions)))
+
+    # 多取一条判断是否还有下一页
+    rows = (await db.execute(stmt.order_by(MethodRecord.revision).limit(limit + 1))).all()
+    changes = [_record_dict(row) for row in rows[:limit]]
+    has_more = len(rows) > limit
+
+    revision = changes[-1]["revision"] if changes else since
+    if not has_more:
+        revision = max([revision, *exclude_revisions])
+    return {"changes": changes, "revision": revision, "has_more": has_more}
@@ -0,0 +1,187 @@
+"""
+试剂库索引模块
+
+试剂库（reagents 表）在启动时一次性加载为内存索引，评分请求可以只给出试剂名称，
+或在 reagents 字段中按 ID/名称引用试剂库条目，由服务端补全密度和9个小因子，
+请求中不必再为甲醇、乙腈、水等常用试剂重复携带完整的因子矩阵。
+
+- 名称和别名不区分大小写（casefold）
+- 请求中显式给出的 densities / factor_matrix 优先于试剂库
+- 索引为不可变快照，增删条目时整体替换（写时复制），读取方无需加锁
+
+补全在主进程的请求解析阶段完成，工作进程池收到的已是完整的评分参数。
+"""
+import threading
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, NamedTuple, Optional, Sequence, Tuple, Union
+
+from app.services.scoring_engine import SUB_FACTOR_NAMES
+
+
+ReagentRef = Union[int, str]
+
+
+class ReagentEntry(NamedTuple):
+    """试剂库中的一个试剂"""
+    id: int
+    name: str
+    aliases: Tuple[str, ...]
+    density: float
+    factors: Mapping[str, float]  # 只读，按 SUB_FACTOR_NAMES 顺序
+
+
+def validate_reagent(name: str, density: float, factors: Mapping[str, float]) -> Dict[str, float]:
+    """
+    校验试剂数据：名称非空、密度为正、9个小因子齐全且在 [0, 1] 内
+
+    返回：
+        Dict[str, float]: 按 SUB_FACTOR_NAMES 顺序整理后的因子
+    """
+    if not name or not name.strip():
+        raise ValueError("试剂名称不能为空")
+    if not density > 0:
+        raise ValueError(f"试剂 {name} 的密度必须大于0")
+
+    missing = [factor for factor in SUB_FACTOR_NAMES if factor not in factors]
+    if missing:
+        raise ValueError(f"试剂 {name} 缺少因子：{', '.join(missing)}")
+    unknown = [factor for factor in factors if factor not in SUB_FACTOR_NAMES]
+    if unknown:
+        raise ValueError(f"试剂 {name} 包含未知因子：{', '.join(unknown)}")
+
+    cleaned = {factor: float(factors[factor]) for factor in SUB_FACTOR_NAMES}
+    for factor, value in cleaned.items():
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f"试剂 {name} 的因子 {factor}={value} 超出范围 [0, 1]")
+    return cleaned
+
+
+def make_entry(
+    reagent_id: int,
+    name: str,
+    density: float,
+    factors: Mapping[str, float],
+    aliases: Optional[Sequence[str]] = None
+) -> ReagentEntry:
+    """构建索引条目（校验并冻结因子）"""
+    cleaned = validate_reagent(name, density, factors)
+    return ReagentEntry(
+        id=reagent_id,
+        name=name,
+        aliases=tuple(aliases or ()),
+        density=float(density),
+        factors=MappingProxyType(cleaned)
+    )
+
+
+class ReagentIndex:
+    """试剂库的不可变快照：按ID和名称/别名（不区分大小写）查找"""
+
+    def __init__(self, entries: Iterable[ReagentEntry] = ()):
+        self.by_id: Dict[int, ReagentEntry] = {}
+        self.by_name: Dict[str, ReagentEntry] = {}
+        for entry in sorted(entries, key=lambda item: item.id):
+            self.by_id[entry.id] = entry
+            # 名称优先于别名：先登记全部别名，再由名称覆盖
+            for alias in entry.aliases:
+                self.by_name.setdefault(alias.casefold(), entry)
+        for entry in self.by_id.values():
+            self.by_name[entry.name.casefold()] = entry
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def get(self, ref: ReagentRef) -> Optional[ReagentEntry]:
+        """按ID（整数）或名称/别名查找，不存在时返回 None"""
+        if isinstance(ref, int):
+            return self.by_id.get(ref)
+        return self.by_name.get(ref.casefold())
+
+
+class ReagentLibrary:
+    """
+    试剂库内存索引
+
+    用法：
+        reagent_library.replace(entries)       # 启动时整体加载
+        reagent_library.put(*entries)          # 新增/修改试剂
+        reagent_library.resolve_stage(...)     # 补全一个阶段的密度和因子矩阵
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.index = ReagentIndex()
+
+    def replace(self, entries: Iterable[ReagentEntry]) -> None:
+        """用给定条目整体替换索引"""
+        index = ReagentIndex(entries)
+        with self._lock:
+            self.index = index
+
+    def put(self, *entries: ReagentEntry) -> None:
+        """新增或替换试剂（按ID）"""
+        with self._lock:
+            merged = {**self.index.by_id, **{entry.id: entry for entry in entries}}
+            self.index = ReagentIndex(merged.values())
+
+    def remove(self, reagent_id: int) -> bool:
+        """删除一个试剂，返回是否存在"""
+        with self._lock:
+            if reagent_id not in self.index.by_id:
+                return False
+            self.index = ReagentIndex(
+                entry for entry_id, entry in self.index.by_id.items() if entry_id != reagent_id
+            )
+            return True
+
+    def get(self, ref: ReagentRef) -> Optional[ReagentEntry]:
+        return self.index.get(ref)
+
+    def resolve_stage(
+        self,
+        reagents: Iterable[str],
+        densities: Mapping[str, float],
+        factor_matrix: Mapping[str, Mapping[str, float]],
+        references: Optional[Mapping[str, ReagentRef]] = None
+    ) -> Tuple[Dict[str, float], Dict[str, Dict[str, float]]]:
+        """
+        补全一个阶段中缺少密度或因子的试剂
+
+        参数：
+            reagents: 该阶段用到的试剂名称（组成或体积的键）
+            densities / factor_matrix: 请求中显式给出的值（优先）
+            references: 试剂名称 → 试剂库ID或名称；未给出的试剂按自身名称查找
+
+        返回：
+            (densities, factor_matrix)，未在试剂库中找到的试剂保持缺失，由评分时的校验报错
+
+        异常：
+            ValueError: references 中引用的试剂在试剂库中不存在，或未出现在该阶段的试剂中
+        """
+        reagents = list(reagents)
+        references = references or {}
+        unused = [reagent for reagent in references if reagent not in reagents]
+        if unused:
+            raise ValueError(f"引用的试剂未出现在组成/体积中：{', '.join(unused)}")
+
+        index = self.index
+        densities = dict(densities)
+        factor_matrix = dict(factor_matrix)
+
+        for reagent in reagents:
+            if reagent in densities and reagent in factor_matrix:
+                continue
+            ref = references.get(reagent)
+            entry = index.get(ref if ref is not None else reagent)
+            if entry is None:
+                if ref is not None:
+                    raise ValueError(f"试剂库中不存在试剂：{ref}（{reagent}）")
+                continue
+            densities.setdefault(reagent, entry.density)
+            # 复制为普通字典：结果可能被序列化后发送到工作进程
+            factor_matrix.setdefault(reagent, dict(entry.factors))
+        return densities, factor_matrix
+
+
+# 全局试剂库实例
+reagent_library = ReagentLibrary()
@@ -0,0 +1,144 @@
+"""
+试剂库存储模块
+
+试剂保存在数据库 reagents 表中，启动时一次性加载到 reagent_library 内存索引；
+之后评分请求补全试剂只读索引，不访问数据库。
+通过本模块创建/修改/删除试剂时先写库，提交成功后再更新索引。
+
+与自定义权重方案相同，索引是进程内的：多进程部署时，其他进程在重启（或调用 load_reagents）后才会看到变更。
+"""
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import Reagent
+from app.services.reagent_library import make_entry, reagent_library, validate_reagent
+from app.services.scoring_engine import SUB_FACTOR_NAMES
+
+logger = logging.getLogger(__name__)
+
+
+def _reagent_dict(reagent: Reagent) -> Dict[str, Any]:
+    return {
+        "id": reagent.id,
+        "name": reagent.name,
+        "aliases": reagent.aliases or [],
+        "density": reagent.density,
+        "factors": {factor: getattr(reagent, factor) for factor in SUB_FACTOR_NAMES},
+        "description": reagent.description,
+        "created_at": reagent.created_at.isoformat() if reagent.created_at else None,
+        "updated_at": reagent.updated_at.isoformat() if reagent.updated_at else None
+    }
+
+
+def _entry(reagent: Reagent):
+    return make_entry(
+        reagent.id,
+        reagent.name,
+        reagent.density,
+        {factor: getattr(reagent, factor) for factor in SUB_FACTOR_NAMES},
+        reagent.aliases
+    )
+
+
+async def load_reagents(db: AsyncSession) -> int:
+    """
+    从数据库加载全部试剂，整体替换内存索引
+
+    无效的记录（如手工改库导致因子超出范围）会被跳过并记录警告。
+
+    返回：
+        int: 成功加载的试剂数
+    """
+    result = await db.execute(select(Reagent))
+    entries = []
+    for reagent in result.scalars().all():
+        try:
+            entries.append(_entry(reagent))
+        except ValueError as e:
+            logger.warning("试剂库记录无效，已跳过：%s", e)
+    reagent_library.replace(entries)
+    return len(entries)
+
+
+async def list_reagents(db: AsyncSession) -> List[Dict[str, Any]]:
+    """列出试剂库中的全部试剂（按名称排序）"""
+    result = await db.execute(select(Reagent).order_by(Reagent.name))
+    return [_reagent_dict(reagent) for reagent in result.scalars().all()]
+
+
+async def get_reagent(db: AsyncSession, reagent_id: int) -> Optional[Dict[str, Any]]:
+    reagent = await db.get(Reagent, reagent_id)
+    return _reagent_dict(reagent) if reagent is not None else None
+
+
+def _check_names(name: str, aliases: Sequence[str], reagent_id: Optional[int]) -> None:
+    """名称和别名不能与试剂库中其他试剂的名称或别名重复（不区分大小写）"""
+    for label in (name, *aliases):
+        other = reagent_library.get(label)
+        if other is not None and other.id != reagent_id:
+            raise ValueError(f"名称 {label} 已被试剂 {other.name}（ID {other.id}）使用")
+
+
+async def save_reagents(db: AsyncSession, reagents: Sequence[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    按名称创建或更新一组试剂（一个事务）
+
+    参数：
+        reagents: [{"name", "density", "factors", "aliases", "description"}]
+
+    异常：
+        ValueError: 试剂数据无效（见 validate_reagent），或名称/别名与其他试剂冲突
+    """
+    cleaned = []
+    labels = set()
+    for item in reagents:
+        factors = validate_reagent(item["name"], item["density"], item["factors"])
+        aliases = list(dict.fromkeys(item.get("aliases") or []))
+        for label in (item["name"], *aliases):
+            if label.casefold() in labels:
+                raise ValueError(f"名称 {label} 在请求中重复")
+            labels.add(label.casefold())
+        cleaned.append((item, factors, aliases))
+
+    existing = {
+        reagent.name: reagent
+        for reagent in (await db.execute(
+            select(Reagent).where(Reagent.name.in_([item["name"] for item, _, _ in cleaned]))
+        )).scalars().all()
+    }
+
+    saved = []
+    for item, factors, aliases in cleaned:
+        reagent = existing.get(item["name"])
+        _check_names(item["name"], aliases, reagent.id if reagent is not None else None)
+        if reagent is None:
+            reagent = Reagent(name=item["name"])
+            db.add(reagent)
+        reagent.aliases = aliases
+        reagent.density = float(item["density"])
+        reagent.description = item.get("description")
+        for factor, value in factors.items():
+            setattr(reagent, factor, value)
+        saved.append(reagent)
+
+    await db.commit()
+    for reagent in saved:
+        await db.refresh(reagent)
+
+    # 写库成功后再更新索引
+    reagent_library.put(*(_entry(reagent) for reagent in saved))
+    return [_reagent_dict(reagent) for reagent in saved]
+
+
+async def delete_reagent(db: AsyncSession, reagent_id: int) -> bool:
+    """删除试剂，返回是否存在"""
+    reagent = await db.get(Reagent, reagent_id)
+    if reagent is not None:
+        await db.delete(reagent)
+        await db.commit()
+
+    removed = reagent_library.remove(reagent_id)
+    return reagent is not None or removed
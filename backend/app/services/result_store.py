@@ -0,0 +1,224 @@
+"""
+评分结果存储模块
+
+calculate_full_scores 的结果按列拆分保存：
+- scoring_results：Score₁/₂/₃、两个阶段的大因子、P/R/D因子和六个权重方案，每个结果一行
+- scoring_result_sub_factors：小因子得分，每个结果 3个阶段（instrument/preparation/merged）× 9行
+
+排名和范围查询直接在数据库中用索引完成（见 ScoringResult 的索引），
+只查询需要的列，不加载完整结果也不在Python中重新评分。
+"""
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import ScoringResult, ScoringResultSubFactor
+from app.database.pagination import decode_cursor, encode_cursor
+from app.services.scoring_service import DEFAULT_SCHEMES, SCHEME_KEYS, SUB_FACTOR_NAMES, MAJOR_FACTOR_NAMES
+
+
+SCHEME_KEY_SEPARATOR = "|"
+SUB_FACTOR_STAGES = ("instrument", "preparation", "merged")
+SCORE_FIELDS = ("score1", "score2", "score3")
+
+# 列表查询返回的列（不含大因子等明细）
+SUMMARY_COLUMNS = (
+    ScoringResult.id,
+    ScoringResult.name,
+    ScoringResult.analysis_id,
+    ScoringResult.created_at,
+    ScoringResult.score1,
+    ScoringResult.score2,
+    ScoringResult.score3,
+    *(getattr(ScoringResult, key) for key in SCHEME_KEYS)
+)
+
+
+def scheme_key(schemes: Mapping[str, str]) -> str:
+    """六个权重方案名称 → 检索键（缺省的方案取默认值）"""
+    return SCHEME_KEY_SEPARATOR.join(schemes.get(key) or DEFAULT_SCHEMES[key] for key in SCHEME_KEYS)
+
+
+def result_row(result: Dict, name: Optional[str] = None, analysis_id: Optional[int] = None) -> Dict[str, Any]:
+    """将 calculate_full_scores 的结果转换为 scoring_results 的一行"""
+    schemes = {key: result["schemes"].get(key) or DEFAULT_SCHEMES[key] for key in SCHEME_KEYS}
+    additional = result["additional_factors"]
+    row = {
+        "name": name,
+        "analysis_id": analysis_id,
+        "score1": result["instrument"]["score1"],
+        "score2": result["preparation"]["score2"],
+        "score3": result["final"]["score3"],
+        "instrument_P": additional["instrument_P"],
+        "instrument_R": additional["instrument_R"],
+        "instrument_D": additional["instrument_D"],
+        "pretreatment_P": additional["pretreatment_P"],
+        "pretreatment_R": additional["pretreatment_R"],
+        "pretreatment_D": additional["pretreatment_D"],
+        **schemes,
+        "scheme_key": scheme_key(schemes)
+    }
+    for stage in ("instrument", "preparation"):
+        for major in MAJOR_FACTOR_NAMES:
+            row[f"{stage}_{major}"] = result[stage]["major_factors"][major]
+    return row
+
+
+def sub_factor_rows(result_id: int, result: Dict) -> List[Dict[str, Any]]:
+    """将结果中的小因子转换为 scoring_result_sub_factors 的各行"""
+    return [
+        {"result_id": result_id, "stage": stage, "factor": factor, "value": result[stage]["sub_factors"][factor]}
+        for stage in SUB_FACTOR_STAGES
+        for factor in SUB_FACTOR_NAMES
+    ]
+
+
+async def save_results(
+    db: AsyncSession,
+    entries: Sequence[Tuple[Dict, Optional[str], Optional[int]]]
+) -> List[int]:
+    """
+    批量保存评分结果（两条 executemany 插入，一次提交）
+
+    参数：
+        entries: (calculate_full_scores 的结果, 名称, 关联的分析ID) 列表
+
+    返回：
+        List[int]: 与输入顺序一致的结果ID
+    """
+    if not entries:
+        return []
+
+    inserted = await db.execute(
+        insert(ScoringResult).returning(ScoringResult.id, sort_by_parameter_order=True),
+        [result_row(result, name, analysis_id) for result, name, analysis_id in entries]
+    )
+    ids = list(inserted.scalars().all())
+
+    await db.execute(
+        insert(ScoringResultSubFactor),
+        [row for result_id, (result, _, _) in zip(ids, entries) for row in sub_factor_rows(result_id, result)]
+    )
+    await db.commit()
+    return ids
+
+
+def _summary(row) -> Dict[str, Any]:
+    item = dict(row._mapping)
+    item["created_at"] = item["created_at"].isoformat() if item["created_at"] else None
+    return item
+
+
+async def query_results(
+    db: AsyncSession,
+    schemes: Optional[Mapping[str, Optional[str]]] = None,
+    score_ranges: Optional[Mapping[str, Tuple[Optional[float], Optional[float]]]] = None,
+    sub_factor: Optional[Tuple[str, str, Optional[float], Optional[float]]] = None,
+    analysis_id: Optional[int] = None,
+    descending: bool = False,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    按Score₃排序查询评分结果（键集分页）
+
+    参数：
+        schemes: 权重方案过滤；六个方案都给出时走 (scheme_key, score3) 索引，否则逐列过滤
+        score_ranges: {"score1"/"score2"/"score3": (下限, 上限)}，None表示不限
+        sub_factor: (阶段, 小因子, 下限, 上限)，如 ("merged", "S1", None, 20.0)
+        analysis_id: 只返回关联到该分析记录的结果
+        descending: False时Score₃从低到高（最环保在前）
+        limit: 每页条数
+        cursor: 上一页返回的 next_cursor
+
+    返回：
+        {"items": [...], "next_cursor": str 或 None}
+    """
+    stmt = select(*SUMMARY_COLUMNS)
+
+    schemes = {key: value for key, value in (schemes or {}).items() if value}
+    unknown = set(schemes) - set(SCHEME_KEYS)
+    if unknown:
+        raise ValueError(f"未知的权重方案参数：{', '.join(sorted(unknown))}")
+    if len(schemes) == len(SCHEME_KEYS):
+        stmt = stmt.where(ScoringResult.scheme_key == scheme_key(schemes))
+    else:
+        stmt = stmt.where(*(getattr(ScoringResult, key) == value for key, value in schemes.items()))
+
+    for field, (low, high) in (score_ranges or {}).items():
+        if field not in SCORE_FIELDS:
+            raise ValueError(f"未知的得分字段：{field}")
+        column = getattr(ScoringResult, field)
+        if low is not None:
+            stmt = stmt.where(column >= low)
+        if high is not None:
+            stmt = stmt.where(column <= high)
+
+    if sub_factor is not None:
+        stage, factor, low, high = sub_factor
+        if stage not in SUB_FACTOR_STAGES:
+            raise ValueError(f"未知的阶段：{stage}")
+        if factor not in SUB_FACTOR_NAMES:
+            raise ValueError(f"未知的小因子：{factor}")
+        matching = select(ScoringResultSubFactor.result_id).where(
+            ScoringResultSubFactor.stage == stage,
+            ScoringResultSubFactor.factor == factor
+        )
+        if low is not None:
+            matching = matching.where(ScoringResultSubFactor.value >= low)
+        if high is not None:
+            matching = matching.where(ScoringResultSubFactor.value <= high)
+        stmt = stmt.where(ScoringResult.id.in_(matching))
+
+    if analysis_id is not None:
+        stmt = stmt.where(ScoringResult.analysis_id == analysis_id)
+
+    if cursor:
+        after_score, after_id = decode_cursor(cursor, 2)
+        key = tuple_(ScoringResult.score3, ScoringResult.id)
+        stmt = stmt.where(key < (after_score, after_id) if descending else key > (after_score, after_id))
+
+    if descending:
+        stmt = stmt.order_by(ScoringResult.score3.desc(), ScoringResult.id.desc())
+    else:
+        stmt = stmt.order_by(ScoringResult.score3, ScoringResult.id)
+
+    # 多取一条判断是否还有下一页
+    rows = (await db.execute(stmt.limit(limit + 1))).all()
+    items = [_summary(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last["score3"], last["id"])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+async def get_result(db: AsyncSession, result_id: int) -> Optional[Dict[str, Any]]:
+    """获取单个评分结果的全部字段（含大因子、P/R/D和各阶段小因子）"""
+    result = await db.get(ScoringResult, result_id)
+    if result is None:
+        return None
+
+    item = {column.name: getattr(result, column.name) for column in ScoringResult.__table__.columns}
+    item["created_at"] = result.created_at.isoformat() if result.created_at else None
+    del item["scheme_key"]
+
+    rows = await db.execute(
+        select(ScoringResultSubFactor.stage, ScoringResultSubFactor.factor, ScoringResultSubFactor.value)
+        .where(ScoringResultSubFactor.result_id == result_id)
+    )
+    values = {(stage, factor): value for stage, factor, value in rows}
+    item["sub_factors"] = {
+        stage: {factor: values[stage, factor] for factor in SUB_FACTOR_NAMES if (stage, factor) in values}
+        for stage in SUB_FACTOR_STAGES
+    }
+    return item
+
+
+async def delete_result(db: AsyncSession, result_id: int) -> bool:
+    """删除评分结果及其小因子，返回是否存在"""
+    await db.execute(delete(ScoringResultSubFactor).where(ScoringResultSubFactor.result_id == result_id))
+    deleted = await db.execute(delete(ScoringResult).where(ScoringResult.id == result_id))
+    await db.commit()
+    return deleted.rowcount > 0
@@ -0,0 +1,120 @@
+"""
+自定义权重方案存储模块
+
+自定义方案保存在数据库 weight_schemes 表中，启动时一次性加载并编译进
+scoring_service.scheme_registry；之后的评分请求只读编译结果，不访问数据库。
+通过本模块创建/修改/删除方案时先写库，提交成功后再更新注册表（重新编译）。
+
+注册表是进程内的：多进程部署时，其他进程在重启（或调用 load_custom_schemes）后才会看到变更；
+本进程的工作进程池在下一个任务提交时自动同步（见 scoring_service.run_with_schemes）。
+"""
+import logging
+from typing import Dict, List, Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import WeightScheme
+from app.services import weight_schemes
+from app.services.scoring_service import scheme_registry
+
+logger = logging.getLogger(__name__)
+
+
+def _scheme_dict(scheme: WeightScheme) -> Dict:
+    return {
+        "id": scheme.id,
+        "category": scheme.category,
+        "name": scheme.name,
+        "description": scheme.description,
+        "weights": scheme.weights,
+        "created_at": scheme.created_at.isoformat() if scheme.created_at else None,
+        "updated_at": scheme.updated_at.isoformat() if scheme.updated_at else None
+    }
+
+
+async def load_custom_schemes(db: AsyncSession) -> int:
+    """
+    从数据库加载全部自定义方案，整体替换注册表中的自定义方案
+
+    无效的记录（如手工改库导致权重和不为1、与内置方案同名）会被跳过并记录警告。
+
+    返回：
+        int: 成功加载的方案数
+    """
+    result = await db.execute(select(WeightScheme))
+    schemes = result.scalars().all()
+    definitions: Dict[str, Dict[str, Dict[str, float]]] = {}
+    for scheme in schemes:
+        definitions.setdefault(scheme.category, {})[scheme.name] = scheme.weights
+
+    errors = scheme_registry.replace_custom(definitions)
+    for error in errors:
+        logger.warning("自定义权重方案无效，已跳过：%s", error)
+    return len(schemes) - len(errors)
+
+
+async def list_custom_schemes(db: AsyncSession, category: Optional[str] = None) -> List[Dict]:
+    """列出自定义方案（可按类别过滤）"""
+    stmt = select(WeightScheme).order_by(WeightScheme.category, WeightScheme.name)
+    if category is not None:
+        stmt = stmt.where(WeightScheme.category == category)
+    result = await db.execute(stmt)
+    return [_scheme_dict(scheme) for scheme in result.scalars().all()]
+
+
+async def save_custom_scheme(
+    db: AsyncSession,
+    category: str,
+    name: str,
+    weights: Mapping[str, float],
+    description: Optional[str] = None
+) -> Dict:
+    """
+    创建或更新自定义方案
+
+    异常：
+        ValueError: 类别未知、与内置方案同名或权重无效（权重项不符、超出 [0, 1]、总和不为1）
+    """
+    cleaned = weight_schemes.validate_scheme_weights(category, weights)
+    if scheme_registry.is_builtin(category, name):
+        raise ValueError(f"不能修改内置的{weight_schemes.CATEGORY_LABELS[category]}权重方案：{name}")
+
+    result = await db.execute(
+        select(WeightScheme).where(WeightScheme.category == category, WeightScheme.name == name)
+    )
+    scheme = result.scalar_one_or_none()
+    if scheme is None:
+        scheme = WeightScheme(category=category, name=name)
+        db.add(scheme)
+    scheme.weights = cleaned
+    scheme.description = description
+
+    await db.commit()
+    await db.refresh(scheme)
+
+    # 写库成功后再更新注册表
+    scheme_registry.register(category, name, cleaned)
+    return _scheme_dict(scheme)
+
+
+async def delete_custom_scheme(db: AsyncSession, category: str, name: str) -> bool:
+    """
+    删除自定义方案，返回是否存在
+
+    异常：
+        ValueError: 类别未知或试图删除内置方案
+    """
+    if scheme_registry.is_builtin(category, name):
+        raise ValueError(f"不能删除内置的{weight_schemes.CATEGORY_LABELS[category]}权重方案：{name}")
+
+    result = await db.execute(
+        select(WeightScheme).where(WeightScheme.category == category, WeightScheme.name == name)
+    )
+    scheme = result.scalar_one_or_none()
+    if scheme is not None:
+        await db.delete(scheme)
+        await db.commit()
+
+    removed = scheme_registry.unregister(category, name)
+    return scheme is not None or removed
@@ -0,0 +1,116 @@
+"""
+评分中间结果缓存模块
+
+- Layer 0 缓存：梯度程序（时间点、组成、曲线类型、流速、密度）→ 各试剂质量向量
+- Layer 1 缓存：质量向量 + 因子矩阵 → 9个小因子得分向量
+
+缓存键为输入数组内容的哈希值，缓存容量有上限，按最近最少使用（LRU）淘汰。
+缓存的数组设置为只读，调用方不得原地修改。
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class LRUCache:
+    """线程安全的LRU缓存，带命中/未命中/淘汰计数"""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存，未命中时返回 None"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """清空缓存并重置计数"""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def content_key(*parts: Any) -> bytes:
+    """
+    计算输入内容的哈希键
+
+    参数：
+        parts: NumPy数组（按dtype、形状和字节内容哈希）或可repr的标量/元组
+
+    返回：
+        bytes: 16字节摘要
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            array = np.ascontiguousarray(part)
+            digest.update(f"{array.dtype.str}{array.shape}".encode())
+            digest.update(array.tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"|")
+    return digest.digest()
+
+
+def freeze(array: np.ndarray) -> np.ndarray:
+    """将数组设为只读后返回（用于写入缓存）"""
+    array.flags.writeable = False
+    return array
+
+
+# 全局缓存实例
+mass_cache = LRUCache("layer0_masses", settings.SCORING_MASS_CACHE_SIZE)
+sub_factor_cache = LRUCache("layer1_sub_factors", settings.SCORING_SUB_FACTOR_CACHE_SIZE)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """所有评分缓存的统计信息"""
+    return {cache.name: cache.stats() for cache in (mass_cache, sub_factor_cache)}
+
+
+def clear_caches() -> None:
+    """清空所有评分缓存"""
+    mass_cache.clear()
+    sub_factor_cache.clear()
@@ -0,0 +1,377 @@
+"""
+HPLC绿色化学评分 - 数组计算引擎
+以NumPy数组表达完整的5层评分流程
+
+数据布局：
+    试剂因子矩阵 F: (R, 9)  行为试剂，列为 SUB_FACTOR_NAMES 顺序的9个小因子
+    试剂质量向量 m: (..., R)  支持前置批量维度
+    小因子得分:     (..., 9)  = clip(45 × log₁₀(1 + 14 × m@F), 0, 100)
+    大因子权重矩阵 W_major: (3, 9)  行为 S/H/E
+    阶段权重向量 w_stage:   (6,)    顺序为 STAGE_FACTOR_NAMES
+    最终权重向量 w_final:   (2,)    顺序为 (instrument, preparation)
+
+scoring_service 中基于字典的接口是本模块的薄封装，
+批量接口可直接调用本模块的数组函数。
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.instrumentation import span
+
+
+# 9个小因子（列顺序）
+SUB_FACTOR_NAMES = ("S1", "S2", "S3", "S4", "H1", "H2", "E1", "E2", "E3")
+
+# 3个大因子及其包含的小因子
+MAJOR_FACTOR_NAMES = ("S", "H", "E")
+MAJOR_FACTOR_MEMBERS = {
+    "S": ("S1", "S2", "S3", "S4"),
+    "H": ("H1", "H2"),
+    "E": ("E1", "E2", "E3"),
+}
+
+# 阶段评分的6个因子（权重向量顺序）
+STAGE_FACTOR_NAMES = ("S", "H", "E", "P", "R", "D")
+
+
+@dataclass
+class StageArrays:
+    """单个阶段（仪器分析或前处理）的数组输入"""
+    reagents: List[str]    # 试剂名称（行顺序）
+    masses: np.ndarray     # (R,) 各试剂质量（克）
+    factors: np.ndarray    # (R, 9) 试剂因子矩阵
+
+
+@dataclass
+class ArrayScoreResult:
+    """数组引擎的完整评分结果（未取整）"""
+    inst_sub: np.ndarray      # (..., 9) 仪器分析小因子
+    prep_sub: np.ndarray      # (..., 9) 前处理小因子
+    inst_major: np.ndarray    # (..., 3) 仪器分析大因子 S/H/E
+    prep_major: np.ndarray    # (..., 3) 前处理大因子 S/H/E
+    score1: np.ndarray        # (...,) 仪器分析阶段得分
+    score2: np.ndarray        # (...,) 前处理阶段得分
+    merged_sub: np.ndarray    # (..., 9) 合成小因子（雷达图）
+    score3: np.ndarray        # (...,) 最终总分
+    
+    def item(self, index: int) -> "ArrayScoreResult":
+        """取批量结果中的第 index 个方法"""
+        return ArrayScoreResult(**{
+            name: value[index] for name, value in self.__dict__.items()
+        })
+
+
+# ============================================================================
+# 输入转换：字典 → 数组
+# ============================================================================
+
+def build_factor_matrix(
+    reagents: Sequence[str],
+    reagent_factor_matrix: Mapping[str, Mapping[str, float]]
+) -> np.ndarray:
+    """
+    按给定试剂顺序构建 (R, 9) 因子矩阵，并校验缺失值和取值范围
+
+    参数：
+        reagents: 试剂名称序列（决定行顺序）
+        reagent_factor_matrix: 试剂因子字典，如 {"MeOH": {"S1": 0.8, ...}}
+
+    返回：
+        np.ndarray: (R, 9) 因子矩阵
+    """
+    matrix = np.empty((len(reagents), len(SUB_FACTOR_NAMES)), dtype=np.float64)
+
+    for row, reagent in enumerate(reagents):
+        factors = reagent_factor_matrix.get(reagent)
+        for col, sub_factor in enumerate(SUB_FACTOR_NAMES):
+            if factors is None or sub_factor not in factors:
+                raise ValueError(f"试剂 {reagent} 缺少 {sub_factor} 因子值")
+            matrix[row, col] = factors[sub_factor]
+
+    invalid = ~((matrix >= 0) & (matrix <= 1))
+    if invalid.any():
+        row, col = np.argwhere(invalid)[0]
+        raise ValueError(
+            f"试剂 {reagents[row]} 的 {SUB_FACTOR_NAMES[col]} 因子值 {matrix[row, col]} 超出范围 [0, 1]"
+        )
+
+    return matrix
+
+
+def build_density_vector(
+    reagents: Sequence[str],
+    reagent_densities: Mapping[str, float]
+) -> np.ndarray:
+    """
+    按给定试剂顺序构建 (R,) 密度向量
+
+    参数：
+        reagents: 试剂名称序列
+        reagent_densities: 试剂密度（g/mL）
+
+    返回：
+        np.ndarray: (R,) 密度向量
+    """
+    for reagent in reagents:
+        if reagent not in reagent_densities:
+            raise ValueError(f"缺少试剂 {reagent} 的密度数据")
+    return np.array([reagent_densities[r] for r in reagents], dtype=np.float64)
+
+
+def build_composition_matrix(
+    reagents: Sequence[str],
+    composition_data: Mapping[str, Sequence[float]],
+    num_time_points: int
+) -> np.ndarray:
+    """
+    构建 (R, T) 组成矩阵（百分比转换为小数）
+
+    参数：
+        reagents: 试剂名称序列
+        composition_data: 各试剂的组成百分比
+        num_time_points: 时间点数量 T
+
+    返回：
+        np.ndarray: (R, T) 组成矩阵（0-1）
+    """
+    matrix = np.empty((len(reagents), num_time_points), dtype=np.float64)
+
+    for row, reagent in enumerate(reagents):
+        percentages = composition_data[reagent]
+        if len(percentages) < num_time_points:
+            raise ValueError(
+                f"试剂 {reagent} 的组成数据点数 {len(percentages)} 少于时间点数 {num_time_points}"
+            )
+        matrix[row] = percentages[:num_time_points]
+
+    return matrix / 100.0
+
+
+# ============================================================================
+# Layer 0: 质量计算
+# ============================================================================
+
+def gradient_masses(
+    time_points: np.ndarray,
+    composition: np.ndarray,
+    flow_rate: float,
+    densities: np.ndarray,
+    segment_factors: np.ndarray
+) -> np.ndarray:
+    """
+    梯度洗脱各试剂质量（所有试剂、所有时间段一次性计算）
+
+    每段平均组成 = p1 + (p2 - p1) × f，f 为曲线积分系数
+    质量 = 流速 × Σ(Δt × 平均组成) × 密度
+
+    参数：
+        time_points: (T,) 时间点（分钟）
+        composition: (R, T) 组成矩阵（0-1）
+        flow_rate: 流速（mL/min）
+        densities: (R,) 密度（g/mL）
+        segment_factors: (T-1,) 各时间段的曲线积分系数
+
+    返回：
+        np.ndarray: (R,) 各试剂质量（克）
+    """
+    dt = np.diff(time_points)
+    start = composition[:, :-1]
+    avg_composition = start + (composition[:, 1:] - start) * segment_factors
+    return flow_rate * (avg_composition @ dt) * densities
+
+
+def prep_masses(volumes: np.ndarray, densities: np.ndarray) -> np.ndarray:
+    """
+    前处理试剂质量 = 体积 × 密度
+
+    参数：
+        volumes: (..., R) 试剂体积（mL）
+        densities: (R,) 密度（g/mL）
+
+    返回：
+        np.ndarray: (..., R) 各试剂质量（克）
+    """
+    return volumes * densities
+
+
+def share_factor_rows(stages: Sequence[StageArrays]) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    合并多个阶段的因子矩阵为去重后的共享因子表
+
+    因子值完全相同的试剂行（如多个方法中的同一种溶剂）只保留一行，
+    各阶段的质量随后按行索引累加到共享表上，使 Σ = M @ F 对整个批次只做一次矩阵乘法
+
+    参数：
+        stages: 各方法的阶段数组
+
+    返回：
+        Tuple: (共享因子表 (K, 9), 每个阶段的行索引列表 [(R_i,), ...])
+    """
+    row_ids: Dict[bytes, int] = {}
+    rows: List[np.ndarray] = []
+    indices: List[np.ndarray] = []
+
+    for stage in stages:
+        stage_index = np.empty(len(stage.factors), dtype=np.intp)
+        for r, factor_row in enumerate(stage.factors):
+            key = factor_row.tobytes()
+            if key not in row_ids:
+                row_ids[key] = len(rows)
+                rows.append(factor_row)
+            stage_index[r] = row_ids[key]
+        indices.append(stage_index)
+
+    table = np.array(rows, dtype=np.float64).reshape(len(rows), len(SUB_FACTOR_NAMES))
+    return table, indices
+
+
+def scatter_masses(
+    stages: Sequence[StageArrays],
+    indices: Sequence[np.ndarray],
+    num_rows: int
+) -> np.ndarray:
+    """
+    将各阶段的质量向量累加到共享因子表的列上
+
+    返回：
+        np.ndarray: (N, K) 质量矩阵
+    """
+    masses = np.zeros((len(stages), num_rows), dtype=np.float64)
+    if stages:
+        item_ids = np.repeat(np.arange(len(stages)), [len(i) for i in indices])
+        np.add.at(
+            masses,
+            (item_ids, np.concatenate(indices)),
+            np.concatenate([stage.masses for stage in stages])
+        )
+    return masses
+
+
+# ============================================================================
+# Layer 1: 小因子归一化
+# ============================================================================
+
+def normalize_sub_factors(masses: np.ndarray, factors: np.ndarray) -> np.ndarray:
+    """
+    9个小因子的归一化得分：Score = min{45 × log₁₀(1 + 14 × Σ), 100}，Σ ≤ 0 时为 0
+
+    参数：
+        masses: (..., R) 试剂质量
+        factors: (R, 9) 试剂因子矩阵
+
+    返回：
+        np.ndarray: (..., 9) 小因子得分
+    """
+    weighted_sum = masses @ factors
+    return np.minimum(100.0, 45.0 * np.log10(1.0 + 14.0 * np.maximum(weighted_sum, 0.0)))
+
+
+# ============================================================================
+# Layer 2-5: 加权合成
+# ============================================================================
+
+def major_factors(major_weights: np.ndarray, sub_scores: np.ndarray) -> np.ndarray:
+    """
+    大因子得分 = W_major · 小因子
+
+    参数：
+        major_weights: (..., 3, 9) 小因子→大因子权重矩阵
+        sub_scores: (..., 9) 小因子得分
+
+    返回：
+        np.ndarray: (..., 3) 大因子 S/H/E
+    """
+    return np.einsum("...ij,...j->...i", major_weights, sub_scores)
+
+
+def stage_score(
+    major_factors: np.ndarray,
+    prd_factors: np.ndarray,
+    stage_weights: np.ndarray
+) -> np.ndarray:
+    """
+    阶段得分 = [S, H, E, P, R, D] · w_stage
+
+    参数：
+        major_factors: (..., 3) 大因子 S/H/E
+        prd_factors: (..., 3) 附加因子 P/R/D
+        stage_weights: (..., 6) 阶段权重
+
+    返回：
+        np.ndarray: (...,) 阶段得分
+    """
+    stage_factors = np.concatenate(np.broadcast_arrays(major_factors, prd_factors), axis=-1)
+    return np.sum(stage_factors * stage_weights, axis=-1)
+
+
+def score_arrays(
+    inst: StageArrays,
+    prep: StageArrays,
+    inst_prd: np.ndarray,
+    prep_prd: np.ndarray,
+    major_weights: np.ndarray,
+    inst_stage_weights: np.ndarray,
+    prep_stage_weights: np.ndarray,
+    final_weights: np.ndarray,
+    inst_sub: Optional[np.ndarray] = None,
+    prep_sub: Optional[np.ndarray] = None
+) -> ArrayScoreResult:
+    """
+    在数组上执行 Layer 1-5 的完整评分流程
+
+    参数：
+        inst: 仪器分析阶段数组（质量已由Layer 0计算）
+        prep: 前处理阶段数组
+        inst_prd: (..., 3) 仪器分析 P/R/D 因子
+        prep_prd: (..., 3) 前处理 P/R/D 因子
+        major_weights: (..., 3, 9) 小因子→大因子权重矩阵
+        inst_stage_weights: (..., 6) 仪器分析阶段权重
+        prep_stage_weights: (..., 6) 前处理阶段权重
+        final_weights: (..., 2) 最终汇总权重
+        inst_sub / prep_sub: 已计算好的Layer 1小因子（可选，提供时跳过归一化）
+
+    返回：
+        ArrayScoreResult: 各层结果
+    """
+    with span("layer1.normalize"):
+        if inst_sub is None:
+            inst_sub = normalize_sub_factors(inst.masses, inst.factors)
+        if prep_sub is None:
+            prep_sub = normalize_sub_factors(prep.masses, prep.factors)
+
+    with span("layer3.major_factors"):
+        inst_major = major_factors(major_weights, inst_sub)
+        prep_major = major_factors(major_weights, prep_sub)
+
+    with span("layer4.stage_scores"):
+        score1 = stage_score(inst_major, inst_prd, inst_stage_weights)
+        score2 = stage_score(prep_major, prep_prd, prep_stage_weights)
+
+    with span("layer2_5.merge_final"):
+        w_inst = final_weights[..., 0]
+        w_prep = final_weights[..., 1]
+        merged_sub = inst_sub * w_inst[..., None] + prep_sub * w_prep[..., None]
+        score3 = score1 * w_inst + score2 * w_prep
+
+    return ArrayScoreResult(
+        inst_sub=inst_sub,
+        prep_sub=prep_sub,
+        inst_major=inst_major,
+        prep_major=prep_major,
+        score1=score1,
+        score2=score2,
+        merged_sub=merged_sub,
+        score3=score3
+    )
+
+
+# ============================================================================
+# 输出转换：数组 → 字典
+# ============================================================================
+
+def to_named_dict(values: np.ndarray, names: Sequence[str]) -> Dict[str, float]:
+    """将一维数组按名称转换为 {name: float} 字典"""
+    return {name: float(value) for name, value in zip(names, values)}
@@ -11,9 +11,24 @@ Layer 4: 阶段总分（Score₁和Score₂）
 Layer 5: 最终总分（Score₃）
 """
 
-from typing import Dict, List, Tuple, Optional
+from functools import lru_cache
+from typing import Dict, List, Tuple, Optional, Union
+import logging
 import math
 
+import numpy as np
+
+from app.core.instrumentation import debug_payload, span
+from app.services import scoring_cache, scoring_engine, trace_integration, weight_schemes
+from app.services.scoring_engine import (
+    SUB_FACTOR_NAMES,
+    MAJOR_FACTOR_NAMES,
+    StageArrays,
+    ArrayScoreResult,
+)
+
+logger = logging.getLogger(__name__)
+
 
 # ============================================================================
 # 权重配置常量（12种方案）
@@ -67,12 +82,51 @@ PREPARATION_STAGE_WEIGHTS = {
     "Environmental_Tower": {"S": 0.15, "H": 0.15, "E": 0.40, "R": 0.15, "D": 0.15, "P": 0.00}
 }
 
+# 默认权重方案（与 calculate_full_scores 的参数默认值一致）
+DEFAULT_SCHEMES = {
+    "safety_scheme": "PBT_Balanced",
+    "health_scheme": "Absolute_Balance",
+    "environment_scheme": "PBT_Balanced",
+    "instrument_stage_scheme": "Balanced",
+    "prep_stage_scheme": "Balanced",
+    "final_scheme": "Standard"
+}
+SCHEME_KEYS = tuple(DEFAULT_SCHEMES)
+
+# 已编译的权重方案注册表（内置方案在导入时编译，自定义方案注册时编译）
+scheme_registry = weight_schemes.SchemeRegistry({
+    "safety": SAFETY_WEIGHTS,
+    "health": HEALTH_WEIGHTS,
+    "environment": ENVIRONMENT_WEIGHTS,
+    "instrument_stage": INSTRUMENT_STAGE_WEIGHTS,
+    "prep_stage": PREPARATION_STAGE_WEIGHTS,
+    "final": FINAL_WEIGHTS
+})
+
 
 # ============================================================================
 # Layer 0: 质量计算函数
 # ============================================================================
 
-def calculate_curve_integral_factor(curve_type: str) -> float:
+# 曲线强度 → 幂次 n
+CURVE_ORDERS = {"weak": 2, "medium": 3, "strong": 4, "ultra": 6}
+
+# 曲线类型 → 积分系数 ∫[0→1] f(u) du 查找表
+#   线性 f(u) = u → 0.5；pre-step f(u) = 1 → 1；post-step f(u) = 0 → 0
+#   凸曲线 f(u) = 1 - (1-u)^n → n/(n+1)
+#   凹曲线 f(u) = u^n → 1/(n+1)
+CURVE_INTEGRAL_FACTORS = {
+    "linear": 0.5,
+    "initial": 0.5,
+    "pre-step": 1.0,
+    "post-step": 0.0,
+    **{f"{strength}-convex": n / (n + 1) for strength, n in CURVE_ORDERS.items()},
+    **{f"{strength}-concave": 1.0 / (n + 1) for strength, n in CURVE_ORDERS.items()},
+}
+
+
+@lru_cache(maxsize=1024)
+def calculate_curve_integral_factor(curve_type: Optional[str]) -> float:
     """
     计算不同曲线类型从0到1的积分系数
     
@@ -81,49 +135,35 @@ def calculate_curve_integral_factor(curve_type: str) -> float:
     
     返回 ∫[0→1] f(u) du 的值
     
+    除 CURVE_INTEGRAL_FACTORS 中的11种命名曲线外，支持任意幂次的参数化曲线：
+        "convex-<n>"：f(u) = 1 - (1-u)^n，如 "convex-2.5"
+        "concave-<n>"：f(u) = u^n，如 "concave-1.5"
+    
     参数：
         curve_type: 曲线类型字符串
     
     返回：
-        float: 积分系数（0-1之间）
+        float: 积分系数（0-1之间），未知类型按线性处理
     """
-    # 线性曲线: f(u) = u, 积分 = 0.5
-    if curve_type in ['linear', 'initial', None]:
+    if curve_type is None:
         return 0.5
     
-    # Pre-step: f(u) = 1, 积分 = 1
-    elif curve_type == 'pre-step':
-        return 1.0
-    
-    # Post-step: f(u) = 0, 积分 = 0
-    elif curve_type == 'post-step':
-        return 0.0
-    
-    # Convex curves: f(u) = 1 - (1-u)^n
-    # ∫[0→1] [1 - (1-u)^n] du = 1 - 1/(n+1) = n/(n+1)
-    elif curve_type == 'weak-convex':    # n=2
-        return 2.0 / 3.0  # 0.6667
-    elif curve_type == 'medium-convex':  # n=3
-        return 3.0 / 4.0  # 0.75
-    elif curve_type == 'strong-convex':  # n=4
-        return 4.0 / 5.0  # 0.8
-    elif curve_type == 'ultra-convex':   # n=6
-        return 6.0 / 7.0  # 0.8571
-    
-    # Concave curves: f(u) = u^n
-    # ∫[0→1] u^n du = 1/(n+1)
-    elif curve_type == 'weak-concave':   # n=2
-        return 1.0 / 3.0  # 0.3333
-    elif curve_type == 'medium-concave': # n=3
-        return 1.0 / 4.0  # 0.25
-    elif curve_type == 'strong-concave': # n=4
-        return 1.0 / 5.0  # 0.2
-    elif curve_type == 'ultra-concave':  # n=6
-        return 1.0 / 7.0  # 0.1429
+    factor = CURVE_INTEGRAL_FACTORS.get(curve_type)
+    if factor is not None:
+        return factor
+    
+    family, _, order = curve_type.partition("-")
+    if family in ("convex", "concave"):
+        try:
+            n = float(order)
+        except ValueError:
+            raise ValueError(f"无效的曲线幂次：{curve_type}")
+        if not (0 < n < math.inf):
+            raise ValueError(f"曲线幂次必须为正数：{curve_type}")
+        return n / (n + 1) if family == "convex" else 1.0 / (n + 1)
     
     # 默认使用线性
-    else:
-        return 0.5
+    return 0.5
 
 
 def calculate_gradient_integral(
@@ -134,7 +174,11 @@ def calculate_gradient_integral(
     curve_types: List[str] = None
 ) -> Dict[str, float]:
     """
-    计算梯度洗脱流动相的总质量（支持11种曲线类型的精确积分）
+    计算梯度洗脱流动相的总质量（支持命名曲线和参数化曲线的精确积分）
+    
+    所有试剂、所有时间段在一次数组运算中完成：
+        平均组成[r, i] = p[r, i] + (p[r, i+1] - p[r, i]) × f[i]
+        质量[r] = 流速 × Σ_i(Δt[i] × 平均组成[r, i]) × 密度[r]
     
     参数：
         time_points: 时间点列表（分钟），如 [0, 5, 15, 20]
@@ -147,53 +191,18 @@ def calculate_gradient_integral(
     返回：
         Dict[str, float]: 各试剂的总质量（克），如 {"MeOH": 123.45, "H2O": 234.56}
     """
-    reagent_masses = {}
-    
-    # 如果没有提供曲线类型，默认全部使用线性
-    if curve_types is None:
-        curve_types = ['linear'] * len(time_points)
-    
-    for reagent, percentages in composition_data.items():
-        if reagent not in reagent_densities:
-            raise ValueError(f"缺少试剂 {reagent} 的密度数据")
-        
-        density = reagent_densities[reagent]
-        total_mass = 0.0
-        
-        # 对每个时间段进行积分
-        for i in range(len(time_points) - 1):
-            t1, t2 = time_points[i], time_points[i + 1]
-            p1, p2 = percentages[i] / 100.0, percentages[i + 1] / 100.0  # 转换为小数
-            
-            # 获取该段的曲线类型（使用目标时间点的曲线类型）
-            curve_type = curve_types[i + 1] if i + 1 < len(curve_types) else 'linear'
-            
-            # 计算该曲线的积分系数
-            integral_factor = calculate_curve_integral_factor(curve_type)
-            
-            # 该时间段的时长
-            dt = t2 - t1
-            
-            # 该时间段的体积（mL）
-            volume_segment = flow_rate * dt
-            
-            # 该时间段该试剂的平均百分比（考虑曲线类型）
-            # y(t) = p1 + (p2-p1) * f(t/T)
-            # 积分 = p1*T + (p2-p1) * T * integral_factor
-            # 平均值 = (p1*T + (p2-p1)*T*factor) / T = p1 + (p2-p1)*factor
-            avg_percentage = p1 + (p2 - p1) * integral_factor
-            
-            # 该时间段该试剂的体积（mL）
-            reagent_volume = volume_segment * avg_percentage
-            
-            # 该时间段该试剂的质量（g）
-            reagent_mass = reagent_volume * density
-            
-            total_mass += reagent_mass
-        
-        reagent_masses[reagent] = total_mass
+    reagents = list(composition_data)
+    time_array = np.asarray(time_points, dtype=np.float64)
+    
+    masses = scoring_engine.gradient_masses(
+        time_array,
+        scoring_engine.build_composition_matrix(reagents, composition_data, len(time_array)),
+        flow_rate,
+        scoring_engine.build_density_vector(reagents, reagent_densities),
+        curve_segment_factors(curve_types, len(time_array))
+    )
     
-    return reagent_masses
+    return scoring_engine.to_named_dict(masses, reagents)
 
 
 def calculate_prep_masses(
@@ -290,21 +299,12 @@ def calculate_all_sub_factors(
     返回：
         Dict[str, float]: 9个小因子的得分，如 {"S1": 85.3, "S2": 72.1, ..., "E3": 45.6}
     """
-    sub_factor_names = ["S1", "S2", "S3", "S4", "H1", "H2", "E1", "E2", "E3"]
-    sub_factor_scores = {}
+    reagents = list(reagent_masses)
+    masses = np.array([reagent_masses[r] for r in reagents], dtype=np.float64)
+    factors = scoring_engine.build_factor_matrix(reagents, reagent_factor_matrix)
     
-    for sub_factor in sub_factor_names:
-        # 提取所有试剂的该小因子值
-        reagent_factors = {
-            reagent: factors[sub_factor]
-            for reagent, factors in reagent_factor_matrix.items()
-        }
-        
-        # 计算归一化得分
-        score = normalize_sub_factor(reagent_masses, reagent_factors, sub_factor)
-        sub_factor_scores[sub_factor] = score
-    
-    return sub_factor_scores
+    scores = scoring_engine.normalize_sub_factors(masses, factors)
+    return scoring_engine.to_named_dict(scores, SUB_FACTOR_NAMES)
 
 
 # ============================================================================
@@ -329,22 +329,16 @@ def merge_sub_factors(
     返回：
         Dict[str, float]: 合成后的9个小因子得分（用于雷达图）
     """
-    if final_weight_scheme not in FINAL_WEIGHTS:
-        raise ValueError(f"未知的最终权重方案：{final_weight_scheme}")
-    
-    weights = FINAL_WEIGHTS[final_weight_scheme]
-    w_inst = weights["instrument"]
-    w_prep = weights["preparation"]
+    compiled = scheme_registry.compiled
+    w_inst, w_prep = compiled.matrices["final"][compiled.scheme_id("final", final_weight_scheme)]
     
     merged_scores = {}
-    sub_factor_names = ["S1", "S2", "S3", "S4", "H1", "H2", "E1", "E2", "E3"]
-    
-    for sub_factor in sub_factor_names:
+    for sub_factor in SUB_FACTOR_NAMES:
         inst_score = instrument_sub_scores.get(sub_factor, 0.0)
         prep_score = preparation_sub_scores.get(sub_factor, 0.0)
         
         merged_score = (inst_score * w_inst) + (prep_score * w_prep)
-        merged_scores[sub_factor] = merged_score
+        merged_scores[sub_factor] = float(merged_score)
     
     return merged_scores
 
@@ -369,32 +363,17 @@ def calculate_major_factor(
     返回：
         float: 大因子得分（0-100）
     """
-    if major_factor_type == "S":
-        if weight_scheme not in SAFETY_WEIGHTS:
-            raise ValueError(f"未知的安全因子权重方案：{weight_scheme}")
-        weights = SAFETY_WEIGHTS[weight_scheme]
-        sub_factors = ["S1", "S2", "S3", "S4"]
-    
-    elif major_factor_type == "H":
-        if weight_scheme not in HEALTH_WEIGHTS:
-            raise ValueError(f"未知的健康因子权重方案：{weight_scheme}")
-        weights = HEALTH_WEIGHTS[weight_scheme]
-        sub_factors = ["H1", "H2"]
-    
-    elif major_factor_type == "E":
-        if weight_scheme not in ENVIRONMENT_WEIGHTS:
-            raise ValueError(f"未知的环境因子权重方案：{weight_scheme}")
-        weights = ENVIRONMENT_WEIGHTS[weight_scheme]
-        sub_factors = ["E1", "E2", "E3"]
-    
-    else:
+    categories = {"S": "safety", "H": "health", "E": "environment"}
+    if major_factor_type not in categories:
         raise ValueError(f"未知的大因子类型：{major_factor_type}")
     
-    # 加权求和
-    major_score = sum(
-        sub_factor_scores.get(sub, 0.0) * weights[sub]
-        for sub in sub_factors
-    )
+    compiled = scheme_registry.compiled
+    category = categories[major_factor_type]
+    weights = compiled.matrices[category][compiled.scheme_id(category, weight_scheme)]
+    
+    # 加权求和（非本大因子的小因子权重为0）
+    sub_scores = np.array([sub_factor_scores.get(sub, 0.0) for sub in SUB_FACTOR_NAMES])
+    major_score = float(weights @ sub_scores)
     
     return major_score
 
@@ -403,6 +382,20 @@ def calculate_major_factor(
 # Layer 4: 阶段总分计算（Score₁和Score₂）
 # ============================================================================
 
+def _stage_factor_vector(
+    major_factors: Dict[str, float],
+    p_factor: float,
+    r_factor: float,
+    d_factor: float
+) -> np.ndarray:
+    """按 STAGE_FACTOR_NAMES 顺序（S, H, E, P, R, D）排列阶段因子"""
+    values = {"P": p_factor, "R": r_factor, "D": d_factor}
+    return np.array([
+        major_factors[name] if name in MAJOR_FACTOR_NAMES else values[name]
+        for name in scoring_engine.STAGE_FACTOR_NAMES
+    ], dtype=np.float64)
+
+
 def calculate_score1(
     major_factors: Dict[str, float],
     p_factor: float,
@@ -423,19 +416,10 @@ def calculate_score1(
     返回：
         float: Score₁（0-100）
     """
-    if weight_scheme not in INSTRUMENT_STAGE_WEIGHTS:
-        raise ValueError(f"未知的仪器阶段权重方案：{weight_scheme}")
+    compiled = scheme_registry.compiled
+    weights = compiled.matrices["instrument_stage"][compiled.scheme_id("instrument_stage", weight_scheme)]
     
-    weights = INSTRUMENT_STAGE_WEIGHTS[weight_scheme]
-    
-    score1 = (
-        major_factors["S"] * weights["S"] +
-        major_factors["H"] * weights["H"] +
-        major_factors["E"] * weights["E"] +
-        p_factor * weights["P"] +
-        r_factor * weights["R"] +
-        d_factor * weights["D"]
-    )
+    score1 = float(weights @ _stage_factor_vector(major_factors, p_factor, r_factor, d_factor))
     
     return score1
 
@@ -460,19 +444,10 @@ def calculate_score2(
     返回：
         float: Score₂（0-100）
     """
-    if weight_scheme not in PREPARATION_STAGE_WEIGHTS:
-        raise ValueError(f"未知的前处理阶段权重方案：{weight_scheme}")
-    
-    weights = PREPARATION_STAGE_WEIGHTS[weight_scheme]
+    compiled = scheme_registry.compiled
+    weights = compiled.matrices["prep_stage"][compiled.scheme_id("prep_stage", weight_scheme)]
     
-    score2 = (
-        major_factors["S"] * weights["S"] +
-        major_factors["H"] * weights["H"] +
-        major_factors["E"] * weights["E"] +
-        r_factor * weights["R"] +
-        d_factor * weights["D"] +
-        p_factor * weights["P"]
-    )
+    score2 = float(weights @ _stage_factor_vector(major_factors, p_factor, r_factor, d_factor))
     
     return score2
 
@@ -499,16 +474,245 @@ def calculate_score3(
     返回：
         float: Score₃（0-100）
     """
-    if weight_scheme not in FINAL_WEIGHTS:
-        raise ValueError(f"未知的最终权重方案：{weight_scheme}")
-    
-    weights = FINAL_WEIGHTS[weight_scheme]
+    compiled = scheme_registry.compiled
+    instrument_weight, preparation_weight = compiled.matrices["final"][compiled.scheme_id("final", weight_scheme)]
     
-    score3 = (score1 * weights["instrument"]) + (score2 * weights["preparation"])
+    score3 = (score1 * instrument_weight) + (score2 * preparation_weight)
     
     return score3
 
 
+# ============================================================================
+# 数组评分路径（供完整评分和批量接口复用）
+# ============================================================================
+
+def curve_segment_factors(curve_types: Optional[List[str]], num_time_points: int) -> np.ndarray:
+    """
+    计算各时间段的曲线积分系数（第i段使用到达时间点i+1的曲线类型）
+    
+    参数：
+        curve_types: 曲线类型列表（可为None，默认线性；不足的时间段按线性处理）
+        num_time_points: 时间点数量
+    
+    返回：
+        np.ndarray: (T-1,) 积分系数
+    """
+    num_segments = max(num_time_points - 1, 0)
+    factors = np.full(num_segments, 0.5, dtype=np.float64)
+    
+    if curve_types:
+        segment_curves = curve_types[1:num_time_points]
+        factors[:len(segment_curves)] = [
+            calculate_curve_integral_factor(curve) for curve in segment_curves
+        ]
+    
+    return factors
+
+
+def build_instrument_arrays(
+    time_points: List[float],
+    composition: Dict[str, List[float]],
+    flow_rate: float,
+    densities: Dict[str, float],
+    factor_matrix: Dict[str, Dict[str, float]],
+    curve_types: List[str] = None
+) -> StageArrays:
+    """
+    构建仪器分析阶段的数组输入（Layer 0 质量 + 因子矩阵）
+    
+    返回：
+        StageArrays: 试剂顺序与 composition 一致
+    """
+    reagents = list(composition)
+    density_vector = scoring_engine.build_density_vector(reagents, densities)
+    time_array = np.asarray(time_points, dtype=np.float64)
+    composition_matrix = scoring_engine.build_composition_matrix(reagents, composition, len(time_array))
+    segment_factors = curve_segment_factors(curve_types, len(time_array))
+    
+    # Layer 0 缓存：同一梯度程序只积分一次
+    key = scoring_cache.content_key(
+        time_array, composition_matrix, float(flow_rate), density_vector, segment_factors
+    )
+    masses = scoring_cache.mass_cache.get(key)
+    if masses is None:
+        masses = scoring_cache.freeze(scoring_engine.gradient_masses(
+            time_array,
+            composition_matrix,
+            flow_rate,
+            density_vector,
+            segment_factors
+        ))
+        scoring_cache.mass_cache.put(key, masses)
+    
+    return StageArrays(
+        reagents=reagents,
+        masses=masses,
+        factors=scoring_engine.build_factor_matrix(reagents, factor_matrix)
+    )
+
+
+def build_trace_instrument_arrays(
+    composition_traces: Dict[str, Union[List[float], str, np.ndarray]],
+    sample_rate_hz: float,
+    flow_rate: Union[float, List[float], str, np.ndarray],
+    densities: Dict[str, float],
+    factor_matrix: Dict[str, Dict[str, float]],
+    method: str = "trapezoid",
+    dtype: str = "float32"
+) -> StageArrays:
+    """
+    由泵组成轨迹构建仪器分析阶段的数组输入（高分辨率积分模式）
+    
+    参数：
+        composition_traces: 各试剂的组成百分比轨迹（列表、数组或base64编码的二进制缓冲区）
+        sample_rate_hz: 采样频率（Hz）
+        flow_rate: 恒定流速，或同步采样的流速轨迹（mL/min）
+        method: "trapezoid" 或 "simpson"
+        dtype: 二进制缓冲区的数据类型（"float32"/"float64"）
+    
+    返回：
+        StageArrays: 试剂顺序与 composition_traces 一致
+    """
+    reagents = list(composition_traces)
+    if not np.isscalar(flow_rate):
+        flow_rate = trace_integration.as_trace_array(flow_rate, dtype)
+    
+    masses = trace_integration.calculate_trace_masses(
+        {r: trace_integration.as_trace_array(composition_traces[r], dtype) for r in reagents},
+        sample_rate_hz,
+        flow_rate,
+        densities,
+        method=method
+    )
+    
+    return StageArrays(
+        reagents=reagents,
+        masses=np.array([masses[r] for r in reagents], dtype=np.float64),
+        factors=scoring_engine.build_factor_matrix(reagents, factor_matrix)
+    )
+
+
+def build_prep_arrays(
+    volumes: Dict[str, float],
+    densities: Dict[str, float],
+    factor_matrix: Dict[str, Dict[str, float]]
+) -> StageArrays:
+    """
+    构建样品前处理阶段的数组输入（Layer 0 质量 + 因子矩阵）
+    
+    返回：
+        StageArrays: 试剂顺序与 volumes 一致
+    """
+    reagents = list(volumes)
+    density_vector = scoring_engine.build_density_vector(reagents, densities)
+    volume_vector = np.array([volumes[r] for r in reagents], dtype=np.float64)
+    
+    return StageArrays(
+        reagents=reagents,
+        masses=scoring_engine.prep_masses(volume_vector, density_vector),
+        factors=scoring_engine.build_factor_matrix(reagents, factor_matrix)
+    )
+
+
+def stage_sub_factors(stage: StageArrays) -> np.ndarray:
+    """
+    计算单个阶段的9个小因子得分（Layer 1，按质量向量和因子矩阵的内容缓存）
+    
+    返回：
+        np.ndarray: (9,) 小因子得分（只读）
+    """
+    key = scoring_cache.content_key(stage.masses, stage.factors)
+    scores = scoring_cache.sub_factor_cache.get(key)
+    if scores is None:
+        scores = scoring_cache.freeze(
+            scoring_engine.normalize_sub_factors(stage.masses, stage.factors)
+        )
+        scoring_cache.sub_factor_cache.put(key, scores)
+    return scores
+
+
+def resolve_scheme_weights(
+    safety_scheme: str = "PBT_Balanced",
+    health_scheme: str = "Absolute_Balance",
+    environment_scheme: str = "PBT_Balanced",
+    instrument_stage_scheme: str = "Balanced",
+    prep_stage_scheme: str = "Balanced",
+    final_scheme: str = "Standard"
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    校验权重方案名称并取出已编译的权重数组
+    
+    返回：
+        Tuple: (大因子权重矩阵(3, 9), 仪器阶段权重(6,), 前处理阶段权重(6,), 最终权重(2,))
+    """
+    return scheme_registry.resolve(
+        safety_scheme=safety_scheme,
+        health_scheme=health_scheme,
+        environment_scheme=environment_scheme,
+        instrument_stage_scheme=instrument_stage_scheme,
+        prep_stage_scheme=prep_stage_scheme,
+        final_scheme=final_scheme
+    )
+
+
+def format_full_score_result(
+    inst: StageArrays,
+    prep: StageArrays,
+    scores: ArrayScoreResult,
+    p_factor: float,
+    pretreatment_p_factor: float,
+    instrument_r_factor: float,
+    instrument_d_factor: float,
+    pretreatment_r_factor: float,
+    pretreatment_d_factor: float,
+    schemes: Dict[str, str]
+) -> Dict:
+    """
+    将单个方法的数组评分结果转换为 calculate_full_scores 的返回结构
+    
+    参数：
+        inst / prep: 两个阶段的数组输入（提供试剂名称和质量）
+        scores: 单个方法的数组评分结果（无批量维度）
+        schemes: 使用的权重方案名称
+    
+    返回：
+        Dict: 与 calculate_full_scores 相同的结果结构
+    """
+    return {
+        "instrument": {
+            "masses": scoring_engine.to_named_dict(inst.masses, inst.reagents),
+            "sub_factors": scoring_engine.to_named_dict(scores.inst_sub, SUB_FACTOR_NAMES),
+            "major_factors": scoring_engine.to_named_dict(scores.inst_major, MAJOR_FACTOR_NAMES),
+            "score1": round(float(scores.score1), 2)
+        },
+        "preparation": {
+            "masses": scoring_engine.to_named_dict(prep.masses, prep.reagents),
+            "sub_factors": scoring_engine.to_named_dict(scores.prep_sub, SUB_FACTOR_NAMES),
+            "major_factors": scoring_engine.to_named_dict(scores.prep_major, MAJOR_FACTOR_NAMES),
+            "score2": round(float(scores.score2), 2)
+        },
+        "merged": {
+            "sub_factors": {
+                k: round(v, 2)
+                for k, v in scoring_engine.to_named_dict(scores.merged_sub, SUB_FACTOR_NAMES).items()
+            }
+        },
+        "final": {
+            "score3": round(float(scores.score3), 2)
+        },
+        "additional_factors": {
+            "P": round(p_factor, 2),  # 能耗因子（兼容旧版，保留仪器分析P）
+            "instrument_P": round(p_factor, 2),  # 仪器分析P因子
+            "pretreatment_P": round(pretreatment_p_factor, 2),  # 前处理P因子
+            "instrument_R": round(instrument_r_factor, 2),  # 仪器分析R因子
+            "instrument_D": round(instrument_d_factor, 2),  # 仪器分析D因子
+            "pretreatment_R": round(pretreatment_r_factor, 2),  # 前处理R因子
+            "pretreatment_D": round(pretreatment_d_factor, 2)   # 前处理D因子
+        },
+        "schemes": dict(schemes)
+    }
+
+
 # ============================================================================
 # 完整评分流程封装
 # ============================================================================
@@ -546,6 +750,8 @@ def calculate_full_scores(
     """
     执行完整的评分流程，返回所有层级的评分结果
     
+    计算由 scoring_engine 的数组路径完成，本函数只负责字典与数组之间的转换
+    
     返回结构：
     {
         "instrument": {
@@ -568,152 +774,374 @@ def calculate_full_scores(
         }
     }
     """
-    # 打印接收到的P/R/D因子和权重方案
-    print("\n" + "=" * 80)
-    print("🎯 评分计算开始")
-    print(f"🔬 仪器分析阶段:")
-    print(f"   ⚡ P因子 (能耗): {p_factor:.2f}")
-    print(f"   ♻️ R因子 (可回收性): {instrument_r_factor:.2f}")
-    print(f"   🗑️ D因子 (可降解性): {instrument_d_factor:.2f}")
-    print(f"🧪 前处理阶段:")
-    print(f"   ⚡ P因子 (能耗): {pretreatment_p_factor:.2f}")
-    print(f"   ♻️ R因子 (可回收性): {pretreatment_r_factor:.2f}")
-    print(f"   🗑️ D因子 (可降解性): {pretreatment_d_factor:.2f}")
-    print(f"📋 权重方案:")
-    print(f"  - Safety: {safety_scheme}")
-    print(f"  - Health: {health_scheme}")
-    print(f"  - Environment: {environment_scheme}")
-    print(f"  - Instrument Stage: {instrument_stage_scheme}")
-    print(f"  - Prep Stage: {prep_stage_scheme}")
-    print(f"  - Final: {final_scheme}")
-    print("=" * 80 + "\n")
-    
-    # ========== 仪器分析阶段 ==========
-    
-    # Layer 0: 计算质量
-    inst_masses = calculate_gradient_integral(
-        instrument_time_points,
-        instrument_composition,
-        instrument_flow_rate,
-        instrument_densities,
-        instrument_curve_types  # 传递曲线类型
-    )
-    
-    print(f"🔍 仪器分析质量计算结果: {inst_masses}")
-    
-    # Layer 1: 小因子归一化（使用新公式）
-    inst_sub_scores = calculate_all_sub_factors(inst_masses, instrument_factor_matrix)
+    schemes = {
+        "safety_scheme": safety_scheme,
+        "health_scheme": health_scheme,
+        "environment_scheme": environment_scheme,
+        "instrument_stage_scheme": instrument_stage_scheme,
+        "prep_stage_scheme": prep_stage_scheme,
+        "final_scheme": final_scheme
+    }
     
-    print(f"🔍 仪器分析小因子得分: {inst_sub_scores}")
+    debug_payload(logger, "评分计算开始", lambda: {
+        "instrument_PRD": (p_factor, instrument_r_factor, instrument_d_factor),
+        "pretreatment_PRD": (pretreatment_p_factor, pretreatment_r_factor, pretreatment_d_factor),
+        "schemes": schemes
+    })
+    
+    # ========== Layer 0: 数组输入（质量、因子矩阵） ==========
+    with span("layer0.instrument"):
+        inst = build_instrument_arrays(
+            instrument_time_points,
+            instrument_composition,
+            instrument_flow_rate,
+            instrument_densities,
+            instrument_factor_matrix,
+            instrument_curve_types  # 传递曲线类型
+        )
+    
+    with span("layer0.preparation"):
+        prep = build_prep_arrays(prep_volumes, prep_densities, prep_factor_matrix)
+    
+    return score_stage_arrays(
+        inst,
+        prep,
+        p_factor=p_factor,
+        pretreatment_p_factor=pretreatment_p_factor,
+        instrument_r_factor=instrument_r_factor,
+        instrument_d_factor=instrument_d_factor,
+        pretreatment_r_factor=pretreatment_r_factor,
+        pretreatment_d_factor=pretreatment_d_factor,
+        schemes=schemes
+    )
+
+
+def score_stage_arrays(
+    inst: StageArrays,
+    prep: StageArrays,
+    p_factor: float,
+    pretreatment_p_factor: float,
+    instrument_r_factor: float,
+    instrument_d_factor: float,
+    pretreatment_r_factor: float,
+    pretreatment_d_factor: float,
+    schemes: Dict[str, str]
+) -> Dict:
+    """
+    由已构建的两阶段数组输入计算 Layer 1-5，返回结构同 calculate_full_scores
     
-    # Layer 3: 大因子合成
-    inst_major_S = calculate_major_factor(inst_sub_scores, "S", safety_scheme)
-    inst_major_H = calculate_major_factor(inst_sub_scores, "H", health_scheme)
-    inst_major_E = calculate_major_factor(inst_sub_scores, "E", environment_scheme)
-    inst_major_factors = {"S": inst_major_S, "H": inst_major_H, "E": inst_major_E}
+    用于 Layer 0 质量来自其他途径（如泵组成轨迹积分）的场景
+    """
+    debug_payload(logger, "Layer 0 质量(g)", lambda: {
+        "instrument": scoring_engine.to_named_dict(inst.masses, inst.reagents),
+        "preparation": scoring_engine.to_named_dict(prep.masses, prep.reagents)
+    })
     
-    print(f"🎯 仪器分析大因子得分: S={inst_major_S:.2f}, H={inst_major_H:.2f}, E={inst_major_E:.2f}")
+    major_weights, inst_stage_weights, prep_stage_weights, final_weights = resolve_scheme_weights(
+        **schemes
+    )
     
-    # Layer 4: Score₁（使用仪器分析阶段的R/D）
-    score1 = calculate_score1(
-        inst_major_factors,
-        p_factor,
-        instrument_r_factor,
-        instrument_d_factor,
-        instrument_stage_scheme
+    # ========== Layer 1-5: 数组评分 ==========
+    with span("layer1.sub_factors"):
+        inst_sub = stage_sub_factors(inst)
+        prep_sub = stage_sub_factors(prep)
+    
+    scores = scoring_engine.score_arrays(
+        inst,
+        prep,
+        np.array([p_factor, instrument_r_factor, instrument_d_factor]),
+        np.array([pretreatment_p_factor, pretreatment_r_factor, pretreatment_d_factor]),
+        major_weights,
+        inst_stage_weights,
+        prep_stage_weights,
+        final_weights,
+        inst_sub=inst_sub,
+        prep_sub=prep_sub
     )
     
-    print(f"📊 仪器分析阶段 Score₁ = {score1:.2f} (使用权重方案: {instrument_stage_scheme})")
+    debug_payload(logger, "评分结果", lambda: {
+        "score1": float(scores.score1),
+        "score2": float(scores.score2),
+        "score3": float(scores.score3)
+    })
+    
+    return format_full_score_result(
+        inst,
+        prep,
+        scores,
+        p_factor=p_factor,
+        pretreatment_p_factor=pretreatment_p_factor,
+        instrument_r_factor=instrument_r_factor,
+        instrument_d_factor=instrument_d_factor,
+        pretreatment_r_factor=pretreatment_r_factor,
+        pretreatment_d_factor=pretreatment_d_factor,
+        schemes=schemes
+    )
+
+
+# ============================================================================
+# 批量评分
+# ============================================================================
+
+def _prepare_method_arrays(
+    method: Dict,
+    compiled: weight_schemes.CompiledSchemes
+) -> Tuple[StageArrays, StageArrays, Tuple[int, ...], np.ndarray]:
+    """构建单个方法的 Layer 0 数组、6个权重方案ID和 (2, 3) 的P/R/D数组（输入错误时抛出异常）"""
+    inst = build_instrument_arrays(
+        method["instrument_time_points"],
+        method["instrument_composition"],
+        method["instrument_flow_rate"],
+        method["instrument_densities"],
+        method["instrument_factor_matrix"],
+        method.get("instrument_curve_types")
+    )
+    prep = build_prep_arrays(
+        method["prep_volumes"],
+        method["prep_densities"],
+        method["prep_factor_matrix"]
+    )
+    scheme_ids = compiled.scheme_ids(**{
+        key: method[key] for key in SCHEME_KEYS if key in method
+    })
+    prd = np.array([
+        [method["p_factor"], method["instrument_r_factor"], method["instrument_d_factor"]],
+        [method.get("pretreatment_p_factor", 0.0), method["pretreatment_r_factor"], method["pretreatment_d_factor"]]
+    ], dtype=np.float64)
+    return inst, prep, scheme_ids, prd
+
+
+def calculate_full_scores_batch(methods: List[Dict]) -> List[Dict]:
+    """
+    批量执行完整评分流程
     
-    # ========== 样品前处理阶段 ==========
+    所有方法共享一张去重后的试剂因子表，Layer 1-5 在整个批次上一次性向量化计算。
+    单个方法的输入错误只影响该方法本身，不会导致整个批次失败。
     
-    # Layer 0: 计算质量
-    prep_masses = calculate_prep_masses(prep_volumes, prep_densities)
+    参数：
+        methods: 方法列表，每项为 calculate_full_scores 的关键字参数字典
     
-    print(f"🔍 前处理质量计算结果: {prep_masses}")
+    返回：
+        List[Dict]: 与输入顺序一致的结果列表，每项为
+            {"index": i, "success": True, "data": {...}} 或
+            {"index": i, "success": False, "error": "..."}
+    """
+    results: List[Optional[Dict]] = [None] * len(methods)
+    valid = []  # (index, method, inst, prep, scheme_ids, prd)
+    compiled = scheme_registry.compiled  # 整个批次使用同一份编译结果，方案ID不会错位
+    
+    # Layer 0 及输入校验（逐个方法，错误单独记录）
+    with span("batch.layer0"):
+        for index, method in enumerate(methods):
+            try:
+                inst, prep, scheme_ids, prd = _prepare_method_arrays(method, compiled)
+            except (ValueError, KeyError, TypeError) as e:
+                if isinstance(e, KeyError):
+                    message = f"缺少参数 {e.args[0]}"
+                else:
+                    message = str(e)
+                results[index] = {"index": index, "success": False, "error": message}
+                continue
+            valid.append((index, method, inst, prep, scheme_ids, prd))
+    
+    if not valid:
+        return results
+    
+    # Layer 1-5：整个批次一次性计算
+    with span("batch.share_factors"):
+        stages = [item[2] for item in valid] + [item[3] for item in valid]
+        factor_table, row_indices = scoring_engine.share_factor_rows(stages)
+        masses = scoring_engine.scatter_masses(stages, row_indices, len(factor_table))
+    
+    count = len(valid)
+    inst_batch = StageArrays(reagents=[], masses=masses[:count], factors=factor_table)
+    prep_batch = StageArrays(reagents=[], masses=masses[count:], factors=factor_table)
+    
+    # 按方案ID一次性取出全部权重：(N, 6) → 每个类别一次花式索引
+    scheme_ids = np.array([item[4] for item in valid], dtype=np.intp)
+    major_weights, inst_stage_weights, prep_stage_weights, final_weights = compiled.weights_for_ids(scheme_ids.T)
+    prd = np.stack([item[5] for item in valid])
+    
+    scores = scoring_engine.score_arrays(
+        inst_batch,
+        prep_batch,
+        prd[:, 0],
+        prd[:, 1],
+        major_weights,
+        inst_stage_weights,
+        prep_stage_weights,
+        final_weights
+    )
     
-    # Layer 1: 小因子归一化（使用新公式）
-    prep_sub_scores = calculate_all_sub_factors(prep_masses, prep_factor_matrix)
+    for row, (index, method, inst, prep, _, _) in enumerate(valid):
+        schemes = dict(DEFAULT_SCHEMES)
+        schemes.update({key: method[key] for key in SCHEME_KEYS if key in method})
+        
+        results[index] = {
+            "index": index,
+            "success": True,
+            "data": format_full_score_result(
+                inst,
+                prep,
+                scores.item(row),
+                p_factor=float(prd[row, 0, 0]),
+                pretreatment_p_factor=float(prd[row, 1, 0]),
+                instrument_r_factor=float(prd[row, 0, 1]),
+                instrument_d_factor=float(prd[row, 0, 2]),
+                pretreatment_r_factor=float(prd[row, 1, 1]),
+                pretreatment_d_factor=float(prd[row, 1, 2]),
+                schemes=schemes
+            )
+        }
     
-    print(f"🔍 前处理小因子得分: {prep_sub_scores}")
+    return results
+
+
+# ============================================================================
+# 权重方案扫描
+# ============================================================================
+
+# 扫描维度顺序（与结果张量的轴一致）
+SWEEP_CATEGORIES = ("safety", "health", "environment", "instrument_stage", "prep_stage", "final")
+
+
+def sweep_weight_schemes(
+    instrument_time_points: List[float],
+    instrument_composition: Dict[str, List[float]],
+    instrument_flow_rate: float,
+    instrument_densities: Dict[str, float],
+    instrument_factor_matrix: Dict[str, Dict[str, float]],
+    prep_volumes: Dict[str, float],
+    prep_densities: Dict[str, float],
+    prep_factor_matrix: Dict[str, Dict[str, float]],
+    p_factor: float,
+    pretreatment_p_factor: float,
+    instrument_r_factor: float,
+    instrument_d_factor: float,
+    pretreatment_r_factor: float,
+    pretreatment_d_factor: float,
+    instrument_curve_types: List[str] = None,
+    percentiles: Tuple[float, ...] = (5, 25, 50, 75, 95),
+    include_values: bool = False,
+    **_ignored_schemes
+) -> Dict:
+    """
+    在所有权重方案组合下计算同一方法的 Score₃ 分布
     
-    # Layer 3: 大因子合成
-    prep_major_S = calculate_major_factor(prep_sub_scores, "S", safety_scheme)
-    prep_major_H = calculate_major_factor(prep_sub_scores, "H", health_scheme)
-    prep_major_E = calculate_major_factor(prep_sub_scores, "E", environment_scheme)
-    prep_major_factors = {"S": prep_major_S, "H": prep_major_H, "E": prep_major_E}
+    Layer 0-1（质量和小因子）只计算一次，随后用广播张量一次性得到
+    safety × health × environment × instrument_stage × prep_stage × final
+    全部组合（内置方案为 4⁶ = 4096 种，包含已注册的自定义方案）的 Score₃。
     
-    print(f"🎯 前处理大因子得分: S={prep_major_S:.2f}, H={prep_major_H:.2f}, E={prep_major_E:.2f}")
+    参数：
+        与 calculate_full_scores 相同（权重方案参数被忽略）
+        percentiles: 需要返回的百分位数
+        include_values: 是否返回完整的 Score₃ 张量（按 SWEEP_CATEGORIES 轴顺序展平）
     
-    # Layer 4: Score₂（使用前处理阶段的R/D/P）
-    score2 = calculate_score2(
-        prep_major_factors,
-        pretreatment_r_factor,
-        pretreatment_d_factor,
-        p_factor=pretreatment_p_factor,  # 使用传入的前处理阶段P因子
-        weight_scheme=prep_stage_scheme
+    返回：
+    {
+        "combinations": 4096,
+        "axes": {"safety": [...], ...},
+        "statistics": {"min", "max", "mean", "std", "percentiles": {"p5": ...}},
+        "argmax": {"score3": float, "schemes": {...}},  # Score₃最高（最不环保）的组合
+        "argmin": {"score3": float, "schemes": {...}},  # Score₃最低（最环保）的组合
+        "values": [...]  # 仅 include_values=True
+    }
+    """
+    inst = build_instrument_arrays(
+        instrument_time_points,
+        instrument_composition,
+        instrument_flow_rate,
+        instrument_densities,
+        instrument_factor_matrix,
+        instrument_curve_types
     )
+    prep = build_prep_arrays(prep_volumes, prep_densities, prep_factor_matrix)
     
-    print(f"📊 前处理阶段 Score₂ = {score2:.2f} (使用权重方案: {prep_stage_scheme})")
+    # Layer 1：只计算一次
+    inst_sub = stage_sub_factors(inst)
+    prep_sub = stage_sub_factors(prep)
     
-    # ========== Layer 2: 小因子加权合成（用于雷达图） ==========
-    merged_sub_scores = merge_sub_factors(
-        inst_sub_scores,
-        prep_sub_scores,
-        final_scheme
-    )
+    compiled = scheme_registry.compiled
+    axes = {category: compiled.names(category) for category in SWEEP_CATEGORIES}
     
-    # ========== Layer 5: 最终总分 ==========
-    score3 = calculate_score3(score1, score2, final_scheme)
+    # Layer 3：每个大因子在各自方案下的得分，(n_scheme, 2) 列为 (仪器, 前处理)
+    sub_scores = np.stack([inst_sub, prep_sub], axis=-1)
+    major = {
+        major_name: compiled.matrices[category] @ sub_scores
+        for category, major_name in (("safety", "S"), ("health", "H"), ("environment", "E"))
+    }
     
-    print(f"🏆 最终总分 Score₃ = {score3:.2f} (使用权重方案: {final_scheme})")
-    print(f"   仪器阶段贡献: {score1:.2f}, 前处理阶段贡献: {score2:.2f}")
-    print("=" * 80 + "\n")
+    inst_stage = compiled.matrices["instrument_stage"]
+    prep_stage = compiled.matrices["prep_stage"]
+    final = compiled.matrices["final"]
+    
+    # Layer 4：Score₁[s,h,e,i] 与 Score₂[s,h,e,j]
+    def stage_tensor(stage_weights: np.ndarray, column: int, prd: List[float]) -> np.ndarray:
+        return (
+            major["S"][:, None, None, None, column] * stage_weights[:, 0]
+            + major["H"][None, :, None, None, column] * stage_weights[:, 1]
+            + major["E"][None, None, :, None, column] * stage_weights[:, 2]
+            + stage_weights[:, 3:] @ np.asarray(prd, dtype=np.float64)
+        )
+    
+    score1 = stage_tensor(inst_stage, 0, [p_factor, instrument_r_factor, instrument_d_factor])
+    score2 = stage_tensor(prep_stage, 1, [pretreatment_p_factor, pretreatment_r_factor, pretreatment_d_factor])
+    
+    # Layer 5：Score₃[s,h,e,i,j,f]
+    score3 = (
+        score1[:, :, :, :, None, None] * final[:, 0]
+        + score2[:, :, :, None, :, None] * final[:, 1]
+    )
     
-    # 返回完整结果
-    return {
-        "instrument": {
-            "masses": inst_masses,
-            "sub_factors": inst_sub_scores,
-            "major_factors": inst_major_factors,
-            "score1": round(score1, 2)
-        },
-        "preparation": {
-            "masses": prep_masses,
-            "sub_factors": prep_sub_scores,
-            "major_factors": prep_major_factors,
-            "score2": round(score2, 2)
-        },
-        "merged": {
-            "sub_factors": {k: round(v, 2) for k, v in merged_sub_scores.items()}
-        },
-        "final": {
-            "score3": round(score3, 2)
-        },
-        "additional_factors": {
-            "P": round(p_factor, 2),  # 能耗因子（兼容旧版，保留仪器分析P）
-            "instrument_P": round(p_factor, 2),  # 仪器分析P因子
-            "pretreatment_P": round(pretreatment_p_factor, 2),  # 前处理P因子
-            "instrument_R": round(instrument_r_factor, 2),  # 仪器分析R因子
-            "instrument_D": round(instrument_d_factor, 2),  # 仪器分析D因子
-            "pretreatment_R": round(pretreatment_r_factor, 2),  # 前处理R因子
-            "pretreatment_D": round(pretreatment_d_factor, 2)   # 前处理D因子
-        },
-        "schemes": {
-            "safety_scheme": safety_scheme,
-            "health_scheme": health_scheme,
-            "environment_scheme": environment_scheme,
-            "instrument_stage_scheme": instrument_stage_scheme,
-            "prep_stage_scheme": prep_stage_scheme,
-            "final_scheme": final_scheme
+    def scheme_set(flat_index: int) -> Dict[str, str]:
+        position = np.unravel_index(flat_index, score3.shape)
+        return {
+            f"{category}_scheme": axes[category][i]
+            for category, i in zip(SWEEP_CATEGORIES, position)
         }
+    
+    values = score3.ravel()
+    highest = int(np.argmax(values))
+    lowest = int(np.argmin(values))
+    
+    result = {
+        "combinations": int(values.size),
+        "axes": axes,
+        "statistics": {
+            "min": round(float(values[lowest]), 2),
+            "max": round(float(values[highest]), 2),
+            "mean": round(float(values.mean()), 2),
+            "std": round(float(values.std()), 2),
+            "percentiles": {
+                f"p{p:g}": round(float(v), 2)
+                for p, v in zip(percentiles, np.percentile(values, percentiles))
+            }
+        },
+        "argmax": {"score3": round(float(values[highest]), 2), "schemes": scheme_set(highest)},
+        "argmin": {"score3": round(float(values[lowest]), 2), "schemes": scheme_set(lowest)}
     }
+    
+    if include_values:
+        result["values"] = np.round(values, 2).tolist()
+    
+    return result
 
 
 # ============================================================================
 # 工具函数
 # ============================================================================
 
+def run_with_schemes(schemes_state: Tuple, func, *args, **kwargs):
+    """
+    先按 scheme_registry.export() 的结果同步自定义权重方案，再执行 func
+    
+    进程池中的工作进程只在导入时编译了内置方案，提交任务时用它包装，
+    自定义方案变更后首个任务会触发一次同步（编译标识不变时不做任何事）
+    """
+    scheme_registry.sync(schemes_state)
+    return func(*args, **kwargs)
+
+
 def get_available_schemes() -> Dict[str, List[str]]:
     """
     获取所有可用的权重方案列表（供前端下拉框使用）
@@ -725,14 +1153,8 @@ def get_available_schemes() -> Dict[str, List[str]]:
         ...
     }
     """
-    return {
-        "safety": list(SAFETY_WEIGHTS.keys()),
-        "health": list(HEALTH_WEIGHTS.keys()),
-        "environment": list(ENVIRONMENT_WEIGHTS.keys()),
-        "instrument_stage": list(INSTRUMENT_STAGE_WEIGHTS.keys()),
-        "prep_stage": list(PREPARATION_STAGE_WEIGHTS.keys()),
-        "final": list(FINAL_WEIGHTS.keys())
-    }
+    compiled = scheme_registry.compiled
+    return {category: compiled.names(category) for category in weight_schemes.SCHEME_CATEGORIES}
 
 
 def get_scheme_weights(category: str, scheme: str) -> Dict:
@@ -746,21 +1168,4 @@ def get_scheme_weights(category: str, scheme: str) -> Dict:
     返回：
         Dict: 权重值字典
     """
-    weight_maps = {
-        "safety": SAFETY_WEIGHTS,
-        "health": HEALTH_WEIGHTS,
-        "environment": ENVIRONMENT_WEIGHTS,
-        "instrument_stage": INSTRUMENT_STAGE_WEIGHTS,
-        "prep_stage": PREPARATION_STAGE_WEIGHTS,
-        "final": FINAL_WEIGHTS
-    }
-    
-    if category not in weight_maps:
-        raise ValueError(f"未知的权重类别：{category}")
-    
-    weight_dict = weight_maps[category]
-    
-    if scheme not in weight_dict:
-        raise ValueError(f"类别 {category} 中未找到方案：{scheme}")
-    
-    return weight_dict[scheme]
+    return scheme_registry.get_weights(category, scheme)
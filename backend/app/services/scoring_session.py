@@ -0,0 +1,346 @@
+"""
+增量评分会话模块
+
+会话保存一个方法的全部输入和各层中间结果（质量、小因子、大因子、阶段得分）。
+收到变更（delta）后只重算受影响的层，并返回结果中发生变化的字段，
+用于前端滑块等逐项调整的场景。
+
+依赖关系：
+    仪器分析输入 ──→ L0/L1 仪器 ──→ L3 仪器大因子 ──→ L4 Score₁ ──┐
+    S/H/E 权重方案 ─────────────────↗                    ↑          ├→ L5 Score₃
+    P/R/D 与仪器阶段方案 ────────────────────────────────┘          │
+    前处理输入 ────→ L0/L1 前处理 ─→ L3 前处理大因子 ─→ L4 Score₂ ──┘
+    最终方案 ──→ L2 合成小因子 与 L5 Score₃
+
+权重按方案名称从 scheme_registry.compiled 取出，状态中记录编译标识；
+自定义方案被修改后（标识变化）重新取权重，只重算权重实际变化的层。
+会话正在使用的方案被删除时继续按原权重评分。
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import scoring_engine, scoring_service
+from app.services.weight_schemes import SCHEME_CATEGORIES
+
+
+# 各类输入字段
+_INSTRUMENT_INPUTS = {
+    "instrument_time_points", "instrument_composition", "instrument_flow_rate",
+    "instrument_densities", "instrument_curve_types"
+}
+_PREP_INPUTS = {"prep_volumes", "prep_densities"}
+_MAJOR_SCHEMES = {"safety_scheme", "health_scheme", "environment_scheme"}
+_SCORE1_INPUTS = {"p_factor", "instrument_r_factor", "instrument_d_factor", "instrument_stage_scheme"}
+_SCORE2_INPUTS = {"pretreatment_p_factor", "pretreatment_r_factor", "pretreatment_d_factor", "prep_stage_scheme"}
+# 方案字段 → 权重类别
+_SCHEME_CATEGORY = dict(zip(scoring_service.SCHEME_KEYS, SCHEME_CATEGORIES))
+
+# 按试剂合并（而不是整体替换）的字典字段
+_MERGED_INPUTS = {
+    "instrument_composition", "instrument_densities", "instrument_factor_matrix",
+    "prep_volumes", "prep_densities", "prep_factor_matrix"
+}
+
+_ALL_INPUTS = (
+    _INSTRUMENT_INPUTS | _PREP_INPUTS | _MAJOR_SCHEMES | _SCORE1_INPUTS | _SCORE2_INPUTS
+    | {"instrument_factor_matrix", "prep_factor_matrix", "final_scheme"}
+)
+
+
+def _flatten(data: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """将嵌套字典展开为 {"a.b.c": value}"""
+    flat = {}
+    for key, value in data.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path + "."))
+        else:
+            flat[path] = value
+    return flat
+
+
+class ScoringSession:
+    """保存单个方法各层中间结果的评分会话"""
+
+    def __init__(self, inputs: Dict[str, Any], session_id: Optional[str] = None):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.version = 0
+        self.last_access = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.inputs = dict(scoring_service.DEFAULT_SCHEMES)
+        self.inputs.update(inputs)
+        self.inputs.setdefault("pretreatment_p_factor", 0.0)
+        self.inputs.setdefault("instrument_curve_types", None)
+
+        self._state: Dict[str, Any] = self._recompute(self.inputs, set(_ALL_INPUTS), {})[0]
+        self.result = self._format(self.inputs, self._state)
+
+    # ------------------------------------------------------------------
+    # 公共接口
+    # ------------------------------------------------------------------
+
+    def update(self, delta: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        应用输入变更，只重算受影响的层
+
+        参数：
+            delta: 变更的输入字段（calculate_full_scores 的参数名）；
+                   组成、密度、体积和因子矩阵按试剂合并，值为 None 的试剂被移除
+
+        返回：
+        {
+            "version": int,
+            "recomputed": ["layer4.score1", "layer5.score3", ...],
+            "changes": {"instrument.score1": 43.5, ...}  # 变化的结果字段（被移除的为 None）
+        }
+        """
+        unknown = set(delta) - _ALL_INPUTS
+        if unknown:
+            raise ValueError(f"不支持的会话参数：{', '.join(sorted(unknown))}")
+
+        with self._lock:
+            inputs = dict(self.inputs)
+            changed = set()
+            for key, value in delta.items():
+                if key in _MERGED_INPUTS and value is not None:
+                    merged = dict(inputs[key])
+                    for reagent, reagent_value in value.items():
+                        if reagent_value is None:
+                            merged.pop(reagent, None)
+                        else:
+                            merged[reagent] = reagent_value
+                    value = merged
+                if inputs.get(key) != value:
+                    inputs[key] = value
+                    changed.add(key)
+
+            # 计算失败时保持原状态不变
+            state, recomputed = self._recompute(inputs, changed, self._state)
+            result = self._format(inputs, state)
+
+            before = _flatten(self.result)
+            after = _flatten(result)
+            changes = {path: value for path, value in after.items() if before.get(path) != value}
+            changes.update({path: None for path in before.keys() - after.keys()})
+
+            self.inputs = inputs
+            self._state = state
+            self.result = result
+            if changed or recomputed:
+                self.version += 1
+            self.last_access = time.monotonic()
+
+            return {"version": self.version, "recomputed": recomputed, "changes": changes}
+
+    def refresh(self) -> Optional[Dict[str, Any]]:
+        """权重方案的编译结果变化后按新权重重算；未变化时返回 None"""
+        if self._state["scheme_token"] == scoring_service.scheme_registry.compiled.token:
+            return None
+        return self.update({})
+
+    # ------------------------------------------------------------------
+    # 分层重算
+    # ------------------------------------------------------------------
+
+    def _recompute(self, inputs: Dict[str, Any], changed: set, previous: Dict[str, Any]):
+        """根据变更字段重算依赖层，返回 (新状态, 重算的层列表)"""
+        state = dict(previous)
+        changed = set(changed)
+        recomputed: List[str] = []
+
+        def dirty(*names: str) -> bool:
+            return any(name in recomputed for name in names)
+
+        # Layer 0/1：仪器分析
+        if changed & _INSTRUMENT_INPUTS:
+            state["inst"] = scoring_service.build_instrument_arrays(
+                inputs["instrument_time_points"],
+                inputs["instrument_composition"],
+                inputs["instrument_flow_rate"],
+                inputs["instrument_densities"],
+                inputs["instrument_factor_matrix"],
+                inputs["instrument_curve_types"]
+            )
+            recomputed.append("layer0.instrument")
+        elif "instrument_factor_matrix" in changed:
+            inst = state["inst"]
+            state["inst"] = scoring_engine.StageArrays(
+                reagents=inst.reagents,
+                masses=inst.masses,
+                factors=scoring_engine.build_factor_matrix(inst.reagents, inputs["instrument_factor_matrix"])
+            )
+        if "instrument_factor_matrix" in changed or dirty("layer0.instrument"):
+            state["inst_sub"] = scoring_service.stage_sub_factors(state["inst"])
+            recomputed.append("layer1.instrument")
+
+        # Layer 0/1：前处理
+        if changed & _PREP_INPUTS:
+            state["prep"] = scoring_service.build_prep_arrays(
+                inputs["prep_volumes"], inputs["prep_densities"], inputs["prep_factor_matrix"]
+            )
+            recomputed.append("layer0.preparation")
+        elif "prep_factor_matrix" in changed:
+            prep = state["prep"]
+            state["prep"] = scoring_engine.StageArrays(
+                reagents=prep.reagents,
+                masses=prep.masses,
+                factors=scoring_engine.build_factor_matrix(prep.reagents, inputs["prep_factor_matrix"])
+            )
+        if "prep_factor_matrix" in changed or dirty("layer0.preparation"):
+            state["prep_sub"] = scoring_service.stage_sub_factors(state["prep"])
+            recomputed.append("layer1.preparation")
+
+        # 权重方案：方案名称或编译结果变化时重新取权重，权重变化的方案按变更处理
+        changed = self._resolve_weights(inputs, changed, state)
+
+        # Layer 3：大因子
+        if changed & _MAJOR_SCHEMES or dirty("layer1.instrument"):
+            state["inst_major"] = scoring_engine.major_factors(state["major_weights"], state["inst_sub"])
+            recomputed.append("layer3.instrument")
+        if changed & _MAJOR_SCHEMES or dirty("layer1.preparation"):
+            state["prep_major"] = scoring_engine.major_factors(state["major_weights"], state["prep_sub"])
+            recomputed.append("layer3.preparation")
+
+        # Layer 4：阶段得分
+        if changed & _SCORE1_INPUTS or dirty("layer3.instrument"):
+            state["score1"] = scoring_engine.stage_score(
+                state["inst_major"],
+                np.array([inputs["p_factor"], inputs["instrument_r_factor"], inputs["instrument_d_factor"]]),
+                state["inst_stage_weights"]
+            )
+            recomputed.append("layer4.score1")
+        if changed & _SCORE2_INPUTS or dirty("layer3.preparation"):
+            state["score2"] = scoring_engine.stage_score(
+                state["prep_major"],
+                np.array([
+                    inputs["pretreatment_p_factor"],
+                    inputs["pretreatment_r_factor"],
+                    inputs["pretreatment_d_factor"]
+                ]),
+                state["prep_stage_weights"]
+            )
+            recomputed.append("layer4.score2")
+
+        # Layer 2 / Layer 5
+        if "final_scheme" in changed or dirty("layer1.instrument", "layer1.preparation"):
+            w_inst, w_prep = state["final_weights"]
+            state["merged_sub"] = state["inst_sub"] * w_inst + state["prep_sub"] * w_prep
+            recomputed.append("layer2.merged")
+        if "final_scheme" in changed or dirty("layer4.score1", "layer4.score2"):
+            w_inst, w_prep = state["final_weights"]
+            state["score3"] = state["score1"] * w_inst + state["score2"] * w_prep
+            recomputed.append("layer5.score3")
+
+        return state, recomputed
+
+    @staticmethod
+    def _resolve_weights(inputs: Dict[str, Any], changed: set, state: Dict[str, Any]) -> set:
+        """
+        更新状态中的权重数组，返回加入了权重变化方案字段的变更集合
+
+        新选择的方案不存在时抛出 ValueError；已在使用的方案被删除时保留原权重
+        """
+        compiled = scoring_service.scheme_registry.compiled
+        if not changed & _SCHEME_CATEGORY.keys() and state.get("scheme_token") == compiled.token:
+            return changed
+
+        weights = dict(state.get("scheme_weights", {}))
+        for key, category in _SCHEME_CATEGORY.items():
+            try:
+                row = compiled.matrices[category][compiled.scheme_id(category, inputs[key])]
+            except ValueError:
+                if key in changed:
+                    raise
+                continue
+            if key in changed or not np.array_equal(row, weights[key]):
+                weights[key] = row
+                changed.add(key)
+
+        state["scheme_token"] = compiled.token
+        state["scheme_weights"] = weights
+        state["major_weights"] = np.stack([
+            weights["safety_scheme"], weights["health_scheme"], weights["environment_scheme"]
+        ])
+        state["inst_stage_weights"] = weights["instrument_stage_scheme"]
+        state["prep_stage_weights"] = weights["prep_stage_scheme"]
+        state["final_weights"] = weights["final_scheme"]
+        return changed
+
+    @staticmethod
+    def _format(inputs: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
+        """将会话状态转换为 calculate_full_scores 的返回结构"""
+        scores = scoring_engine.ArrayScoreResult(
+            inst_sub=state["inst_sub"],
+            prep_sub=state["prep_sub"],
+            inst_major=state["inst_major"],
+            prep_major=state["prep_major"],
+            score1=state["score1"],
+            score2=state["score2"],
+            merged_sub=state["merged_sub"],
+            score3=state["score3"]
+        )
+        return scoring_service.format_full_score_result(
+            state["inst"],
+            state["prep"],
+            scores,
+            p_factor=inputs["p_factor"],
+            pretreatment_p_factor=inputs["pretreatment_p_factor"],
+            instrument_r_factor=inputs["instrument_r_factor"],
+            instrument_d_factor=inputs["instrument_d_factor"],
+            pretreatment_r_factor=inputs["pretreatment_r_factor"],
+            pretreatment_d_factor=inputs["pretreatment_d_factor"],
+            schemes={key: inputs[key] for key in scoring_service.SCHEME_KEYS}
+        )
+
+
+class SessionStore:
+    """评分会话存储（数量上限 + 空闲超时，超出上限时淘汰最久未访问的会话）"""
+
+    def __init__(self, max_sessions: int, ttl_seconds: float):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, ScoringSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, inputs: Dict[str, Any]) -> ScoringSession:
+        """创建会话并完成首次完整计算"""
+        session = ScoringSession(inputs)
+        with self._lock:
+            self._expire()
+            self._sessions[session.session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> ScoringSession:
+        """获取会话，不存在或已过期时抛出 KeyError"""
+        with self._lock:
+            self._expire()
+            session = self._sessions[session_id]
+            self._sessions.move_to_end(session_id)
+            session.last_access = time.monotonic()
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        """删除会话，返回是否存在"""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _expire(self) -> None:
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if oldest.last_access >= deadline:
+                break
+            del self._sessions[oldest_id]
+
+
+# 全局会话存储
+session_store = SessionStore(settings.SCORING_SESSION_MAX, settings.SCORING_SESSION_TTL_SECONDS)
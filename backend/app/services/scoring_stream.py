@@ -0,0 +1,129 @@
+"""
+NDJSON流式批量评分模块
+
+请求体为换行分隔的JSON（每行一个方法，结构同 FullScoreRequest），响应同样为NDJSON，
+每行一个结果：
+    {"index": i, "success": true, "data": {...}} 或 {"index": i, "success": false, "error": "..."}
+
+- 请求体按块读取、按行切分，不缓存整个请求体
+- 每累积 batch_size 个方法调用一次批量评分，并立即输出该批结果
+- 输出由响应方拉取：客户端读取变慢时生成器暂停，也就不再读取请求体（背压），
+  内存占用只与 batch_size 和单行长度上限有关
+"""
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services import scoring_service
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes],
+    max_line_bytes: int
+) -> AsyncIterator[Optional[bytes]]:
+    """
+    将字节块流切分为行
+
+    超过 max_line_bytes 的行不会被缓存，以 None 代替输出（调用方记为该行出错）。
+
+    参数：
+        chunks: 请求体字节块的异步迭代器
+        max_line_bytes: 单行最大字节数
+
+    返回：
+        AsyncIterator[Optional[bytes]]: 各行内容（不含换行符），超长行为 None
+    """
+    buffer = bytearray()
+    overflow = False
+
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            piece = chunk[start:] if end < 0 else chunk[start:end]
+
+            if not overflow:
+                if len(buffer) + len(piece) > max_line_bytes:
+                    overflow = True
+                    buffer.clear()
+                else:
+                    buffer += piece
+
+            if end < 0:
+                break
+
+            yield None if overflow else bytes(buffer)
+            buffer.clear()
+            overflow = False
+            start = end + 1
+
+    if overflow:
+        yield None
+    elif buffer:
+        yield bytes(buffer)
+
+
+def _score_batch(pending: List[Tuple[int, Any]]) -> bytes:
+    """对一批已解析的方法评分，返回该批结果的NDJSON字节"""
+    valid = [(index, item) for index, item in pending if isinstance(item, dict)]
+    scored = dict(zip(
+        (index for index, _ in valid),
+        scoring_service.calculate_full_scores_batch([item for _, item in valid])
+    ))
+
+    lines = []
+    for index, item in pending:
+        if index in scored:
+            result = scored[index]
+            result["index"] = index
+        else:
+            result = {"index": index, "success": False, "error": item}
+        lines.append(json.dumps(result, ensure_ascii=False))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def score_ndjson_stream(
+    chunks: AsyncIterator[bytes],
+    parse: Callable[[bytes], Dict[str, Any]],
+    batch_size: int,
+    max_line_bytes: int,
+    run: Optional[Callable[..., Awaitable[bytes]]] = None
+) -> AsyncIterator[bytes]:
+    """
+    流式批量评分
+
+    参数：
+        chunks: 请求体字节块的异步迭代器
+        parse: 将一行解析为 calculate_full_scores 关键字参数的函数，输入无效时抛出 ValueError
+        batch_size: 每批评分的方法数
+        max_line_bytes: 单行最大字节数
+        run: 执行每批评分的异步函数 run(func, *args)（如工作池），默认在当前线程直接执行
+
+    返回：
+        AsyncIterator[bytes]: 每批结果的NDJSON字节（空行不计入序号）
+    """
+    async def score(batch: List[Tuple[int, Any]]) -> bytes:
+        if run is None:
+            return _score_batch(batch)
+        return await run(_score_batch, batch)
+
+    pending: List[Tuple[int, Any]] = []  # (序号, 关键字参数 或 错误信息)
+    index = 0
+
+    async for line in iter_ndjson_lines(chunks, max_line_bytes):
+        if line is None:
+            pending.append((index, f"单行超过 {max_line_bytes} 字节上限"))
+        elif not line.strip():
+            continue
+        else:
+            try:
+                pending.append((index, parse(line)))
+            except ValueError as e:
+                pending.append((index, str(e)))
+        index += 1
+
+        if len(pending) >= batch_size:
+            yield await score(pending)
+            pending = []
+
+    if pending:
+        yield await score(pending)
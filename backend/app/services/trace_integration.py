@@ -0,0 +1,187 @@
+"""
+泵组成轨迹（pump trace）数值积分模块
+
+仪器导出的实际泵组成轨迹以10-100 Hz均匀采样，60分钟的运行每个通道可达数十万点。
+本模块用向量化的梯形/Simpson法则对轨迹积分，并按块（chunk）处理：
+每次只把一块样本转换为float64参与计算，内存占用与轨迹长度无关。
+
+质量计算：
+    m_r = ρ_r × ∫ Q(t) × c_r(t) / 100 dt
+    其中 Q 为流速（mL/min，常数或同步采样的轨迹），c_r 为组成百分比轨迹，t 的单位为分钟
+"""
+import base64
+from typing import Dict, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app.core.config import settings
+
+
+SUPPORTED_DTYPES = {"float32": "<f4", "float64": "<f8"}
+INTEGRATION_METHODS = ("trapezoid", "simpson")
+
+
+def decode_trace_buffer(data: Union[bytes, str], dtype: str = "float32") -> np.ndarray:
+    """
+    将小端序 float32/float64 二进制数据解码为数组（不复制数据）
+
+    参数：
+        data: 原始字节，或其base64编码字符串
+        dtype: "float32" 或 "float64"
+
+    返回：
+        np.ndarray: 只读的一维数组
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"不支持的数据类型：{dtype}，可选 {', '.join(SUPPORTED_DTYPES)}")
+    if isinstance(data, str):
+        data = base64.b64decode(data, validate=True)
+
+    itemsize = np.dtype(SUPPORTED_DTYPES[dtype]).itemsize
+    if len(data) % itemsize:
+        raise ValueError(f"二进制数据长度 {len(data)} 不是 {dtype} 元素大小 {itemsize} 的整数倍")
+    return np.frombuffer(data, dtype=SUPPORTED_DTYPES[dtype])
+
+
+def as_trace_array(values: Union[Sequence[float], str, np.ndarray], dtype: str = "float32") -> np.ndarray:
+    """
+    将轨迹输入统一为一维数组
+
+    字符串视为base64编码的二进制缓冲区（按 dtype 解码），数组原样返回，
+    列表转换为float64数组
+    """
+    if isinstance(values, str):
+        return decode_trace_buffer(values, dtype)
+    if isinstance(values, np.ndarray):
+        return values
+    return np.asarray(values, dtype=np.float64)
+
+
+def _chunk_bounds(num_intervals: int, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """按区间数切块，返回 (起点, 终点) 样本下标，相邻块共享边界样本"""
+    for start in range(0, num_intervals, chunk_size):
+        yield start, min(start + chunk_size, num_intervals)
+
+
+def _load_chunk(
+    samples: np.ndarray,
+    weights: Optional[np.ndarray],
+    start: int,
+    end: int
+) -> np.ndarray:
+    """取 [start, end] 闭区间的样本（转换为float64），有权重轨迹时逐点相乘"""
+    chunk = np.asarray(samples[start:end + 1], dtype=np.float64)
+    if weights is not None:
+        chunk = chunk * np.asarray(weights[start:end + 1], dtype=np.float64)
+    return chunk
+
+
+def _trapezoid(samples, weights, dx, start, end, chunk_size) -> float:
+    total = 0.0
+    for lo, hi in _chunk_bounds(end - start, chunk_size):
+        chunk = _load_chunk(samples, weights, start + lo, start + hi)
+        total += chunk.sum() - 0.5 * (chunk[0] + chunk[-1])
+    return total * dx
+
+
+def _simpson(samples, weights, dx, start, end, chunk_size) -> float:
+    """复合Simpson 1/3法则，要求 (end - start) 为偶数，块大小取偶数保证每块可独立求和"""
+    total = 0.0
+    for lo, hi in _chunk_bounds(end - start, chunk_size):
+        chunk = _load_chunk(samples, weights, start + lo, start + hi)
+        total += chunk[0] + chunk[-1] + 4.0 * chunk[1:-1:2].sum() + 2.0 * chunk[2:-1:2].sum()
+    return total * dx / 3.0
+
+
+def integrate_trace(
+    samples: np.ndarray,
+    dx: float,
+    weights: Optional[np.ndarray] = None,
+    method: str = "trapezoid",
+    chunk_size: Optional[int] = None
+) -> float:
+    """
+    对均匀采样的轨迹积分：∫ y(t) × w(t) dt
+
+    Simpson法则在区间数为奇数时，最后3个区间使用Simpson 3/8法则；
+    只有1个区间时退化为梯形法则。
+
+    参数：
+        samples: 一维样本数组（可为内存映射或只读缓冲区）
+        dx: 采样间隔
+        weights: 与 samples 等长的逐点权重（如流速轨迹），可选
+        method: "trapezoid" 或 "simpson"
+        chunk_size: 每块的区间数（默认 settings.PUMP_TRACE_CHUNK_SIZE）
+
+    返回：
+        float: 积分值
+    """
+    if method not in INTEGRATION_METHODS:
+        raise ValueError(f"未知的积分方法：{method}，可选 {', '.join(INTEGRATION_METHODS)}")
+    if samples.ndim != 1:
+        raise ValueError("轨迹数据必须是一维数组")
+    if weights is not None and len(weights) != len(samples):
+        raise ValueError(f"权重轨迹长度 {len(weights)} 与样本长度 {len(samples)} 不一致")
+
+    num_intervals = len(samples) - 1
+    if num_intervals < 1:
+        return 0.0
+
+    chunk_size = chunk_size or settings.PUMP_TRACE_CHUNK_SIZE
+    chunk_size = max(2, chunk_size - chunk_size % 2)
+
+    if method == "trapezoid" or num_intervals == 1:
+        return _trapezoid(samples, weights, dx, 0, num_intervals, chunk_size)
+
+    if num_intervals % 2 == 0:
+        return _simpson(samples, weights, dx, 0, num_intervals, chunk_size)
+
+    # 奇数个区间：前面的偶数个区间用1/3法则，最后3个区间用3/8法则
+    head = _simpson(samples, weights, dx, 0, num_intervals - 3, chunk_size) if num_intervals > 3 else 0.0
+    tail = _load_chunk(samples, weights, num_intervals - 3, num_intervals)
+    return head + 3.0 * dx / 8.0 * (tail[0] + 3.0 * tail[1] + 3.0 * tail[2] + tail[3])
+
+
+def calculate_trace_masses(
+    compositions: Dict[str, np.ndarray],
+    sample_rate_hz: float,
+    flow_rate: Union[float, np.ndarray],
+    reagent_densities: Dict[str, float],
+    method: str = "trapezoid",
+    chunk_size: Optional[int] = None
+) -> Dict[str, float]:
+    """
+    由泵组成轨迹计算各试剂的总质量
+
+    参数：
+        compositions: 各试剂的组成百分比轨迹（0-100），均匀采样且等长
+        sample_rate_hz: 采样频率（Hz）
+        flow_rate: 流速（mL/min），常数或与组成轨迹同步采样的流速轨迹
+        reagent_densities: 试剂密度（g/mL）
+        method: "trapezoid" 或 "simpson"
+        chunk_size: 每块的区间数
+
+    返回：
+        Dict[str, float]: 各试剂的总质量（克）
+    """
+    if sample_rate_hz <= 0:
+        raise ValueError("采样频率必须大于0")
+
+    lengths = {len(trace) for trace in compositions.values()}
+    if len(lengths) > 1:
+        raise ValueError("各试剂的组成轨迹长度不一致")
+
+    flow_trace = None if np.isscalar(flow_rate) else np.asarray(flow_rate)
+    dx = 1.0 / (sample_rate_hz * 60.0)  # 采样间隔（分钟）
+
+    masses = {}
+    for reagent, trace in compositions.items():
+        if reagent not in reagent_densities:
+            raise ValueError(f"缺少试剂 {reagent} 的密度数据")
+
+        integral = integrate_trace(trace, dx, weights=flow_trace, method=method, chunk_size=chunk_size)
+        if flow_trace is None:
+            integral *= flow_rate
+        masses[reagent] = integral / 100.0 * reagent_densities[reagent]
+
+    return masses
@@ -0,0 +1,315 @@
+"""
+原始信号存储模块
+
+检测器原始信号以二进制请求体上传（小端 float32/float64 缓冲区，或 .npy 文件），
+边接收边写入 TRACE_STORAGE_DIR 下的文件，不经过JSON和Python列表；
+接收的数据按块交给工作线程检查（只接受有限值，NaN/inf 在上传时即被拒绝）并写入，不阻塞事件循环；
+元数据（文件名、数据类型、采样点数、采样频率、起始时间）记录在 HPLCAnalysis.raw_data["trace"] 中。
+
+分析时以 np.memmap 只读映射文件，信号数据由操作系统按需分页读入，
+不在请求之间常驻内存，也不会转换为Python对象。
+
+文件先写入临时文件（.part），校验通过后改名；记录更新提交成功后才删除被替换的旧文件。
+"""
+import asyncio
+import io
+import os
+import uuid
+from typing import Any, AsyncIterable, Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.database.models import HPLCAnalysis
+from app.services.chromatogram import process_chromatogram
+from app.services.trace_integration import SUPPORTED_DTYPES
+
+
+TRACE_FILE_SUFFIX = ".trace"
+PYRAMID_FILE_SUFFIX = ".lod.npy"
+NPY_MAGIC = b"\x93NUMPY"
+# .npy 头部（魔数、版本、长度字段和字典）的最大字节数
+_NPY_MAX_HEADER_BYTES = 65536
+# 接收的数据累积到该字节数后交给工作线程检查并写入
+_WRITE_BLOCK_BYTES = 1 << 20
+
+
+class TraceTooLargeError(ValueError):
+    """上传的信号超过 TRACE_UPLOAD_MAX_BYTES"""
+
+
+def trace_directory() -> str:
+    return os.path.abspath(settings.TRACE_STORAGE_DIR)
+
+
+def trace_path(meta: Dict[str, Any]) -> str:
+    """元数据对应的文件路径（文件名只能是存储目录下的文件，防止路径穿越）"""
+    file_name = meta["file"]
+    if os.path.basename(file_name) != file_name or not file_name.endswith(TRACE_FILE_SUFFIX):
+        raise ValueError(f"无效的信号文件名：{file_name}")
+    return os.path.join(trace_directory(), file_name)
+
+
+def pyramid_path(meta: Dict[str, Any]) -> str:
+    """信号的降采样金字塔文件路径（见 trace_view）"""
+    return trace_path(meta) + PYRAMID_FILE_SUFFIX
+
+
+def _parse_npy_header(head: bytes) -> Optional[Tuple[str, int, int]]:
+    """
+    解析 .npy 头部
+
+    返回：
+        (dtype, 元素数, 头部字节数)；头部尚未接收完整时返回 None
+
+    异常：
+        ValueError: 头部无效，或不是小端 float32/float64 的一维数组
+    """
+    if len(head) < 10:
+        return None
+    major = head[6]
+    if major == 1:
+        header_bytes = 10 + int.from_bytes(head[8:10], "little")
+    elif major in (2, 3):
+        if len(head) < 12:
+            return None
+        header_bytes = 12 + int.from_bytes(head[8:12], "little")
+    else:
+        raise ValueError(f"不支持的 .npy 版本：{major}")
+    if header_bytes > _NPY_MAX_HEADER_BYTES:
+        raise ValueError(".npy 头部过大")
+    if len(head) < header_bytes:
+        return None
+
+    stream = io.BytesIO(bytes(head[:header_bytes]))
+    np.lib.format.read_magic(stream)
+    if major == 1:
+        shape, _, descr = np.lib.format.read_array_header_1_0(stream)
+    else:
+        shape, _, descr = np.lib.format.read_array_header_2_0(stream)
+
+    dtype = next((name for name, code in SUPPORTED_DTYPES.items() if descr == np.dtype(code)), None)
+    if dtype is None:
+        raise ValueError(f".npy 数据类型为 {descr.str}，仅支持小端 float32/float64")
+    if len(shape) != 1:
+        raise ValueError(f".npy 数组形状为 {shape}，应为一维信号")
+    return dtype, int(shape[0]), header_bytes
+
+
+def _write_block(out, block: bytes, dtype: str, first_sample: int) -> None:
+    """检查一块采样点均为有限值后写入文件（在工作线程中调用）"""
+    values = np.frombuffer(block, dtype=SUPPORTED_DTYPES[dtype])
+    invalid = np.flatnonzero(~np.isfinite(values))
+    if invalid.size:
+        index = int(invalid[0])
+        raise ValueError(f"第 {first_sample + index} 个采样点为 {values[index]}，信号只能包含有限值")
+    out.write(block)
+
+
+async def save_trace(
+    chunks: AsyncIterable[bytes],
+    sample_rate_hz: float,
+    start_time: float = 0.0,
+    dtype: str = "float32",
+    max_bytes: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    将上传的信号逐块写入存储目录
+
+    参数：
+        chunks: 请求体数据块（如 request.stream()）
+        dtype: 原始缓冲区的数据类型；以 .npy 魔数开头的数据按其头部的类型和长度读取
+        max_bytes: 信号数据的最大字节数，默认 TRACE_UPLOAD_MAX_BYTES
+
+    返回：
+        信号元数据 {"file", "format", "dtype", "num_samples", "sample_rate_hz", "start_time", "duration_min", "bytes"}
+
+    异常：
+        TraceTooLargeError: 超过最大字节数
+        ValueError: 数据类型不支持、长度不是元素大小的整数倍、少于3个采样点、包含 NaN/inf，
+                    或 .npy 头部无效/数据不完整
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"不支持的数据类型：{dtype}，可选 {', '.join(SUPPORTED_DTYPES)}")
+    if sample_rate_hz <= 0:
+        raise ValueError("采样频率必须大于0")
+    max_bytes = max_bytes or settings.TRACE_UPLOAD_MAX_BYTES
+
+    directory = trace_directory()
+    os.makedirs(directory, exist_ok=True)
+    file_name = f"{uuid.uuid4().hex}{TRACE_FILE_SUFFIX}"
+    path = os.path.join(directory, file_name)
+    temp_path = path + ".part"
+
+    head = bytearray()  # 数据开始之前缓存的字节（用于识别 .npy 头部）
+    pending = bytearray()  # 已接收、尚未写入文件的数据
+    expected = None  # .npy 头部声明的元素数
+    file_format = None
+    written = 0
+    flushed_samples = 0
+
+    def receive(data) -> None:
+        nonlocal written
+        written += len(data)
+        if written > max_bytes:
+            raise TraceTooLargeError(f"信号数据超过上限 {max_bytes} 字节")
+        pending.extend(data)
+
+    async def flush(out) -> None:
+        # 只写入完整的采样点，不足一个元素的尾部留到下一块
+        nonlocal flushed_samples
+        itemsize = np.dtype(SUPPORTED_DTYPES[dtype]).itemsize
+        size = len(pending) // itemsize * itemsize
+        if size:
+            block = bytes(pending[:size])
+            del pending[:size]
+            await asyncio.to_thread(_write_block, out, block, dtype, flushed_samples)
+            flushed_samples += size // itemsize
+
+    try:
+        out = await asyncio.to_thread(open, temp_path, "wb")
+        try:
+            async for chunk in chunks:
+                if not chunk:
+                    continue
+                if file_format is None:
+                    head += chunk
+                    if len(head) < len(NPY_MAGIC):
+                        continue
+                    if head.startswith(NPY_MAGIC):
+                        parsed = _parse_npy_header(head)
+                        if parsed is None:
+                            continue
+                        dtype, expected, header_bytes = parsed
+                        file_format = "npy"
+                        chunk = bytes(head[header_bytes:])
+                    else:
+                        file_format = "raw"
+                        chunk = bytes(head)
+                    head.clear()
+                receive(chunk)
+                if len(pending) >= _WRITE_BLOCK_BYTES:
+                    await flush(out)
+
+            if file_format is None:
+                if head.startswith(NPY_MAGIC):
+                    raise ValueError(".npy 头部不完整")
+                file_format = "raw"
+                receive(bytes(head))
+            await flush(out)
+        finally:
+            await asyncio.to_thread(out.close)
+
+        itemsize = np.dtype(SUPPORTED_DTYPES[dtype]).itemsize
+        if written % itemsize:
+            raise ValueError(f"二进制数据长度 {written} 不是 {dtype} 元素大小 {itemsize} 的整数倍")
+        num_samples = written // itemsize
+        if expected is not None and num_samples != expected:
+            raise ValueError(f".npy 头部声明 {expected} 个元素，实际收到 {num_samples} 个")
+        if num_samples < 3:
+            raise ValueError("色谱信号至少需要3个采样点")
+
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return {
+        "file": file_name,
+        "format": file_format,
+        "dtype": dtype,
+        "num_samples": num_samples,
+        "sample_rate_hz": float(sample_rate_hz),
+        "start_time": float(start_time),
+        "duration_min": round((num_samples - 1) / (sample_rate_hz * 60.0), 4),
+        "bytes": written
+    }
+
+
+def open_trace(meta: Dict[str, Any]) -> np.memmap:
+    """以只读内存映射打开信号文件（不读入内存）"""
+    return np.memmap(
+        trace_path(meta),
+        dtype=SUPPORTED_DTYPES[meta["dtype"]],
+        mode="r",
+        shape=(meta["num_samples"],)
+    )
+
+
+def delete_trace_file(meta: Dict[str, Any]) -> None:
+    """删除信号文件及其降采样金字塔"""
+    for path in (trace_path(meta), pyramid_path(meta)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def analyze_trace(meta: Dict[str, Any], **options: Any) -> Dict[str, Any]:
+    """
+    处理已存储的信号（在工作线程中调用）
+
+    参数：
+        options: process_chromatogram 的处理参数（baseline、smoothing、min_snr 等）；
+                 采样频率和起始时间取自元数据
+    """
+    return process_chromatogram(
+        open_trace(meta),
+        meta["sample_rate_hz"],
+        start_time=meta["start_time"],
+        **options
+    )
+
+
+async def get_trace_meta(db: AsyncSession, analysis_id: int) -> Optional[Dict[str, Any]]:
+    """获取分析记录的信号元数据（记录不存在或未上传信号时返回 None）"""
+    raw_data = (await db.execute(
+        select(HPLCAnalysis.raw_data).where(HPLCAnalysis.id == analysis_id)
+    )).scalar_one_or_none()
+    return (raw_data or {}).get("trace")
+
+
+async def attach_trace(
+    db: AsyncSession,
+    analysis_id: int,
+    chunks: AsyncIterable[bytes],
+    sample_rate_hz: float,
+    start_time: float = 0.0,
+    dtype: str = "float32",
+    max_bytes: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    上传信号并关联到分析记录（替换已有的信号）
+
+    返回：
+        信号元数据；分析记录不存在时返回 None（不读取请求体）
+
+    异常：
+        同 save_trace
+    """
+    row = (await db.execute(
+        select(HPLCAnalysis.raw_data).where(HPLCAnalysis.id == analysis_id)
+    )).first()
+    if row is None:
+        return None
+    raw_data = dict(row.raw_data or {})
+    previous = raw_data.get("trace")
+
+    meta = await save_trace(chunks, sample_rate_hz, start_time, dtype, max_bytes)
+    try:
+        raw_data["trace"] = meta
+        await db.execute(
+            update(HPLCAnalysis).where(HPLCAnalysis.id == analysis_id).values(raw_data=raw_data)
+        )
+        await db.commit()
+    except BaseException:
+        delete_trace_file(meta)
+        raise
+
+    # 提交成功后再删除被替换的文件
+    if previous is not None:
+        delete_trace_file(previous)
+    return meta
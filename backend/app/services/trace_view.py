@@ -0,0 +1,177 @@
+"""
+原始信号降采样显示模块
+
+百万点级的原始信号无法直接交给前端图表绘制。本模块为每个已上传的信号预先计算
+最小值/最大值金字塔，按请求的时间窗口和像素宽度返回每个像素列的最小值和最大值：
+
+- 第0层每 PYRAMID_BASE 个采样点一个桶，往上每层合并 PYRAMID_FACTOR 个桶，
+  直到桶数不超过 PYRAMID_MIN_BUCKETS
+- 每个桶保存 (最小值, 最大值)，窄峰在任何缩放级别下都不会被平均掉
+- 请求时选取桶大小不超过每像素采样点数的最粗一层，只读取窗口内的桶再合并到像素列，
+  读取量与信号长度无关，只与像素宽度有关；每像素不足一个采样点时直接返回原始点
+
+金字塔在首次请求时计算，保存为信号文件旁的 .npy 文件，之后以内存映射读取；
+信号被替换或删除时随信号文件一起删除。
+"""
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services import trace_store
+
+
+PYRAMID_BASE = 8
+PYRAMID_FACTOR = 4
+PYRAMID_MIN_BUCKETS = 256
+# 计算第0层时每次从信号文件读取的采样点数
+_BUILD_CHUNK_SAMPLES = PYRAMID_BASE * 65536
+
+
+def pyramid_levels(num_samples: int) -> List[Tuple[int, int, int]]:
+    """
+    金字塔各层的 (桶大小, 桶数, 在文件中的起始行)
+
+    层数只由采样点数决定，读取时无需额外的元数据
+    """
+    levels = []
+    bucket, count, offset = PYRAMID_BASE, -(-num_samples // PYRAMID_BASE), 0
+    while True:
+        levels.append((bucket, count, offset))
+        if count <= PYRAMID_MIN_BUCKETS:
+            return levels
+        offset += count
+        bucket *= PYRAMID_FACTOR
+        count = -(-count // PYRAMID_FACTOR)
+
+
+def _reduce_buckets(mins: np.ndarray, maxs: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """每 size 个相邻桶合并为一个（末尾不足的部分单独成桶）"""
+    whole = mins.size // size * size
+    lower = mins[:whole].reshape(-1, size).min(axis=1)
+    upper = maxs[:whole].reshape(-1, size).max(axis=1)
+    if whole < mins.size:
+        lower = np.append(lower, mins[whole:].min())
+        upper = np.append(upper, maxs[whole:].max())
+    return lower, upper
+
+
+def build_pyramid(samples: np.ndarray) -> np.ndarray:
+    """
+    计算最小值/最大值金字塔
+
+    返回：
+        形状为 (各层桶数之和, 2) 的数组，按 pyramid_levels 的顺序逐层排列，
+        数据类型与信号相同
+    """
+    levels = pyramid_levels(samples.size)
+    pyramid = np.empty((levels[-1][2] + levels[-1][1], 2), dtype=samples.dtype)
+
+    # 第0层分块读取原始信号（内存映射时不整体读入内存）
+    for start in range(0, samples.size, _BUILD_CHUNK_SAMPLES):
+        chunk = np.asarray(samples[start:start + _BUILD_CHUNK_SAMPLES])
+        lower, upper = _reduce_buckets(chunk, chunk, PYRAMID_BASE)
+        row = start // PYRAMID_BASE
+        pyramid[row:row + lower.size, 0] = lower
+        pyramid[row:row + lower.size, 1] = upper
+
+    for (_, _, previous), (_, count, offset) in zip(levels, levels[1:]):
+        below = pyramid[previous:offset]
+        lower, upper = _reduce_buckets(below[:, 0], below[:, 1], PYRAMID_FACTOR)
+        pyramid[offset:offset + count, 0] = lower
+        pyramid[offset:offset + count, 1] = upper
+    return pyramid
+
+
+def load_pyramid(meta: Dict[str, Any]) -> np.ndarray:
+    """读取信号的金字塔（内存映射），不存在时计算并保存"""
+    path = trace_store.pyramid_path(meta)
+    try:
+        return np.load(path, mmap_mode="r")
+    except FileNotFoundError:
+        pass
+
+    pyramid = build_pyramid(trace_store.open_trace(meta))
+    # 并发的首次请求各自写临时文件，改名是原子的
+    temp_path = f"{path}.{uuid.uuid4().hex}.part"
+    with open(temp_path, "wb") as out:
+        np.save(out, pyramid)
+    os.replace(temp_path, path)
+    return pyramid
+
+
+def view_trace(
+    meta: Dict[str, Any],
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    width: int = 1000
+) -> Dict[str, Any]:
+    """
+    按像素宽度返回时间窗口内的降采样信号（在工作线程中调用）
+
+    参数：
+        start / end: 时间窗口(分钟)，默认为整个信号
+        width: 像素列数，即返回的最大点数
+
+    返回：
+        {"start_time", "end_time": 实际覆盖的时间范围, "samples_per_point": 每个点合并的采样点数（1为原始点）,
+         "time": 每个点的中心时间, "min", "max": 每个点的最小值和最大值}
+    """
+    if width < 1:
+        raise ValueError("像素宽度必须大于0")
+    num_samples = meta["num_samples"]
+    dt = 1.0 / (meta["sample_rate_hz"] * 60.0)
+    origin = meta["start_time"]
+
+    # 容差避免时间换算的舍入误差把恰好落在采样点上的边界移到相邻点
+    first = 0 if start is None else int(np.floor((start - origin) / dt + 1e-6))
+    last = num_samples if end is None else int(np.ceil((end - origin) / dt - 1e-6)) + 1
+    first, last = max(first, 0), min(last, num_samples)
+    if first >= last:
+        raise ValueError("时间窗口不在信号范围内")
+
+    samples_per_pixel = (last - first) / width
+    if samples_per_pixel <= 1:
+        values = np.asarray(trace_store.open_trace(meta)[first:last], dtype=np.float64)
+        return {
+            "start_time": round(origin + first * dt, 6),
+            "end_time": round(origin + (last - 1) * dt, 6),
+            "samples_per_point": 1,
+            "time": (origin + np.arange(first, last) * dt).round(6).tolist(),
+            "min": values.tolist(),
+            "max": values.tolist()
+        }
+
+    # 桶大小不超过每像素采样点数的最粗一层；比第0层还细时直接用原始信号
+    level = None
+    for candidate in pyramid_levels(num_samples):
+        if candidate[0] <= samples_per_pixel:
+            level = candidate
+    if level is None:
+        bucket = 1
+        values = np.asarray(trace_store.open_trace(meta)[first:last])
+        lower = upper = values
+        first_bucket, last_bucket = first, last
+    else:
+        bucket, count, offset = level
+        first_bucket, last_bucket = first // bucket, min(-(-last // bucket), count)
+        rows = np.asarray(load_pyramid(meta)[offset + first_bucket:offset + last_bucket])
+        lower, upper = rows[:, 0], rows[:, 1]
+
+    # 将窗口内的桶均分到各像素列
+    edges = np.unique(np.linspace(0, lower.size, min(width, lower.size) + 1).astype(np.intp))[:-1]
+    point_min = np.minimum.reduceat(lower, edges)
+    point_max = np.maximum.reduceat(upper, edges)
+    sample_start = (first_bucket + edges) * bucket
+    sample_end = np.minimum((first_bucket + np.append(edges[1:], lower.size)) * bucket, num_samples)
+    centre = origin + (sample_start + sample_end - 1) * 0.5 * dt
+
+    return {
+        "start_time": round(origin + sample_start[0] * dt, 6),
+        "end_time": round(origin + (sample_end[-1] - 1) * dt, 6),
+        "samples_per_point": int(round((sample_end[-1] - sample_start[0]) / edges.size)),
+        "time": centre.round(6).tolist(),
+        "min": point_min.astype(np.float64).tolist(),
+        "max": point_max.astype(np.float64).tolist()
+    }
@@ -0,0 +1,320 @@
+"""
+权重方案编译模块
+
+权重方案在注册时编译为稠密数组，每个方案在所属类别中有一个整数ID：
+
+- safety / health / environment：每个方案编译为 (9,) 行向量（按 SUB_FACTOR_NAMES 顺序，
+  非本大因子的小因子位置为0），三者按ID取行堆叠即得 (3, 9) 的小因子→大因子矩阵
+- instrument_stage / prep_stage：(6,) 向量（按 STAGE_FACTOR_NAMES 顺序）
+- final：(2,) 向量（instrument, preparation）
+
+评分时只需按名称查ID、按ID取行，Layer 3-5 即为几个小矩阵乘法。
+注册/删除方案时重新编译全部数组并整体替换（写时复制），读取方无需加锁。
+"""
+import os
+import threading
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.scoring_engine import MAJOR_FACTOR_MEMBERS, STAGE_FACTOR_NAMES, SUB_FACTOR_NAMES
+
+
+# 类别顺序即 scheme_ids 返回的ID顺序；CATEGORY_FIELDS 为权重项，CATEGORY_COLUMNS 为编译后向量的列
+SCHEME_CATEGORIES = ("safety", "health", "environment", "instrument_stage", "prep_stage", "final")
+CATEGORY_FIELDS = {
+    "safety": MAJOR_FACTOR_MEMBERS["S"],
+    "health": MAJOR_FACTOR_MEMBERS["H"],
+    "environment": MAJOR_FACTOR_MEMBERS["E"],
+    "instrument_stage": STAGE_FACTOR_NAMES,
+    "prep_stage": STAGE_FACTOR_NAMES,
+    "final": ("instrument", "preparation")
+}
+CATEGORY_COLUMNS = {
+    "safety": SUB_FACTOR_NAMES,
+    "health": SUB_FACTOR_NAMES,
+    "environment": SUB_FACTOR_NAMES,
+    "instrument_stage": STAGE_FACTOR_NAMES,
+    "prep_stage": STAGE_FACTOR_NAMES,
+    "final": ("instrument", "preparation")
+}
+CATEGORY_LABELS = {
+    "safety": "安全因子",
+    "health": "健康因子",
+    "environment": "环境因子",
+    "instrument_stage": "仪器阶段",
+    "prep_stage": "前处理阶段",
+    "final": "最终"
+}
+
+# 权重之和允许的误差（内置方案如 0.334 + 0.333 + 0.333）
+WEIGHT_SUM_TOLERANCE = 1e-3
+
+
+def validate_scheme_weights(category: str, weights: Mapping[str, float]) -> Dict[str, float]:
+    """
+    校验一个权重方案：权重项与类别一致、每项在 [0, 1] 内、总和为1
+
+    返回：
+        Dict[str, float]: 按类别权重项顺序整理后的权重
+    """
+    if category not in CATEGORY_FIELDS:
+        raise ValueError(f"未知的权重类别：{category}")
+
+    fields = CATEGORY_FIELDS[category]
+    missing = [field for field in fields if field not in weights]
+    if missing:
+        raise ValueError(f"{CATEGORY_LABELS[category]}权重方案缺少权重项：{', '.join(missing)}")
+    unknown = [field for field in weights if field not in fields]
+    if unknown:
+        raise ValueError(f"{CATEGORY_LABELS[category]}权重方案包含未知权重项：{', '.join(unknown)}")
+
+    cleaned = {field: float(weights[field]) for field in fields}
+    for field, value in cleaned.items():
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f"权重 {field}={value} 超出范围 [0, 1]")
+
+    total = sum(cleaned.values())
+    if abs(total - 1.0) > WEIGHT_SUM_TOLERANCE:
+        raise ValueError(f"{CATEGORY_LABELS[category]}权重之和为 {total:.4f}，应为1")
+    return cleaned
+
+
+class SchemeTable:
+    """单个类别的方案定义（注册/删除在 SchemeRegistry 的锁内进行）"""
+
+    def __init__(self, category: str):
+        self.category = category
+        self.weights: Dict[str, Dict[str, float]] = {}
+        self.builtin: set = set()
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.weights)
+
+    def put(self, name: str, weights: Mapping[str, float], builtin: bool = False) -> None:
+        """注册或替换方案（内置方案不可替换）"""
+        if not name:
+            raise ValueError("权重方案名称不能为空")
+        if name in self.builtin:
+            raise ValueError(f"不能修改内置的{CATEGORY_LABELS[self.category]}权重方案：{name}")
+        self.weights[name] = validate_scheme_weights(self.category, weights)
+        if builtin:
+            self.builtin.add(name)
+
+    def remove(self, name: str) -> bool:
+        """删除自定义方案，返回是否存在"""
+        if name in self.builtin:
+            raise ValueError(f"不能删除内置的{CATEGORY_LABELS[self.category]}权重方案：{name}")
+        return self.weights.pop(name, None) is not None
+
+    def compile(self) -> Tuple[Dict[str, int], np.ndarray]:
+        """编译为 (名称→ID, 只读权重矩阵)，矩阵第 i 行为ID为 i 的方案"""
+        columns = {name: i for i, name in enumerate(CATEGORY_COLUMNS[self.category])}
+        matrix = np.zeros((len(self.weights), len(columns)), dtype=np.float64)
+        for row, weights in enumerate(self.weights.values()):
+            for field, value in weights.items():
+                matrix[row, columns[field]] = value
+        matrix.flags.writeable = False
+        return {name: i for i, name in enumerate(self.weights)}, matrix
+
+
+class CompiledSchemes:
+    """
+    某一时刻全部方案的编译结果（不可变）
+
+    方案ID只在同一个 CompiledSchemes 内有效：先 scheme_ids 再 weights_for_ids
+    时应使用同一个实例，避免期间注册/删除方案导致ID错位。
+    """
+
+    def __init__(self, tables: Mapping[str, SchemeTable], version: int, token: Optional[str] = None):
+        self.version = version
+        # 跨进程标识编译结果（工作进程据此判断是否需要同步自定义方案）
+        self.token = token or f"{os.getpid()}:{version}"
+        self.ids: Dict[str, Dict[str, int]] = {}
+        self.matrices: Dict[str, np.ndarray] = {}
+        self._resolved: Dict[Tuple[int, ...], Tuple[np.ndarray, ...]] = {}
+        for category in SCHEME_CATEGORIES:
+            self.ids[category], self.matrices[category] = tables[category].compile()
+
+    def scheme_id(self, category: str, name: str) -> int:
+        """方案名称 → 整数ID，未知方案抛出 ValueError"""
+        try:
+            return self.ids[category][name]
+        except KeyError:
+            raise ValueError(f"未知的{CATEGORY_LABELS[category]}权重方案：{name}") from None
+
+    def scheme_ids(
+        self,
+        safety_scheme: str = "PBT_Balanced",
+        health_scheme: str = "Absolute_Balance",
+        environment_scheme: str = "PBT_Balanced",
+        instrument_stage_scheme: str = "Balanced",
+        prep_stage_scheme: str = "Balanced",
+        final_scheme: str = "Standard"
+    ) -> Tuple[int, ...]:
+        """六个方案名称 → 按 SCHEME_CATEGORIES 顺序的整数ID"""
+        names = (
+            safety_scheme, health_scheme, environment_scheme,
+            instrument_stage_scheme, prep_stage_scheme, final_scheme
+        )
+        return tuple(self.scheme_id(category, name) for category, name in zip(SCHEME_CATEGORIES, names))
+
+    def weights_for_ids(self, ids: Sequence) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        按方案ID取权重数组
+
+        参数：
+            ids: scheme_ids 返回的6个ID；每项也可以是 (N,) 的ID数组（批量）
+
+        返回：
+            Tuple: (大因子权重矩阵(..., 3, 9), 仪器阶段权重(..., 6), 前处理阶段权重(..., 6), 最终权重(..., 2))
+        """
+        safety, health, environment, inst_stage, prep_stage, final = (
+            self.matrices[category][index] for category, index in zip(SCHEME_CATEGORIES, ids)
+        )
+        return np.stack([safety, health, environment], axis=-2), inst_stage, prep_stage, final
+
+    def resolve(self, **schemes: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """方案名称 → 权重数组（见 weights_for_ids），同一组合只组装一次"""
+        ids = self.scheme_ids(**schemes)
+        weights = self._resolved.get(ids)
+        if weights is None:
+            weights = self.weights_for_ids(ids)
+            for array in weights:
+                array.flags.writeable = False
+            self._resolved[ids] = weights
+        return weights
+
+    def names(self, category: str) -> List[str]:
+        """按ID顺序的方案名称"""
+        return list(self.ids[category])
+
+
+class SchemeRegistry:
+    """
+    全部六个类别的权重方案注册表
+
+    每次注册/删除后重新编译并整体替换 compiled，读取方直接使用 compiled 无需加锁。
+    """
+
+    def __init__(self, builtin: Mapping[str, Mapping[str, Mapping[str, float]]]):
+        self._lock = threading.Lock()
+        self.tables: Dict[str, SchemeTable] = {category: SchemeTable(category) for category in SCHEME_CATEGORIES}
+        for category, schemes in builtin.items():
+            for name, weights in schemes.items():
+                self.tables[category].put(name, weights, builtin=True)
+        self.compiled = CompiledSchemes(self.tables, version=0)
+
+    def _recompile(self, token: Optional[str] = None) -> None:
+        self.compiled = CompiledSchemes(self.tables, version=self.compiled.version + 1, token=token)
+
+    def _table(self, category: str) -> SchemeTable:
+        if category not in self.tables:
+            raise ValueError(f"未知的权重类别：{category}")
+        return self.tables[category]
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+
+    def scheme_ids(self, **schemes: str) -> Tuple[int, ...]:
+        return self.compiled.scheme_ids(**schemes)
+
+    def resolve(self, **schemes: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        return self.compiled.resolve(**schemes)
+
+    def names(self, category: str) -> List[str]:
+        self._table(category)
+        return self.compiled.names(category)
+
+    def get_weights(self, category: str, name: str) -> Dict[str, float]:
+        table = self._table(category)
+        weights = table.weights.get(name)
+        if weights is None:
+            raise ValueError(f"类别 {category} 中未找到方案：{name}")
+        return dict(weights)
+
+    def is_builtin(self, category: str, name: str) -> bool:
+        return name in self._table(category).builtin
+
+    def custom_definitions(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """全部自定义方案 {类别: {名称: 权重}}"""
+        with self._lock:
+            return self._custom_definitions()
+
+    def _custom_definitions(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        return {
+            category: {
+                name: dict(weights) for name, weights in table.weights.items() if name not in table.builtin
+            }
+            for category, table in self.tables.items()
+        }
+
+    # ------------------------------------------------------------------
+    # 注册
+    # ------------------------------------------------------------------
+
+    def register(self, category: str, name: str, weights: Mapping[str, float]) -> int:
+        """注册（或替换同名的）自定义方案并重新编译，返回方案ID"""
+        with self._lock:
+            self._table(category).put(name, weights)
+            self._recompile()
+            return self.compiled.ids[category][name]
+
+    def unregister(self, category: str, name: str) -> bool:
+        """删除自定义方案，返回是否存在"""
+        with self._lock:
+            removed = self._table(category).remove(name)
+            if removed:
+                self._recompile()
+            return removed
+
+    def replace_custom(
+        self,
+        definitions: Mapping[str, Mapping[str, Mapping[str, float]]],
+        token: Optional[str] = None
+    ) -> List[str]:
+        """
+        用给定的定义整体替换自定义方案（只重新编译一次）
+
+        无效的方案被跳过，返回对应的错误信息列表
+        """
+        errors = []
+        with self._lock:
+            for table in self.tables.values():
+                for name in [n for n in table.names if n not in table.builtin]:
+                    table.remove(name)
+            for category, schemes in definitions.items():
+                for name, weights in schemes.items():
+                    try:
+                        self._table(category).put(name, weights)
+                    except ValueError as e:
+                        errors.append(f"{category}/{name}: {e}")
+            self._recompile(token)
+        return errors
+
+    # ------------------------------------------------------------------
+    # 跨进程同步（进程池中的注册表只在导入时编译了内置方案）
+    # ------------------------------------------------------------------
+
+    def export(self) -> Tuple[str, Dict[str, Dict[str, Dict[str, float]]]]:
+        """导出 (编译标识, 自定义方案定义)，随任务一起提交给工作进程"""
+        with self._lock:
+            return self.compiled.token, self._custom_definitions()
+
+    def sync(self, state: Tuple[str, Mapping[str, Mapping[str, Mapping[str, float]]]]) -> None:
+        """按 export 的结果同步自定义方案；标识相同时不做任何事"""
+        token, definitions = state
+        if self.compiled.token != token:
+            self.replace_custom(definitions, token=token)
+
+    def clear_custom(self, category: Optional[str] = None) -> None:
+        """删除所有（或指定类别的）自定义方案"""
+        categories = [category] if category else list(SCHEME_CATEGORIES)
+        with self._lock:
+            for name_category in categories:
+                table = self._table(name_category)
+                for name in [n for n in table.names if n not in table.builtin]:
+                    table.remove(name)
+            self._recompile()
@@ -0,0 +1,175 @@
+"""
+数据库吞吐基准测试
+
+在临时SQLite文件上对比两组连接参数下的写入/列表吞吐：
+- baseline：不设置任何PRAGMA（SQLite默认的 journal_mode=DELETE、synchronous=FULL）
+- tuned：Settings 中的性能参数（见 app.database.connection.sqlite_pragmas）
+
+负载模拟 /analysis/hplc：writers 个并发任务逐条插入（每条一个事务，提交后 refresh），
+readers 个并发任务反复查询最新一页（只取列表列）。
+
+用法（在 backend 目录下）：
+    python benchmarks/database_benchmark.py --rows 2000 --writers 8 --readers 4 --output db_bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker  # noqa: E402
+
+from app.database.connection import Base, create_engine, sqlite_pragmas  # noqa: E402
+from app.database.models import HPLCAnalysis  # noqa: E402
+
+
+PROFILES = {
+    "baseline": [],
+    "tuned": None  # None：使用 sqlite_pragmas() 的默认值（来自 Settings）
+}
+
+
+def _latency_summary(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(samples),
+        "median_ms": round(statistics.median(ordered) * 1000.0, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000.0, 3),
+        "max_ms": round(ordered[-1] * 1000.0, 3)
+    }
+
+
+async def run_profile(
+    name: str,
+    pragmas: Optional[List[str]],
+    rows: int,
+    writers: int,
+    readers: int
+) -> Dict[str, Any]:
+    """在新的临时数据库上运行一组参数的写入/列表负载"""
+    directory = tempfile.mkdtemp(prefix=f"db_bench_{name}_")
+    engine = create_engine(f"sqlite+aiosqlite:///{directory}/bench.db", echo=False, pragmas=pragmas)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    insert_latencies: List[float] = []
+    list_latencies: List[float] = []
+    errors = {"insert": 0, "list": 0}
+    remaining = {"rows": rows}
+    writing = {"active": True}
+
+    async def writer(worker: int) -> None:
+        while remaining["rows"] > 0:
+            remaining["rows"] -= 1
+            start = time.perf_counter()
+            try:
+                async with sessions() as db:
+                    analysis = HPLCAnalysis(
+                        name=f"bench-{worker}-{remaining['rows']}",
+                        solvent_a="Methanol",
+                        solvent_b="Water",
+                        flow_rate=1.0,
+                        column_type="C18",
+                        temperature=30.0,
+                        green_score=float(remaining["rows"] % 100)
+                    )
+                    db.add(analysis)
+                    await db.commit()
+                    await db.refresh(analysis)
+            except OperationalError:
+                errors["insert"] += 1
+                continue
+            insert_latencies.append(time.perf_counter() - start)
+
+    async def reader() -> None:
+        stmt = (
+            select(HPLCAnalysis.id, HPLCAnalysis.name, HPLCAnalysis.created_at, HPLCAnalysis.green_score)
+            .order_by(HPLCAnalysis.created_at.desc(), HPLCAnalysis.id.desc())
+            .limit(20)
+        )
+        while writing["active"]:
+            start = time.perf_counter()
+            try:
+                async with sessions() as db:
+                    (await db.execute(stmt)).all()
+            except OperationalError:
+                errors["list"] += 1
+                continue
+            list_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0)
+
+    try:
+        async with engine.connect() as conn:
+            journal_mode = (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+            synchronous = (await conn.exec_driver_sql("PRAGMA synchronous")).scalar()
+
+        start = time.perf_counter()
+        reader_tasks = [asyncio.ensure_future(reader()) for _ in range(readers)]
+        await asyncio.gather(*(writer(i) for i in range(writers)))
+        write_elapsed = time.perf_counter() - start
+        writing["active"] = False
+        await asyncio.gather(*reader_tasks)
+    finally:
+        await engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "profile": name,
+        "journal_mode": journal_mode,
+        "synchronous": synchronous,
+        "elapsed_s": round(write_elapsed, 3),
+        "inserts_per_s": round(len(insert_latencies) / write_elapsed, 1),
+        "lists_per_s": round(len(list_latencies) / write_elapsed, 1),
+        "insert_latency": _latency_summary(insert_latencies),
+        "list_latency": _latency_summary(list_latencies),
+        "errors": errors
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="数据库吞吐基准测试")
+    parser.add_argument("--rows", type=int, default=2000, help="插入的记录数")
+    parser.add_argument("--writers", type=int, default=8, help="并发写入任务数")
+    parser.add_argument("--readers", type=int, default=4, help="并发列表查询任务数")
+    parser.add_argument("--profiles", nargs="+", choices=sorted(PROFILES), default=["baseline", "tuned"])
+    parser.add_argument("--output", default=None, help="结果JSON文件路径")
+    args = parser.parse_args(argv)
+
+    print(f"tuned PRAGMA: {'; '.join(sqlite_pragmas())}\n")
+    print(f"{'profile':<10} {'journal':>8} {'sync':>5} {'insert/s':>10} {'list/s':>10} "
+          f"{'insert p95':>11} {'list p95':>10} {'errors':>7}")
+
+    results = []
+    for name in args.profiles:
+        result = asyncio.run(run_profile(name, PROFILES[name], args.rows, args.writers, args.readers))
+        results.append(result)
+        print(f"{name:<10} {result['journal_mode']:>8} {result['synchronous']:>5} "
+              f"{result['inserts_per_s']:>10.1f} {result['lists_per_s']:>10.1f} "
+              f"{result['insert_latency'].get('p95_ms', 0):>9.2f}ms {result['list_latency'].get('p95_ms', 0):>8.2f}ms "
+              f"{sum(result['errors'].values()):>7}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {"params": {"rows": args.rows, "writers": args.writers, "readers": args.readers}, "results": results},
+                f, ensure_ascii=False, indent=2
+            )
+        print(f"\n结果已写入 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""
+HTTP负载测试
+
+以可配置的并发数和请求配比压测API，报告各接口的吞吐量和 p50/p95/p99 延迟。
+
+两种模式：
+- 进程内（默认）：通过 httpx.ASGITransport 直接驱动 main.app，不经过网络；
+  客户端与服务端共用同一事件循环和CPU，测得的是路由层 + 服务层的上限
+- 外部服务：--url http://127.0.0.1:8000 压测已启动的 uvicorn 服务
+
+进程内模式默认使用临时SQLite数据库（不写入 data/ 下的开发数据库），并关闭SQL回显。
+
+用法（在 backend 目录下）：
+    python benchmarks/load_test.py --concurrency 32 --duration 20
+    python benchmarks/load_test.py --mix full-score=6,chromatogram=3,hplc-create=1 --requests 5000
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --concurrency 64 --output load.json
+
+可用的请求类型：full-score, chromatogram, hplc-create, hplc-list, health
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARK_DIR, ".."))
+sys.path.insert(0, BENCHMARK_DIR)
+
+DEFAULT_MIX = "full-score=5,chromatogram=3,hplc-create=1,hplc-list=1"
+PAYLOAD_POOL_SIZE = 64
+SOLVENTS = ["水", "甲醇", "乙腈", "四氢呋喃", "乙酸乙酯", "正己烷", "异丙醇"]
+
+
+# ============================================================================
+# 请求负载
+# ============================================================================
+
+def full_score_payload(rng: np.random.Generator, library: Dict[str, Any]) -> Dict[str, Any]:
+    """生成 /scoring/full-score 请求体（结构同 FullScoreRequest）"""
+    from scoring_benchmark import synthetic_method
+
+    method = synthetic_method(
+        rng, library, int(rng.integers(2, 8)), int(rng.integers(3, 30))
+    )
+    body = {
+        "instrument": {
+            "time_points": method["instrument_time_points"],
+            "composition": method["instrument_composition"],
+            "flow_rate": method["instrument_flow_rate"],
+            "densities": method["instrument_densities"],
+            "factor_matrix": method["instrument_factor_matrix"],
+            "curve_types": method["instrument_curve_types"]
+        },
+        "preparation": {
+            "volumes": method["prep_volumes"],
+            "densities": method["prep_densities"],
+            "factor_matrix": method["prep_factor_matrix"]
+        }
+    }
+    body.update({
+        key: method[key] for key in (
+            "p_factor", "pretreatment_p_factor",
+            "instrument_r_factor", "instrument_d_factor",
+            "pretreatment_r_factor", "pretreatment_d_factor"
+        )
+    })
+    return body
+
+
+def chromatogram_payload(rng: np.random.Generator) -> Dict[str, Any]:
+    """生成 /analysis/chromatogram 请求体"""
+    num_peaks = int(rng.integers(5, 50))
+    return {
+        "retention_times": np.sort(rng.uniform(0.5, 30.0, num_peaks)).round(3).tolist(),
+        "peak_areas": rng.uniform(1e3, 1e6, num_peaks).round(1).tolist()
+    }
+
+
+def hplc_create_payload(rng: np.random.Generator) -> Dict[str, Any]:
+    """生成 /analysis/hplc 创建请求体（结构同 HPLCAnalysisCreate）"""
+    solvent_a, solvent_b = rng.choice(SOLVENTS, 2, replace=False)
+    return {
+        "name": f"load-test-{int(rng.integers(1_000_000))}",
+        "description": "负载测试数据",
+        "solvent_a": str(solvent_a),
+        "solvent_b": str(solvent_b),
+        "flow_rate": round(float(rng.uniform(0.2, 2.0)), 3),
+        "column_type": "C18",
+        "temperature": round(float(rng.uniform(20, 45)), 1)
+    }
+
+
+def build_request_pool(seed: int) -> Dict[str, List[Tuple[str, str, Optional[Dict[str, Any]]]]]:
+    """为每种请求类型预先生成一组 (方法, 路径, 请求体)，压测时循环使用"""
+    from scoring_benchmark import reagent_library
+
+    rng = np.random.default_rng(seed)
+    library = reagent_library(rng)
+    pool = {
+        "full-score": [
+            ("POST", "/api/v1/scoring/full-score", full_score_payload(rng, library))
+            for _ in range(PAYLOAD_POOL_SIZE)
+        ],
+        "chromatogram": [
+            ("POST", "/api/v1/analysis/chromatogram", chromatogram_payload(rng))
+            for _ in range(PAYLOAD_POOL_SIZE)
+        ],
+        "hplc-create": [
+            ("POST", "/api/v1/analysis/hplc", hplc_create_payload(rng))
+            for _ in range(PAYLOAD_POOL_SIZE)
+        ],
+        "hplc-list": [("GET", "/api/v1/analysis/hplc?limit=20", None)],
+        "health": [("GET", "/health", None)]
+    }
+    return pool
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """解析请求配比，如 "full-score=5,chromatogram=3" """
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.strip().partition("=")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ============================================================================
+# 压测
+# ============================================================================
+
+class LoadResult:
+    """请求记录：(类型, 延迟秒, 状态码)"""
+
+    def __init__(self):
+        self.records: List[Tuple[str, float, int]] = []
+        self.errors: Dict[str, int] = {}
+
+    def add(self, kind: str, latency: float, status: int) -> None:
+        self.records.append((kind, latency, status))
+
+    def add_error(self, kind: str, error: Exception) -> None:
+        key = f"{kind}: {type(error).__name__}"
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+
+async def run_load(
+    client,
+    pool: Dict[str, List[Tuple[str, str, Optional[Dict[str, Any]]]]],
+    mix: Dict[str, float],
+    concurrency: int,
+    duration: Optional[float],
+    total_requests: Optional[int],
+    seed: int
+) -> Tuple[LoadResult, float]:
+    """以 concurrency 个并发worker发送请求，达到时长或请求数后停止，返回 (记录, 实际耗时秒)"""
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    result = LoadResult()
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_request(rng: random.Random):
+        nonlocal issued
+        if total_requests is not None and issued >= total_requests:
+            return None
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        issued += 1
+        kind = rng.choices(kinds, weights)[0]
+        return kind, rng.choice(pool[kind])
+
+    async def worker(worker_id: int):
+        rng = random.Random(seed + worker_id)
+        while True:
+            item = next_request(rng)
+            if item is None:
+                return
+            kind, (method, path, body) = item
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+            except Exception as e:  # 连接错误等，单独计数
+                result.add_error(kind, e)
+                continue
+            result.add(kind, time.perf_counter() - start, response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return result, time.perf_counter() - start
+
+
+def summarize(result: LoadResult, elapsed: float) -> Dict[str, Any]:
+    """按请求类型和总体统计吞吐量、延迟分位数和错误数"""
+    groups: Dict[str, List[Tuple[float, int]]] = {}
+    for kind, latency, status in result.records:
+        groups.setdefault(kind, []).append((latency, status))
+    groups["all"] = [(latency, status) for _, latency, status in result.records]
+
+    summary = {}
+    for kind, items in groups.items():
+        if not items:
+            continue
+        latencies_ms = np.array([latency for latency, _ in items]) * 1000.0
+        failed = sum(1 for _, status in items if status >= 400)
+        p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+        summary[kind] = {
+            "requests": len(items),
+            "failed": failed,
+            "throughput_rps": round(len(items) / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_ms": {
+                "mean": round(float(statistics.fmean(latencies_ms)), 3),
+                "p50": round(float(p50), 3),
+                "p95": round(float(p95), 3),
+                "p99": round(float(p99), 3),
+                "max": round(float(latencies_ms.max()), 3)
+            },
+            "status_codes": {
+                str(code): sum(1 for _, status in items if status == code)
+                for code in sorted({status for _, status in items})
+            }
+        }
+    return summary
+
+
+def print_summary(summary: Dict[str, Any], elapsed: float, errors: Dict[str, int]) -> None:
+    print(f"\n耗时 {elapsed:.2f} s")
+    print(f"{'type':<14} {'requests':>9} {'failed':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for kind, stats in summary.items():
+        latency = stats["latency_ms"]
+        print(
+            f"{kind:<14} {stats['requests']:>9} {stats['failed']:>7} {stats['throughput_rps']:>9.1f} "
+            f"{latency['p50']:>9.2f} {latency['p95']:>9.2f} {latency['p99']:>9.2f} {latency['max']:>9.2f}"
+        )
+    for key, count in errors.items():
+        print(f"连接错误 {key}: {count}")
+
+
+# ============================================================================
+# 客户端
+# ============================================================================
+
+async def _in_process_client(timeout: float):
+    """构建直接驱动 main.app 的客户端（需在导入 app 前设置好环境变量）"""
+    import httpx
+    import main
+    from app.database.connection import init_db
+
+    await init_db()
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app),
+        base_url="http://loadtest",
+        timeout=timeout
+    )
+
+
+async def _run(args, pool, mix) -> Tuple[LoadResult, float]:
+    import httpx
+
+    if args.url:
+        client = httpx.AsyncClient(
+            base_url=args.url,
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=args.concurrency)
+        )
+    else:
+        client = await _in_process_client(args.timeout)
+
+    async with client:
+        if args.warmup:
+            await run_load(client, pool, mix, min(args.concurrency, args.warmup), None, args.warmup, args.seed)
+        return await run_load(
+            client, pool, mix, args.concurrency, args.duration, args.requests, args.seed
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="HTTP负载测试")
+    parser.add_argument("--url", default=None, help="外部服务地址；不指定时进程内驱动 main.app")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发worker数")
+    parser.add_argument("--duration", type=float, default=10.0, help="压测时长（秒）")
+    parser.add_argument("--requests", type=int, default=None, help="总请求数（指定时忽略 --duration）")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"请求配比，默认 {DEFAULT_MIX}")
+    parser.add_argument("--warmup", type=int, default=20, help="正式压测前的预热请求数")
+    parser.add_argument("--timeout", type=float, default=30.0, help="单个请求超时（秒）")
+    parser.add_argument("--seed", type=int, default=20240101, help="随机种子")
+    parser.add_argument("--database-url", default=None, help="进程内模式的数据库URL（默认临时SQLite）")
+    parser.add_argument("--output", default=None, help="结果JSON文件路径")
+    args = parser.parse_args(argv)
+
+    if not args.url:
+        # 必须在导入 app（包括生成请求体时）之前设置：配置和数据库引擎在导入时创建
+        tmpdir = tempfile.mkdtemp(prefix="hplc-loadtest-")
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite+aiosqlite:///{tmpdir}/loadtest.db"
+        os.environ["DEBUG"] = "False"
+
+    mix = parse_mix(args.mix)
+    pool = build_request_pool(args.seed)
+    unknown = set(mix) - set(pool)
+    if unknown:
+        parser.error(f"未知的请求类型：{', '.join(sorted(unknown))}，可选 {', '.join(pool)}")
+
+    duration = None if args.requests else args.duration
+    args.duration = duration
+    result, elapsed = asyncio.run(_run(args, pool, mix))
+
+    summary = summarize(result, elapsed)
+    print_summary(summary, elapsed, result.errors)
+
+    if args.output:
+        report = {
+            "config": {
+                "target": args.url or "in-process",
+                "concurrency": args.concurrency,
+                "duration": duration,
+                "requests": args.requests,
+                "mix": mix,
+                "seed": args.seed
+            },
+            "elapsed_s": round(elapsed, 3),
+            "summary": summary,
+            "connection_errors": result.errors
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
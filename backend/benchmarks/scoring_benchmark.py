@@ -0,0 +1,315 @@
+"""
+评分引擎基准测试
+
+用随机生成（固定种子）的合成方法测量评分引擎的端到端耗时、分层耗时和峰值内存，
+结果写入JSON文件，可在不同提交之间对比。
+
+覆盖范围：
+- single：单个方法 calculate_full_scores，试剂数 2-50 × 梯度点数 3-10000，
+  分别测量清空缓存（cold）和缓存命中（warm）两种情况
+- batch：calculate_full_scores_batch，批量大小 1-100000
+
+用法（在 backend 目录下）：
+    python benchmarks/scoring_benchmark.py --profile quick --output bench.json
+    python benchmarks/scoring_benchmark.py --profile full --output after.json --compare before.json
+
+分层耗时来自 app.core.instrumentation 的span（layer0.*、layer1.*、batch.* 等），
+峰值内存在计时之外单独运行一次，用 tracemalloc 统计（NumPy 数组分配也计入）。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.core import instrumentation  # noqa: E402
+from app.services import scoring_cache, scoring_service  # noqa: E402
+
+
+PROFILES = {
+    "quick": {
+        "reagents": [2, 10, 50],
+        "points": [3, 100, 1000],
+        "batch_sizes": [1, 100, 1000],
+        "repeats": 5
+    },
+    "full": {
+        "reagents": [2, 5, 10, 20, 50],
+        "points": [3, 10, 100, 1000, 10000],
+        "batch_sizes": [1, 10, 100, 1000, 10000, 100000],
+        "repeats": 10
+    }
+}
+
+CURVE_CHOICES = ["linear", "weak-convex", "medium-concave", "strong-convex", "ultra-concave", "convex-2.5"]
+LIBRARY_SIZE = 60
+
+
+# ============================================================================
+# 合成数据
+# ============================================================================
+
+def reagent_library(rng: np.random.Generator) -> Dict[str, Dict[str, Any]]:
+    """生成试剂库：每个试剂的9个小因子和密度"""
+    return {
+        f"Reagent{i:02d}": {
+            "factors": {
+                name: round(float(value), 4)
+                for name, value in zip(scoring_service.SUB_FACTOR_NAMES, rng.random(9))
+            },
+            "density": round(float(rng.uniform(0.6, 1.6)), 4)
+        }
+        for i in range(LIBRARY_SIZE)
+    }
+
+
+def synthetic_method(
+    rng: np.random.Generator,
+    library: Dict[str, Dict[str, Any]],
+    num_reagents: int,
+    num_points: int
+) -> Dict[str, Any]:
+    """生成一个合成方法（calculate_full_scores 的关键字参数）"""
+    names = list(library)
+    reagents = [names[i] for i in rng.choice(len(names), num_reagents, replace=False)]
+    prep_reagents = reagents[:min(3, num_reagents)]
+
+    composition = rng.random((num_reagents, num_points))
+    composition = composition / composition.sum(axis=0) * 100.0
+
+    return dict(
+        instrument_time_points=np.linspace(0.0, 60.0, num_points).tolist(),
+        instrument_composition={r: composition[i].tolist() for i, r in enumerate(reagents)},
+        instrument_flow_rate=float(rng.uniform(0.2, 2.0)),
+        instrument_densities={r: library[r]["density"] for r in reagents},
+        instrument_factor_matrix={r: library[r]["factors"] for r in reagents},
+        instrument_curve_types=["initial"] + [str(c) for c in rng.choice(CURVE_CHOICES, num_points - 1)],
+        prep_volumes={r: float(rng.uniform(0.5, 20.0)) for r in prep_reagents},
+        prep_densities={r: library[r]["density"] for r in prep_reagents},
+        prep_factor_matrix={r: library[r]["factors"] for r in prep_reagents},
+        p_factor=float(rng.uniform(0, 100)),
+        pretreatment_p_factor=float(rng.uniform(0, 100)),
+        instrument_r_factor=float(rng.uniform(0, 100)),
+        instrument_d_factor=float(rng.uniform(0, 100)),
+        pretreatment_r_factor=float(rng.uniform(0, 100)),
+        pretreatment_d_factor=float(rng.uniform(0, 100))
+    )
+
+
+# ============================================================================
+# 测量
+# ============================================================================
+
+def _percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q))
+
+
+def measure(
+    func: Callable[[], Any],
+    repeats: int,
+    setup: Optional[Callable[[], None]] = None
+) -> Dict[str, Any]:
+    """
+    重复执行 func，返回端到端耗时、分层耗时（各span的中位数）和峰值内存
+
+    setup 在每次执行前调用，不计入耗时（如清空缓存）
+    """
+    durations = []
+    layer_samples: Dict[str, List[float]] = {}
+
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        token = instrumentation.start_trace()
+        start = time.perf_counter()
+        try:
+            func()
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000.0
+            trace = instrumentation.stop_trace(token)
+        durations.append(elapsed)
+
+        per_run: Dict[str, float] = {}
+        for name, span_ms in trace:
+            per_run[name] = per_run.get(name, 0.0) + span_ms
+        for name, span_ms in per_run.items():
+            layer_samples.setdefault(name, []).append(span_ms)
+
+    # 峰值内存单独测量，避免 tracemalloc 的开销影响计时
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "repeats": repeats,
+        "latency_ms": {
+            "min": round(min(durations), 4),
+            "median": round(statistics.median(durations), 4),
+            "mean": round(statistics.fmean(durations), 4),
+            "p95": round(_percentile(durations, 95), 4),
+            "max": round(max(durations), 4)
+        },
+        "layers_ms": {
+            name: round(statistics.median(samples), 4)
+            for name, samples in sorted(layer_samples.items())
+        },
+        "peak_memory_mb": round(peak / (1024 * 1024), 4)
+    }
+
+
+def run_suite(profile: Dict[str, Any], seed: int, log: Callable[[str], None]) -> List[Dict[str, Any]]:
+    """运行基准测试，返回各用例的结果列表"""
+    rng = np.random.default_rng(seed)
+    library = reagent_library(rng)
+    repeats = profile["repeats"]
+    results = []
+
+    # 单个方法：试剂数 × 梯度点数，冷缓存与热缓存
+    for num_reagents in profile["reagents"]:
+        for num_points in profile["points"]:
+            method = synthetic_method(rng, library, num_reagents, num_points)
+            run = lambda: scoring_service.calculate_full_scores(**method)  # noqa: E731
+
+            for cache_state, setup in (("cold", scoring_cache.clear_caches), ("warm", None)):
+                if setup is None:
+                    run()
+                name = f"single/{cache_state}/r{num_reagents}/t{num_points}"
+                result = measure(run, repeats, setup)
+                results.append({
+                    "name": name,
+                    "params": {
+                        "kind": "single",
+                        "cache": cache_state,
+                        "reagents": num_reagents,
+                        "points": num_points
+                    },
+                    **result
+                })
+                log(f"{name:<32} median {result['latency_ms']['median']:>10.3f} ms  "
+                    f"peak {result['peak_memory_mb']:>9.3f} MB")
+
+    # 批量评分：每个方法 5 种试剂、10 个梯度点，各不相同
+    for batch_size in profile["batch_sizes"]:
+        methods = [synthetic_method(rng, library, 5, 10) for _ in range(batch_size)]
+        batch_repeats = max(1, min(repeats, 100000 // (batch_size * 10) or 1))
+        name = f"batch/n{batch_size}"
+        result = measure(
+            lambda: scoring_service.calculate_full_scores_batch(methods),
+            batch_repeats,
+            scoring_cache.clear_caches
+        )
+        result["per_method_us"] = round(result["latency_ms"]["median"] * 1000.0 / batch_size, 3)
+        results.append({
+            "name": name,
+            "params": {"kind": "batch", "batch_size": batch_size, "reagents": 5, "points": 10},
+            **result
+        })
+        log(f"{name:<32} median {result['latency_ms']['median']:>10.3f} ms  "
+            f"peak {result['peak_memory_mb']:>9.3f} MB  ({result['per_method_us']} us/method)")
+        del methods
+
+    return results
+
+
+# ============================================================================
+# 元数据与对比
+# ============================================================================
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(profile_name: str, seed: int) -> Dict[str, Any]:
+    """运行环境信息"""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "profile": profile_name,
+        "seed": seed,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+
+def compare(current: List[Dict[str, Any]], baseline: List[Dict[str, Any]], threshold: float) -> List[str]:
+    """
+    按用例名对比中位数耗时，打印对比表，返回变慢超过阈值的用例名
+
+    参数：
+        threshold: 允许的耗时比例上限（如 1.2 表示慢20%以内视为正常）
+    """
+    previous = {item["name"]: item for item in baseline}
+    regressions = []
+
+    print(f"\n{'case':<32} {'before ms':>12} {'after ms':>12} {'ratio':>8}")
+    for item in current:
+        before = previous.get(item["name"])
+        if before is None:
+            continue
+        old = before["latency_ms"]["median"]
+        new = item["latency_ms"]["median"]
+        ratio = new / old if old > 0 else float("inf")
+        flag = "  <-- 变慢" if ratio > threshold else ""
+        print(f"{item['name']:<32} {old:>12.3f} {new:>12.3f} {ratio:>8.2f}{flag}")
+        if ratio > threshold:
+            regressions.append(item["name"])
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="评分引擎基准测试")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick", help="测试规模")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果JSON文件路径")
+    parser.add_argument("--seed", type=int, default=20240101, help="合成数据随机种子")
+    parser.add_argument("--repeats", type=int, default=None, help="每个用例的重复次数（覆盖profile设置）")
+    parser.add_argument("--compare", default=None, help="基线结果JSON文件，对比中位数耗时")
+    parser.add_argument("--threshold", type=float, default=1.2, help="对比时判定变慢的耗时比例")
+    args = parser.parse_args(argv)
+
+    profile = dict(PROFILES[args.profile])
+    if args.repeats:
+        profile["repeats"] = args.repeats
+
+    results = run_suite(profile, args.seed, print)
+    report = {"meta": metadata(args.profile, args.seed), "results": results}
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 个用例耗时超过基线的 {args.threshold} 倍")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
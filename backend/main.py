@@ -2,14 +2,20 @@
 绿色化学分析软件 - 主入口文件
 Green Chemistry Analysis Software - Main Entry Point
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import logging
 import uvicorn
 
 from app.api.routes import router
 from app.core.config import settings
-from app.database.connection import init_db
+from app.core import executor, instrumentation
+from app.database.connection import AsyncSessionLocal, init_db
+from app.services import reagent_store, scheme_store
+
+instrumentation.configure_logging(settings.LOG_LEVEL)
+logger = logging.getLogger("app.request")
 
 
 @asynccontextmanager
@@ -17,8 +23,14 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时初始化数据库
     await init_db()
+    # 加载并编译自定义权重方案，加载试剂库索引
+    async with AsyncSessionLocal() as db:
+        count = await scheme_store.load_custom_schemes(db)
+        reagent_count = await reagent_store.load_reagents(db)
+    logging.getLogger(__name__).info("已加载 %d 个自定义权重方案、%d 个试剂", count, reagent_count)
     yield
     # 关闭时清理资源
+    executor.shutdown_pools()
 
 
 app = FastAPI(
@@ -37,6 +49,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """请求上下文：分配请求ID，按需记录分层耗时"""
+    request_id = request.headers.get("X-Request-ID") or instrumentation.new_request_id()
+    id_token = instrumentation.request_id_var.set(request_id)
+    trace_token = instrumentation.start_trace() if settings.SCORING_TRACE_ENABLED else None
+    
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request_id
+        
+        if trace_token is not None:
+            trace = instrumentation.stop_trace(trace_token)
+            trace_token = None
+            if trace:
+                response.headers["Server-Timing"] = instrumentation.server_timing_header(trace)
+                logger.info(
+                    "%s %s %s",
+                    request.method,
+                    request.url.path,
+                    instrumentation.server_timing_header(trace)
+                )
+        return response
+    finally:
+        if trace_token is not None:
+            instrumentation.stop_trace(trace_token)
+        instrumentation.request_id_var.reset(id_token)
+
+
 # 注册路由
 app.include_router(router, prefix="/api/v1")
 
@@ -2,6 +2,7 @@
 测试评分系统的计算逻辑
 """
 import sys
+from contextlib import asynccontextmanager
 sys.path.append('.')
 
 from app.services import scoring_service
@@ -47,10 +48,10 @@ def test_simple_case():
         }
     }
     
-    # 其他因子
-    p_factor = 50.0  # 0-100
-    r_factor_raw = 0.5  # 0-1
-    d_factor_raw = 0.5  # 0-1
+    # 其他因子（0-100）
+    p_factor = 50.0
+    r_factor = 50.0
+    d_factor = 50.0
     
     # 计算评分
     result = scoring_service.calculate_full_scores(
@@ -63,8 +64,11 @@ def test_simple_case():
         prep_densities=prep_densities,
         prep_factor_matrix=prep_factor_matrix,
         p_factor=p_factor,
-        r_factor_raw=r_factor_raw,
-        d_factor_raw=d_factor_raw,
+        pretreatment_p_factor=0.0,
+        instrument_r_factor=r_factor,
+        instrument_d_factor=d_factor,
+        pretreatment_r_factor=r_factor,
+        pretreatment_d_factor=d_factor,
         safety_scheme="PBT_Balanced",
         health_scheme="Absolute_Balance",
         environment_scheme="PBT_Balanced",
@@ -99,5 +103,1265 @@ def test_simple_case():
     print("\n" + "=" * 80)
 
 
+def test_array_engine_matches_dict_layers():
+    """数组引擎的结果应与逐层字典计算一致"""
+    masses = {"Water": 12.5, "Methanol": 7.9, "Acetonitrile": 0.0}
+    factor_matrix = {
+        "Water": {s: 0.0 for s in scoring_service.SUB_FACTOR_NAMES},
+        "Methanol": {s: 0.1 * (i + 1) for i, s in enumerate(scoring_service.SUB_FACTOR_NAMES)},
+        "Acetonitrile": {s: 1.0 for s in scoring_service.SUB_FACTOR_NAMES},
+    }
+    
+    sub_scores = scoring_service.calculate_all_sub_factors(masses, factor_matrix)
+    
+    for sub_factor in scoring_service.SUB_FACTOR_NAMES:
+        expected = scoring_service.normalize_sub_factor(
+            masses,
+            {r: f[sub_factor] for r, f in factor_matrix.items()},
+            sub_factor
+        )
+        assert abs(sub_scores[sub_factor] - expected) < 1e-9
+    
+    major_S = scoring_service.calculate_major_factor(sub_scores, "S", "Frontier_Focus")
+    major_H = scoring_service.calculate_major_factor(sub_scores, "H", "Strict_Compliance")
+    major_E = scoring_service.calculate_major_factor(sub_scores, "E", "Deep_Impact")
+    major_weights, inst_weights, _, _ = scoring_service.resolve_scheme_weights(
+        "Frontier_Focus", "Strict_Compliance", "Deep_Impact", "Eco_Friendly"
+    )
+    major = major_weights @ [sub_scores[s] for s in scoring_service.SUB_FACTOR_NAMES]
+    assert abs(major[0] - major_S) < 1e-9
+    assert abs(major[1] - major_H) < 1e-9
+    assert abs(major[2] - major_E) < 1e-9
+    
+    score1 = scoring_service.calculate_score1(
+        {"S": major_S, "H": major_H, "E": major_E}, 40.0, 20.0, 10.0, "Eco_Friendly"
+    )
+    assert abs(scoring_service.scoring_engine.stage_score(major, [40.0, 20.0, 10.0], inst_weights) - score1) < 1e-9
+
+
+def test_invalid_factor_rejected():
+    """超出范围的因子值应抛出 ValueError"""
+    factor_matrix = {"Water": {s: 0.0 for s in scoring_service.SUB_FACTOR_NAMES}}
+    factor_matrix["Water"]["H2"] = 1.5
+    
+    try:
+        scoring_service.calculate_all_sub_factors({"Water": 1.0}, factor_matrix)
+    except ValueError as e:
+        assert "H2" in str(e)
+    else:
+        raise AssertionError("应当拒绝超出范围的因子值")
+
+
+def _sample_method(**overrides):
+    """构造一个最小的完整评分输入"""
+    zero = {s: 0.0 for s in scoring_service.SUB_FACTOR_NAMES}
+    methanol = {s: 0.3 for s in scoring_service.SUB_FACTOR_NAMES}
+    method = dict(
+        instrument_time_points=[0, 10, 20],
+        instrument_composition={"Water": [90, 50, 10], "Methanol": [10, 50, 90]},
+        instrument_flow_rate=1.0,
+        instrument_densities={"Water": 1.0, "Methanol": 0.791},
+        instrument_factor_matrix={"Water": zero, "Methanol": methanol},
+        instrument_curve_types=["initial", "linear", "weak-convex"],
+        prep_volumes={"Methanol": 5.0},
+        prep_densities={"Methanol": 0.791},
+        prep_factor_matrix={"Methanol": methanol},
+        p_factor=20.0,
+        pretreatment_p_factor=0.0,
+        instrument_r_factor=10.0,
+        instrument_d_factor=10.0,
+        pretreatment_r_factor=5.0,
+        pretreatment_d_factor=5.0,
+    )
+    method.update(overrides)
+    return method
+
+
+@asynccontextmanager
+async def _test_database(path=None):
+    """建好全部表的SQLite数据库（默认在内存中，给出 path 时为文件），产出会话工厂，退出时释放引擎"""
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from app.database.connection import Base
+    
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}" if path else "sqlite+aiosqlite://")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+
+def test_batch_matches_single_and_isolates_errors():
+    """批量评分结果与逐个评分一致，单项错误不影响其他项"""
+    methods = [
+        _sample_method(),
+        _sample_method(final_scheme="Unknown"),
+        _sample_method(instrument_flow_rate=0.5, safety_scheme="Frontier_Focus"),
+    ]
+    
+    results = scoring_service.calculate_full_scores_batch(methods)
+    
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert results[1]["success"] is False
+    for i in (0, 2):
+        assert results[i]["success"] is True
+        assert results[i]["data"] == scoring_service.calculate_full_scores(**methods[i])
+
+
+def test_scheme_sweep_covers_all_combinations():
+    """方案扫描应覆盖全部4⁶种组合，且与单次评分结果一致"""
+    method = _sample_method()
+    sweep = scoring_service.sweep_weight_schemes(**method, include_values=True)
+    
+    assert sweep["combinations"] == 4 ** 6
+    assert sweep["statistics"]["min"] <= sweep["statistics"]["percentiles"]["p50"] <= sweep["statistics"]["max"]
+    
+    for key in ("argmax", "argmin"):
+        schemes = sweep[key]["schemes"]
+        single = scoring_service.calculate_full_scores(**method, **schemes)
+        assert single["final"]["score3"] == sweep[key]["score3"]
+
+
+def test_layer_caches_hit_on_repeated_gradient():
+    """同一梯度程序重复评分时命中Layer 0/1缓存，LRU容量有上限"""
+    from app.services import scoring_cache
+    
+    scoring_cache.clear_caches()
+    method = _sample_method()
+    first = scoring_service.calculate_full_scores(**method)
+    second = scoring_service.calculate_full_scores(**dict(method, final_scheme="Equal"))
+    
+    stats = scoring_cache.cache_stats()
+    assert stats["layer0_masses"]["hits"] == 1
+    assert stats["layer1_sub_factors"]["hits"] == 2
+    assert first["instrument"]["sub_factors"] == second["instrument"]["sub_factors"]
+    
+    cache = scoring_cache.LRUCache("test", maxsize=2)
+    for key in ("a", "b", "a", "c"):
+        cache.put(key, key)
+    assert cache.get("b") is None and cache.get("a") == "a"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_scoring_session_recomputes_only_dependent_layers():
+    """增量会话只重算受影响的层，结果与完整重算一致"""
+    from app.services.scoring_session import ScoringSession
+    
+    method = _sample_method()
+    session = ScoringSession(method)
+    
+    diff = session.update({"final_scheme": "Equal"})
+    assert diff["recomputed"] == ["layer2.merged", "layer5.score3"]
+    assert "final.score3" in diff["changes"]
+    
+    diff = session.update({"instrument_densities": {"Methanol": 0.8}})
+    assert "layer0.preparation" not in diff["recomputed"]
+    
+    expected = scoring_service.calculate_full_scores(**dict(
+        method,
+        final_scheme="Equal",
+        instrument_densities={"Water": 1.0, "Methanol": 0.8}
+    ))
+    assert session.result == expected
+    
+    try:
+        session.update({"final_scheme": "Unknown"})
+    except ValueError:
+        pass
+    assert session.result == expected and session.version == 2
+    
+    # 自定义方案被修改后按新权重重算，被删除后继续按原权重评分
+    registry = scoring_service.scheme_registry
+    try:
+        registry.register("final", "Test_Session", {"instrument": 0.6, "preparation": 0.4})
+        session = ScoringSession(dict(method, final_scheme="Test_Session"))
+        assert session.refresh() is None
+        
+        registry.register("final", "Test_Session", {"instrument": 0.9, "preparation": 0.1})
+        diff = session.refresh()
+        assert diff["recomputed"] == ["layer2.merged", "layer5.score3"] and diff["version"] == 1
+        updated = scoring_service.calculate_full_scores(**dict(method, final_scheme="Test_Session"))
+        assert session.result == updated
+        
+        registry.unregister("final", "Test_Session")
+        diff = session.update({"p_factor": 30.0})
+        assert "layer5.score3" in diff["recomputed"]
+        registry.register("final", "Test_Session", {"instrument": 0.9, "preparation": 0.1})
+        assert session.result == scoring_service.calculate_full_scores(
+            **dict(method, final_scheme="Test_Session", p_factor=30.0)
+        )
+    finally:
+        registry.clear_custom()
+
+
+def test_parametric_curves_match_named_curves():
+    """参数化曲线与同幂次的命名曲线积分系数一致"""
+    for strength, n in scoring_service.CURVE_ORDERS.items():
+        assert scoring_service.calculate_curve_integral_factor(f"convex-{n}") == \
+            scoring_service.calculate_curve_integral_factor(f"{strength}-convex")
+        assert scoring_service.calculate_curve_integral_factor(f"concave-{n}") == \
+            scoring_service.calculate_curve_integral_factor(f"{strength}-concave")
+    
+    masses = scoring_service.calculate_gradient_integral(
+        [0, 10, 20], {"MeOH": [50, 60, 80]}, 1.0, {"MeOH": 0.791}, ["initial", "linear", "linear"]
+    )
+    assert abs(masses["MeOH"] - 12.5 * 0.791) < 1e-9
+
+
+def test_pump_trace_integration_matches_gradient_program():
+    """泵组成轨迹积分与梯度程序积分一致，且结果与分块大小无关"""
+    import base64
+    import numpy as np
+    from app.services import trace_integration
+    
+    # 20 Hz 采样 20 分钟的线性梯度：50% → 60% → 80%
+    t = np.arange(20 * 60 * 20 + 1) / (20 * 60.0)
+    trace = np.interp(t, [0, 10, 20], [50, 60, 80])
+    expected = scoring_service.calculate_gradient_integral(
+        [0, 10, 20], {"MeOH": [50, 60, 80]}, 1.0, {"MeOH": 0.791}
+    )["MeOH"]
+    
+    for method in trace_integration.INTEGRATION_METHODS:
+        for chunk_size in (7, 1000, 1 << 20):
+            masses = trace_integration.calculate_trace_masses(
+                {"MeOH": trace}, 20.0, 1.0, {"MeOH": 0.791}, method=method, chunk_size=chunk_size
+            )
+            assert abs(masses["MeOH"] - expected) < 1e-9
+    
+    # Simpson法则对二次曲线精确（含奇数区间的3/8法则尾段）
+    x = np.linspace(0, 1, 10)
+    assert abs(trace_integration.integrate_trace(x ** 2, x[1], method="simpson", chunk_size=4) - 1 / 3) < 1e-12
+    
+    # base64 二进制缓冲区与流速轨迹
+    buffer = base64.b64encode(trace.astype("<f8").tobytes()).decode()
+    stage = scoring_service.build_trace_instrument_arrays(
+        {"MeOH": buffer}, 20.0, np.full(len(trace), 1.0), {"MeOH": 0.791},
+        {"MeOH": {name: 0.5 for name in scoring_service.SUB_FACTOR_NAMES}}, dtype="float64"
+    )
+    assert abs(stage.masses[0] - expected) < 1e-9
+
+
+def test_ndjson_stream_scores_batches_as_input_arrives():
+    """NDJSON流式评分：按批输出，输入未读完前即返回首批结果，坏行单独报错"""
+    import asyncio
+    import json
+    from app.services.scoring_stream import score_ndjson_stream
+    
+    consumed = []
+    
+    async def chunks():
+        for i in range(5):
+            consumed.append(i)
+            yield b"{}\n" if i == 1 else b"method\n"
+        consumed.append("end")
+    
+    def parse(line):
+        if line == b"{}":
+            raise ValueError("缺少方法数据")
+        return _sample_method()
+    
+    async def run():
+        outputs = []
+        async for block in score_ndjson_stream(chunks(), parse, batch_size=2, max_line_bytes=16):
+            outputs.append((len(consumed), [json.loads(line) for line in block.splitlines()]))
+        return outputs
+    
+    outputs = asyncio.run(run())
+    assert [len(records) for _, records in outputs] == [2, 2, 1]
+    assert outputs[0][0] == 2  # 首批结果在读取第3块之前输出
+    
+    records = [record for _, block in outputs for record in block]
+    expected = scoring_service.calculate_full_scores(**_sample_method())
+    assert [r["index"] for r in records] == list(range(5))
+    assert records[1] == {"index": 1, "success": False, "error": "缺少方法数据"}
+    assert records[0]["data"]["final"] == expected["final"]
+
+
+def test_worker_pool_limits_queue_depth_and_keeps_context():
+    """工作池：超出排队上限时拒绝，线程池中保留请求上下文，统计计数正确"""
+    import asyncio
+    import threading
+    from app.core import instrumentation
+    from app.core.executor import ExecutorBusyError, WorkerPool
+    
+    pool = WorkerPool("test", "thread", max_workers=1, max_queue=1)
+    release = threading.Event()
+    
+    async def run():
+        token = instrumentation.request_id_var.set("req-1")
+        try:
+            blocked = asyncio.ensure_future(pool.run(release.wait))
+            await asyncio.sleep(0.05)
+            try:
+                await pool.run(lambda: None)
+                assert False, "超出排队上限时应拒绝"
+            except ExecutorBusyError:
+                pass
+            release.set()
+            await blocked
+            return await pool.run(instrumentation.request_id_var.get)
+        finally:
+            instrumentation.request_id_var.reset(token)
+    
+    try:
+        assert asyncio.run(run()) == "req-1"
+    finally:
+        pool.shutdown()
+    
+    stats = pool.stats()
+    assert (stats["submitted"], stats["completed"], stats["rejected"], stats["pending"]) == (2, 2, 1, 0)
+
+
+def test_custom_weight_scheme_compiled_and_validated():
+    """自定义权重方案注册后编译为数组，可用于单个/批量评分和扫描；权重和不为1时拒绝"""
+    registry = scoring_service.scheme_registry
+    weights = {"S": 0.5, "H": 0.1, "E": 0.1, "P": 0.1, "R": 0.1, "D": 0.1}
+    
+    try:
+        scheme_id = registry.register("instrument_stage", "Test_Safety_Heavy", weights)
+        assert registry.compiled.matrices["instrument_stage"][scheme_id].tolist() == [0.5, 0.1, 0.1, 0.1, 0.1, 0.1]
+        
+        method = _sample_method(instrument_stage_scheme="Test_Safety_Heavy")
+        single = scoring_service.calculate_full_scores(**method)
+        batch = scoring_service.calculate_full_scores_batch([_sample_method(), method])
+        assert batch[1]["data"]["final"] == single["final"]
+        assert batch[0]["data"]["final"] == scoring_service.calculate_full_scores(**_sample_method())["final"]
+        
+        sweep = scoring_service.sweep_weight_schemes(**method)
+        assert sweep["combinations"] == 4 ** 5 * 5
+        
+        # 逐项的 Layer 2/5 函数同样按注册表取权重
+        registry.register("final", "Test_LabX", {"instrument": 0.7, "preparation": 0.3})
+        merged = scoring_service.merge_sub_factors({"S1": 50.0, "E3": 10.0}, {"S1": 20.0}, "Test_LabX")
+        assert set(merged) == set(scoring_service.SUB_FACTOR_NAMES)
+        assert abs(merged["S1"] - 41.0) < 1e-9 and abs(merged["E3"] - 7.0) < 1e-9
+        assert abs(scoring_service.calculate_score3(50.0, 20.0, "Test_LabX") - 41.0) < 1e-9
+        
+        for bad in ({**weights, "S": 0.6}, {"S": 1.0}):
+            try:
+                registry.register("instrument_stage", "Bad", bad)
+                assert False, "无效的权重方案应被拒绝"
+            except ValueError:
+                pass
+        try:
+            registry.register("final", "Standard", {"instrument": 0.5, "preparation": 0.5})
+            assert False, "内置方案不可覆盖"
+        except ValueError:
+            pass
+    finally:
+        registry.clear_custom()
+    
+    try:
+        scoring_service.calculate_full_scores(**_sample_method(instrument_stage_scheme="Test_Safety_Heavy"))
+        assert False, "删除后的方案应不可用"
+    except ValueError as e:
+        assert "仪器阶段" in str(e)
+
+
+def test_custom_schemes_persist_and_reload_from_database():
+    """自定义方案写库后编译进注册表，启动时从数据库重新加载，并可同步到工作进程的注册表"""
+    import asyncio
+    from app.database.models import WeightScheme
+    from app.services import scheme_store, weight_schemes
+    
+    registry = scoring_service.scheme_registry
+    weights = {"instrument": 0.5, "preparation": 0.5}
+    
+    async def run():
+        try:
+            async with _test_database() as sessions:
+                async with sessions() as db:
+                    saved = await scheme_store.save_custom_scheme(db, "final", "Test_Half", weights, "对半")
+                    assert saved["weights"] == weights
+                    assert registry.get_weights("final", "Test_Half") == weights
+                
+                    try:
+                        await scheme_store.save_custom_scheme(db, "final", "Test_Bad", {"instrument": 0.9, "preparation": 0.3})
+                        assert False, "权重和不为1时应拒绝"
+                    except ValueError:
+                        pass
+                
+                    # 手工写入一条无效记录，加载时应被跳过
+                    db.add(WeightScheme(category="final", name="Test_Broken", weights={"instrument": 2.0}))
+                    await db.commit()
+            
+                # 模拟重启：清空内存中的自定义方案后从数据库加载
+                registry.clear_custom()
+                async with sessions() as db:
+                    assert await scheme_store.load_custom_schemes(db) == 1
+                assert "Test_Half" in scoring_service.get_available_schemes()["final"]
+                assert "Test_Broken" not in scoring_service.get_available_schemes()["final"]
+            
+                # 工作进程中的注册表只有内置方案，按导出状态同步一次
+                worker = weight_schemes.SchemeRegistry({"final": scoring_service.FINAL_WEIGHTS})
+                state = registry.export()
+                worker.sync(state)
+                assert worker.get_weights("final", "Test_Half") == weights
+                version = worker.compiled.version
+                worker.sync(state)
+                assert worker.compiled.version == version
+            
+                async with sessions() as db:
+                    assert await scheme_store.delete_custom_scheme(db, "final", "Test_Half")
+                    assert not await scheme_store.delete_custom_scheme(db, "final", "Test_Half")
+                    assert [s["name"] for s in await scheme_store.list_custom_schemes(db)] == ["Test_Broken"]
+                assert "Test_Half" not in scoring_service.get_available_schemes()["final"]
+        finally:
+            registry.clear_custom()
+    
+    asyncio.run(run())
+
+
+def test_saved_results_ranked_and_filtered_in_database():
+    """评分结果按列保存，可按方案组合排名、按得分范围和小因子过滤，并键集分页"""
+    import asyncio
+    from app.services import result_store
+    
+    methods = [
+        _sample_method(instrument_flow_rate=rate, final_scheme=scheme)
+        for rate in (0.2, 0.5, 1.0, 1.5, 2.0)
+        for scheme in ("Standard", "Equal")
+    ]
+    scored = scoring_service.calculate_full_scores_batch(methods)
+    entries = [(item["data"], f"method-{i}", None) for i, item in enumerate(scored)]
+    
+    async def run():
+        async with _test_database() as sessions:
+            async with sessions() as db:
+                ids = await result_store.save_results(db, entries)
+                assert len(ids) == len(entries)
+                
+                # 指定方案组合下Score₃最低的前3个
+                schemes = dict(scoring_service.DEFAULT_SCHEMES, final_scheme="Equal")
+                top = await result_store.query_results(db, schemes=schemes, limit=3)
+                expected = sorted(
+                    (item["data"]["final"]["score3"], ids[i]) for i, item in enumerate(scored)
+                    if methods[i]["final_scheme"] == "Equal"
+                )
+                assert [(r["score3"], r["id"]) for r in top["items"]] == expected[:3]
+                assert top["items"][0]["final_scheme"] == "Equal"
+                
+                # 翻页直到结束，覆盖全部结果且不重复
+                seen, cursor = [], None
+                while True:
+                    page = await result_store.query_results(db, limit=4, cursor=cursor, descending=True)
+                    seen += [r["id"] for r in page["items"]]
+                    cursor = page["next_cursor"]
+                    if cursor is None:
+                        break
+                assert sorted(seen) == sorted(ids) and len(seen) == len(ids)
+                
+                low, high = expected[1][0], expected[3][0]
+                ranged = await result_store.query_results(
+                    db, schemes={"final_scheme": "Equal"}, score_ranges={"score3": (low, high)}
+                )
+                assert [r["score3"] for r in ranged["items"]] == [score for score, _ in expected[1:4]]
+                
+                detail = await result_store.get_result(db, ids[0])
+                assert detail["score3"] == scored[0]["data"]["final"]["score3"]
+                assert detail["sub_factors"]["merged"] == scored[0]["data"]["merged"]["sub_factors"]
+                
+                s1 = detail["sub_factors"]["merged"]["S1"]
+                by_factor = await result_store.query_results(
+                    db, sub_factor=("merged", "S1", None, s1), limit=100
+                )
+                assert ids[0] in [r["id"] for r in by_factor["items"]]
+                assert all(
+                    item["data"]["merged"]["sub_factors"]["S1"] <= s1
+                    for item, result_id in zip(scored, ids)
+                    if result_id in [r["id"] for r in by_factor["items"]]
+                )
+                
+                assert await result_store.delete_result(db, ids[0])
+                assert await result_store.get_result(db, ids[0]) is None
+    
+    asyncio.run(run())
+
+
+def test_hplc_listing_keyset_pagination_and_filters():
+    """HPLC分析列表：键集分页覆盖全部记录且不重复，过滤条件生效"""
+    import asyncio
+    import datetime
+    from app.api import routes
+    from app.database.models import HPLCAnalysis
+    
+    async def list_page(db, **params):
+        defaults = dict(
+            limit=10, cursor=None, min_score=None, max_score=None,
+            solvent=None, created_from=None, created_to=None
+        )
+        response = await routes.list_hplc_analyses(**dict(defaults, **params), db=db)
+        return response.data
+    
+    async def run():
+        async with _test_database() as sessions:
+            async with sessions() as db:
+                db.add_all([
+                    HPLCAnalysis(
+                        name=f"analysis-{i}",
+                        solvent_a="Methanol" if i % 2 else "Acetonitrile",
+                        solvent_b="Water",
+                        flow_rate=1.0,
+                        green_score=float(i)
+                    )
+                    for i in range(25)
+                ])
+                await db.commit()
+                
+                seen, cursor = [], None
+                while True:
+                    page = await list_page(db, cursor=cursor)
+                    seen += [item["id"] for item in page["items"]]
+                    cursor = page["next_cursor"]
+                    if cursor is None:
+                        break
+                assert seen == sorted(seen, reverse=True) and len(set(seen)) == 25
+                
+                filtered = await list_page(db, limit=100, solvent="Methanol", min_score=5, max_score=15)
+                assert sorted(item["green_score"] for item in filtered["items"]) == [5, 7, 9, 11, 13, 15]
+                
+                today = datetime.datetime.now(datetime.timezone.utc).date()
+                assert len((await list_page(db, limit=100, created_from=today, created_to=today))["items"]) == 25
+                tomorrow = today + datetime.timedelta(days=1)
+                assert (await list_page(db, created_from=tomorrow))["items"] == []
+                
+                try:
+                    await list_page(db, cursor="invalid")
+                    assert False, "无效游标应返回400"
+                except routes.HTTPException as e:
+                    assert e.status_code == 400
+    
+    asyncio.run(run())
+
+
+def test_hplc_bulk_create_in_chunks():
+    """批量创建：按块插入，ID与输入顺序一致，绿色评分与单条计算一致"""
+    import asyncio
+    from sqlalchemy import select
+    from app.database.models import HPLCAnalysis
+    from app.services import analysis_store
+    from app.services.green_chemistry import analyzer
+    
+    solvents = ["水", "甲醇", "乙腈", "未知溶剂"]
+    analyses = [
+        {
+            "name": f"legacy-{i}",
+            "description": None,
+            "solvent_a": solvents[i % 4],
+            "solvent_b": solvents[(i + 1) % 4],
+            "flow_rate": 0.5 + i * 7.3,
+            "column_type": "C18",
+            "temperature": 30.0
+        }
+        for i in range(23)
+    ]
+    
+    async def run():
+        async with _test_database() as sessions:
+            async with sessions() as db:
+                ids = await analysis_store.bulk_create_analyses(db, analyses, chunk_size=5)
+                assert len(ids) == len(analyses) and len(set(ids)) == len(ids)
+                
+                rows = {
+                    row.id: row
+                    for row in (await db.execute(
+                        select(HPLCAnalysis.id, HPLCAnalysis.name, HPLCAnalysis.green_score, HPLCAnalysis.created_at)
+                    )).all()
+                }
+                for result_id, item in zip(ids, analyses):
+                    expected = analyzer.calculate_solvent_score(
+                        item["solvent_a"], item["solvent_b"], ratio_a=0.5, volume_ml=item["flow_rate"]
+                    )["overall_green_score"]
+                    assert rows[result_id].name == item["name"]
+                    assert rows[result_id].green_score == expected
+                    assert rows[result_id].created_at is not None
+    
+    asyncio.run(run())
+
+
+def test_method_store_versions_and_delta_sync():
+    """方法数据存储：逐条写入、版本冲突检测、删除标记和按修订号增量拉取"""
+    import asyncio
+    from app.services import method_store
+    
+    async def run():
+        async with _test_database() as sessions:
+            async with sessions() as db:
+                created = await method_store.apply_changes(db, [
+                    {"collection": "methods", "key": "m1", "data": {"sampleCount": 5}, "base_version": 0},
+                    {"collection": "factors", "key": "甲醇", "data": {"S1": 0.5}},
+                    {"collection": "gradients", "key": "g1", "data": {"steps": []}}
+                ])
+                assert [item["version"] for item in created] == [1, 1, 1]
+                assert [item["revision"] for item in created] == [1, 2, 3]
+                
+                # 首次同步拿到全部记录
+                snapshot = await method_store.changes_since(db, 0)
+                assert [item["key"] for item in snapshot["changes"]] == ["m1", "甲醇", "g1"]
+                assert snapshot["revision"] == 3 and not snapshot["has_more"]
+                
+                # 另一个客户端修改 m1 后，基于旧版本的写入冲突，不覆盖
+                updated = await method_store.apply_changes(db, [
+                    {"collection": "methods", "key": "m1", "data": {"sampleCount": 6}, "base_version": 1}
+                ])
+                assert updated[0]["success"] and updated[0]["version"] == 2 and updated[0]["revision"] == 4
+                stale = await method_store.apply_changes(db, [
+                    {"collection": "methods", "key": "m1", "data": {"sampleCount": 7}, "base_version": 1},
+                    {"collection": "gradients", "key": "g1", "data": {"steps": []}}
+                ])
+                assert stale[0]["conflict"] and stale[0]["current"]["data"] == {"sampleCount": 6}
+                assert stale[1]["success"] and not stale[1]["changed"]  # 内容未变，不分配修订号
+                
+                deleted = await method_store.apply_changes(db, [{"collection": "factors", "key": "甲醇", "deleted": True}])
+                assert deleted[0]["changed"] and deleted[0]["revision"] == 5
+                assert await method_store.get_record(db, "factors", "甲醇") is None
+                
+                # 增量拉取只返回修订号3之后的变更（含删除标记），分页不丢不重
+                page = await method_store.changes_since(db, 3, limit=1)
+                assert [item["key"] for item in page["changes"]] == ["m1"] and page["has_more"]
+                page = await method_store.changes_since(db, page["revision"], limit=1)
+                assert page["changes"][0]["deleted"] and page["changes"][0]["data"] is None
+                assert page["revision"] == 5 and not page["has_more"]
+                
+                # 首次同步不下发删除标记
+                snapshot = await method_store.changes_since(db, 0)
+                assert {item["key"] for item in snapshot["changes"]} == {"m1", "g1"}
+                
+                for invalid in (
+                    [{"collection": "users", "key": "a", "data": 1}],
+                    [{"collection": "methods", "key": "a", "data": 1}, {"collection": "methods", "key": "a", "data": 2}]
+                ):
+                    try:
+                        await method_store.apply_changes(db, invalid)
+                        raise AssertionError("无效变更未被拒绝")
+                    except ValueError:
+                        pass
+    
+    asyncio.run(run())
+
+
+def test_method_store_concurrent_writers_conflict():
+    """两个请求读取同一版本后交错写入：后写入的一方返回冲突，不覆盖先提交的数据"""
+    import asyncio
+    import os
+    import tempfile
+    from app.services import method_store
+    
+    allocate = method_store._allocate_revisions
+    
+    async def run(path):
+        read_done = asyncio.Event()
+        resume = asyncio.Event()
+        
+        # 第一个请求读取现有记录之后、取得写锁之前暂停
+        async def paused_allocate(db, count):
+            if not read_done.is_set():
+                read_done.set()
+                await resume.wait()
+            return await allocate(db, count)
+        
+        async def interleave(sessions, first, second):
+            async with sessions() as db_a, sessions() as db_b:
+                method_store._allocate_revisions = paused_allocate
+                try:
+                    task = asyncio.create_task(method_store.apply_changes(db_a, [first]))
+                    await read_done.wait()
+                    (winner,) = await method_store.apply_changes(db_b, [second])
+                    resume.set()
+                    (loser,) = await task
+                finally:
+                    method_store._allocate_revisions = allocate
+                read_done.clear()
+                resume.clear()
+                return winner, loser
+        
+        async with _test_database(path) as sessions:
+            async with sessions() as db:
+                await method_store.apply_changes(db, [{"collection": "methods", "key": "m1", "data": {"n": 1}}])
+            
+            # 同时基于版本1更新
+            winner, loser = await interleave(
+                sessions,
+                {"collection": "methods", "key": "m1", "data": {"n": "A"}, "base_version": 1},
+                {"collection": "methods", "key": "m1", "data": {"n": "B"}, "base_version": 1}
+            )
+            assert winner["success"] and winner["version"] == 2
+            assert loser["conflict"] and loser["current"]["version"] == 2 and loser["current"]["data"] == {"n": "B"}
+            
+            # 同时首次写入同一个新记录
+            winner, loser = await interleave(
+                sessions,
+                {"collection": "methods", "key": "m2", "data": {"n": "A"}, "base_version": 0},
+                {"collection": "methods", "key": "m2", "data": {"n": "B"}, "base_version": 0}
+            )
+            assert winner["success"] and winner["version"] == 1
+            assert loser["conflict"] and loser["current"]["data"] == {"n": "B"}
+            
+            # 不检查版本的写入后写覆盖，版本按库中的值递增
+            winner, loser = await interleave(
+                sessions,
+                {"collection": "methods", "key": "m1", "data": {"n": "C"}},
+                {"collection": "methods", "key": "m1", "data": {"n": "D"}}
+            )
+            assert winner["version"] == 3 and loser["success"] and loser["version"] == 4
+            
+            async with sessions() as db:
+                assert (await method_store.get_record(db, "methods", "m1"))["data"] == {"n": "C"}
+                assert (await method_store.get_record(db, "methods", "m2"))["data"] == {"n": "B"}
+    
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(os.path.join(directory, "store.db")))
+
+
+def test_reagent_library_resolves_request_reagents():
+    """试剂库：请求中省略的密度和因子按名称/别名/ID从内存索引补全，评分与显式给出时一致"""
+    import asyncio
+    from app.api import routes
+    from app.schemas.schemas import FullScoreRequest
+    from app.services import reagent_store
+    from app.services.reagent_library import reagent_library
+    
+    water = {"S1": 0.552, "S2": 0.0, "S3": 0.0, "S4": 0.0, "H1": 0.0, "H2": 0.0, "E1": 0.0, "E2": 0.0, "E3": 0.0}
+    methanol = {"S1": 0.625, "S2": 1.0, "S3": 0.0, "S4": 0.266, "H1": 0.316, "H2": 0.113, "E1": 0.0, "E2": 0.316, "E3": 0.0}
+    common = {
+        "p_factor": 50.0,
+        "instrument_r_factor": 30.0,
+        "instrument_d_factor": 30.0,
+        "pretreatment_r_factor": 20.0,
+        "pretreatment_d_factor": 20.0
+    }
+    explicit = FullScoreRequest.model_validate({
+        "instrument": {
+            "time_points": [0, 10, 20],
+            "composition": {"Water": [100, 50, 0], "MeOH": [0, 50, 100]},
+            "flow_rate": 1.0,
+            "densities": {"Water": 1.0, "MeOH": 0.791},
+            "factor_matrix": {"Water": water, "MeOH": methanol}
+        },
+        "preparation": {"volumes": {"A": 2.0}, "densities": {"A": 0.791}, "factor_matrix": {"A": methanol}},
+        **common
+    })
+    
+    async def run():
+        try:
+            async with _test_database() as sessions:
+                async with sessions() as db:
+                    saved = await reagent_store.save_reagents(db, [
+                        {"name": "Water", "density": 1.0, "factors": water},
+                        {"name": "Methanol", "aliases": ["MeOH", "甲醇"], "density": 0.791, "factors": methanol}
+                    ])
+                    methanol_id = saved[1]["id"]
+                
+                    for invalid in (
+                        [{"name": "Ethanol", "aliases": ["meoh"], "density": 0.789, "factors": water}],
+                        [{"name": "Bad", "density": 1.0, "factors": {**water, "S1": 1.5}}]
+                    ):
+                        try:
+                            await reagent_store.save_reagents(db, invalid)
+                            raise AssertionError("无效试剂未被拒绝")
+                        except ValueError:
+                            pass
+            
+                # 模拟重启：清空索引后从数据库加载
+                reagent_library.replace([])
+                async with sessions() as db:
+                    assert await reagent_store.load_reagents(db) == 2
+            
+                referenced = FullScoreRequest.model_validate({
+                    "instrument": {
+                        "time_points": [0, 10, 20],
+                        "composition": {"water": [100, 50, 0], "MeOH": [0, 50, 100]},
+                        "flow_rate": 1.0
+                    },
+                    "preparation": {"volumes": {"A": 2.0}, "reagents": {"A": methanol_id}},
+                    **common
+                })
+                kwargs = routes._full_score_kwargs(referenced)
+                assert kwargs["instrument_densities"] == {"water": 1.0, "MeOH": 0.791}
+                assert kwargs["prep_factor_matrix"] == {"A": methanol}
+            
+                expected = scoring_service.calculate_full_scores(**routes._full_score_kwargs(explicit))
+                result = scoring_service.calculate_full_scores(**kwargs)
+                assert result["final"]["score3"] == expected["final"]["score3"]
+            
+                # 显式给出的因子优先于试剂库
+                override = referenced.model_copy(deep=True)
+                override.instrument.factor_matrix = explicit.instrument.factor_matrix
+                override.instrument.factor_matrix["MeOH"] = explicit.instrument.factor_matrix["Water"]
+                assert routes._full_score_kwargs(override)["instrument_factor_matrix"]["MeOH"] == water
+            
+                for references in ({"A": 9999}, {"B": "Methanol"}):
+                    bad = referenced.model_copy(deep=True)
+                    bad.preparation.reagents = references
+                    try:
+                        routes._full_score_kwargs(bad)
+                        raise AssertionError("无效的试剂引用未被拒绝")
+                    except ValueError:
+                        pass
+            
+                async with sessions() as db:
+                    assert await reagent_store.delete_reagent(db, methanol_id)
+                assert reagent_library.get("MeOH") is None
+        finally:
+            reagent_library.replace([])
+    
+    asyncio.run(run())
+
+
+def test_chromatogram_trace_peaks_and_usp_metrics():
+    """原始信号处理：漂移基线+噪声上的高斯峰，保留时间、面积、塔板数和USP分离度与理论值一致"""
+    import base64
+    import numpy as np
+    from app.services import chromatogram
+    from app.services.green_chemistry import analyzer
+    
+    rate = 20.0  # Hz
+    t = np.arange(int(30 * 60 * rate) + 1) / (rate * 60.0)
+    peaks = [(5.0, 0.03, 80.0), (5.15, 0.03, 40.0), (12.0, 0.06, 200.0), (22.0, 0.1, 30.0)]
+    signal = 1.0 + 0.05 * t + 0.5 * np.sin(t / 8.0)
+    for rt, sigma, height in peaks:
+        signal += height * np.exp(-0.5 * ((t - rt) / sigma) ** 2)
+    signal += np.random.default_rng(7).normal(0.0, 0.1, t.size)
+    
+    result = chromatogram.process_chromatogram(signal, rate, baseline_window=1.5)
+    assert result["num_peaks"] == len(peaks)
+    assert abs(result["noise"] - 0.1) < 0.01
+    for found, (rt, sigma, height) in zip(result["peaks"], peaks):
+        assert abs(found["retention_time"] - rt) < 0.1 * sigma
+        assert abs(found["area"] - height * sigma * np.sqrt(2 * np.pi)) / (height * sigma * np.sqrt(2 * np.pi)) < 0.02
+        assert abs(found["tailing"] - 1.0) < 0.06
+    
+    # 孤立峰的塔板数 N = 5.54 (t_R / W_h)²；部分重叠的前两个峰 Rs = 1.18 Δt / (W_h1 + W_h2)
+    isolated = result["peaks"][2]
+    expected_plates = 5.54 * (12.0 / (2.3548 * 0.06)) ** 2
+    assert abs(isolated["plates"] - expected_plates) / expected_plates < 0.02
+    expected_resolution = 1.18 * 0.15 / (2 * 2.3548 * 0.03)
+    assert abs(result["peaks"][1]["resolution"] - expected_resolution) / expected_resolution < 0.03
+    assert result["main_peak_retention_time"] == result["peaks"][2]["retention_time"]
+    
+    # base64编码的float32缓冲区与数值列表结果一致
+    encoded = base64.b64encode(signal.astype("<f4").tobytes()).decode()
+    from_buffer = chromatogram.process_chromatogram(encoded, rate, baseline_window=1.5, dtype="float32")
+    assert [p["retention_time"] for p in from_buffer["peaks"]] == [p["retention_time"] for p in result["peaks"]]
+    
+    # 已选峰的分析在给出半峰宽时按USP计算分离度
+    legacy = analyzer.analyze_chromatogram([5.0, 5.15], [100.0, 50.0], peak_widths=[0.0706, 0.0706])
+    assert abs(legacy["average_resolution"] - expected_resolution) < 0.01
+
+
+def test_trace_upload_stored_as_memory_mapped_file():
+    """原始信号上传：二进制/.npy 请求体逐块写入文件，按内存映射处理，替换时删除旧文件"""
+    import asyncio
+    import io
+    import os
+    import tempfile
+    import numpy as np
+    from app.api import routes
+    from app.core.config import settings
+    from app.database.models import HPLCAnalysis
+    from app.schemas.schemas import ChromatogramProcessingOptions
+    from app.services import chromatogram, trace_store
+    
+    rate = 10.0
+    t = np.arange(int(10 * 60 * rate)) / (rate * 60.0)
+    signal = 0.2 + 50.0 * np.exp(-0.5 * ((t - 3.0) / 0.05) ** 2) + 20.0 * np.exp(-0.5 * ((t - 6.0) / 0.08) ** 2)
+    signal += np.random.default_rng(3).normal(0.0, 0.05, t.size)
+    
+    async def chunks(data, size):
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+    
+    async def run(directory):
+        async with _test_database() as sessions:
+            async with sessions() as db:
+                analysis = HPLCAnalysis(name="trace", raw_data={"operator": "A"})
+                db.add(analysis)
+                await db.commit()
+                
+                raw = signal.astype("<f4").tobytes()
+                meta = await trace_store.attach_trace(db, analysis.id, chunks(raw, 1001), rate, start_time=0.5)
+                assert meta["format"] == "raw" and meta["num_samples"] == t.size and meta["bytes"] == len(raw)
+                assert isinstance(trace_store.open_trace(meta), np.memmap)
+                
+                options = ChromatogramProcessingOptions(baseline_window=1.0)
+                stored = (await routes.analyze_hplc_trace(analysis.id, options, db=db)).data
+                inline = chromatogram.process_chromatogram(
+                    signal.astype(np.float32), rate, start_time=0.5, **options.model_dump()
+                )
+                assert stored["peaks"] == inline["peaks"] and stored["num_peaks"] == 2
+                assert abs(stored["peaks"][0]["retention_time"] - 3.5) < 0.005
+                
+                # .npy 上传（头部跨越数据块）替换原信号，其他 raw_data 字段保留
+                buffer = io.BytesIO()
+                np.save(buffer, signal.astype("<f8"))
+                replaced = await trace_store.attach_trace(db, analysis.id, chunks(buffer.getvalue(), 7), rate)
+                assert replaced["format"] == "npy" and replaced["dtype"] == "float64"
+                assert os.listdir(directory) == [replaced["file"]]
+                assert (await trace_store.get_trace_meta(db, analysis.id)) == replaced
+                raw_data = (await db.execute(
+                    routes.select(HPLCAnalysis.raw_data).where(HPLCAnalysis.id == analysis.id)
+                )).scalar_one()
+                assert raw_data["operator"] == "A"
+                assert np.array_equal(trace_store.open_trace(replaced), signal)
+                
+                # 无效数据（含 NaN/inf 的信号）不留下文件，原信号不变
+                nan_raw = signal[:4000].astype("<f4")
+                nan_raw[2500] = np.nan
+                inf_npy = io.BytesIO()
+                np.save(inf_npy, np.append(signal[:100], np.inf))
+                for data, error in (
+                    (raw[:-1], ValueError),
+                    (raw, trace_store.TraceTooLargeError),
+                    (buffer.getvalue()[:-8], ValueError),
+                    (nan_raw.tobytes(), ValueError),
+                    (inf_npy.getvalue(), ValueError)
+                ):
+                    try:
+                        await trace_store.attach_trace(db, analysis.id, chunks(data, 4096), rate, max_bytes=len(raw) - 4)
+                        assert False, "无效信号应被拒绝"
+                    except error:
+                        pass
+                assert os.listdir(directory) == [replaced["file"]]
+                assert (await trace_store.get_trace_meta(db, analysis.id)) == replaced
+                
+                assert await trace_store.attach_trace(db, 999, chunks(raw, 4096), rate) is None
+    
+    original = settings.TRACE_STORAGE_DIR
+    block_bytes = trace_store._WRITE_BLOCK_BYTES
+    with tempfile.TemporaryDirectory() as directory:
+        settings.TRACE_STORAGE_DIR = directory
+        # 小的写入块：数据块与采样点边界不对齐时分多次写入
+        trace_store._WRITE_BLOCK_BYTES = 1000
+        try:
+            asyncio.run(run(directory))
+        finally:
+            settings.TRACE_STORAGE_DIR = original
+            trace_store._WRITE_BLOCK_BYTES = block_bytes
+
+
+def test_chromatogram_batch_runs_in_chunks_with_aggregates():
+    """色谱批量分析：分块并行、结果按输入顺序，汇总保留时间漂移和面积RSD，单个运行出错不影响其他运行"""
+    import asyncio
+    import base64
+    import tempfile
+    import numpy as np
+    from app.core.config import settings
+    from app.database.models import HPLCAnalysis
+    from app.services import chromatogram_batch, trace_store
+    
+    rate = 10.0
+    t = np.arange(int(12 * 60 * rate)) / (rate * 60.0)
+    
+    def injection(i):
+        # 第一个峰每针后移 0.003 分钟，第二个峰面积固定
+        signal = 0.3 + 40.0 * np.exp(-0.5 * ((t - 4.0 - 0.003 * i) / 0.05) ** 2)
+        signal += 25.0 * np.exp(-0.5 * ((t - 8.0) / 0.07) ** 2)
+        return signal + np.random.default_rng(i).normal(0.0, 0.03, t.size)
+    
+    chunks_submitted = []
+    
+    async def run_inline(func, *args, **kwargs):
+        chunks_submitted.append(len(args[0]))
+        return func(*args, **kwargs)
+    
+    async def upload(data):
+        yield data
+    
+    async def run():
+        async with _test_database() as sessions:
+            async with sessions() as db:
+                analysis = HPLCAnalysis(name="inj0")
+                db.add(analysis)
+                await db.commit()
+                await trace_store.attach_trace(db, analysis.id, upload(injection(0).astype("<f4").tobytes()), rate)
+                
+                requested = [{"analysis_id": analysis.id}]
+                for i in range(1, 8):
+                    signal = injection(i)
+                    if i % 2:
+                        requested.append({"name": f"inj{i}", "signal": base64.b64encode(signal.astype("<f8").tobytes()).decode(), "dtype": "float64", "sample_rate_hz": rate})
+                    else:
+                        requested.append({"name": f"inj{i}", "signal": signal.tolist(), "sample_rate_hz": rate})
+                requested += [{"analysis_id": 999}, {"name": "empty"}, {"signal": "AAAAAAAAAAA=", "sample_rate_hz": rate}]
+                
+                runs = await chromatogram_batch.resolve_runs(db, requested)
+                result = await chromatogram_batch.analyze_batch(
+                    runs, {}, run=run_inline, workers=3, targets=[4.0, 8.0, 11.0], rt_window=0.1
+                )
+        return result
+    
+    original = settings.TRACE_STORAGE_DIR
+    with tempfile.TemporaryDirectory() as directory:
+        settings.TRACE_STORAGE_DIR = directory
+        try:
+            result = asyncio.run(run())
+        finally:
+            settings.TRACE_STORAGE_DIR = original
+    
+    assert chunks_submitted == [4, 4, 3]
+    assert [item["index"] for item in result["results"]] == list(range(11))
+    assert (result["succeeded"], result["failed"]) == (8, 3)
+    assert result["results"][0]["name"] == 1 and result["results"][3]["name"] == "inj3"
+    assert "peaks" not in result["results"][0]["data"]
+    assert "不存在或未上传信号" in result["results"][8]["error"]
+    assert "analysis_id 或 signal" in result["results"][9]["error"]
+    assert "至少需要3个采样点" in result["results"][10]["error"]
+    
+    drifting, stable, absent = result["aggregates"]["targets"]
+    assert drifting["found"] == 8 and drifting["missing_runs"] == []
+    assert abs(drifting["retention_time"]["drift"] - 0.021) < 0.003
+    assert abs(drifting["retention_time"]["slope_per_run"] - 0.003) < 0.0005
+    assert stable["area"]["rsd"] < 1.0
+    assert abs(stable["area"]["mean"] - 25.0 * 0.07 * np.sqrt(2 * np.pi)) < 0.05
+    assert absent["found"] == 0 and absent["missing_runs"] == list(range(8)) and "area" not in absent
+
+
+def test_trace_view_min_max_pyramid():
+    """降采样显示：金字塔各层与原始信号逐桶一致，窗口内按像素返回最小/最大值，窄峰不丢失"""
+    import asyncio
+    import os
+    import tempfile
+    import numpy as np
+    from app.core.config import settings
+    from app.services import trace_store, trace_view
+    
+    rng = np.random.default_rng(5)
+    signal = rng.normal(0.0, 1.0, 100003).astype("<f4")
+    signal[54321] = 80.0  # 单点尖峰
+    
+    async def upload():
+        yield signal.tobytes()
+    
+    original = settings.TRACE_STORAGE_DIR
+    with tempfile.TemporaryDirectory() as directory:
+        settings.TRACE_STORAGE_DIR = directory
+        try:
+            meta = asyncio.run(trace_store.save_trace(upload(), 50.0, start_time=1.0))
+            dt = 1.0 / (50.0 * 60.0)
+            
+            pyramid = trace_view.load_pyramid(meta)
+            assert os.path.exists(trace_store.pyramid_path(meta))
+            for bucket, count, offset in trace_view.pyramid_levels(signal.size):
+                padded = np.append(signal, np.full(count * bucket - signal.size, signal[-1]))
+                assert np.array_equal(pyramid[offset:offset + count, 0], padded.reshape(count, bucket).min(axis=1))
+                assert np.array_equal(pyramid[offset:offset + count, 1], padded.reshape(count, bucket).max(axis=1))
+            assert trace_view.pyramid_levels(signal.size)[-1][1] <= trace_view.PYRAMID_MIN_BUCKETS
+            
+            full = trace_view.view_trace(meta, width=500)
+            assert len(full["time"]) == 500 and full["samples_per_point"] > 100
+            assert max(full["max"]) == 80.0 and min(full["min"]) == float(signal.min())
+            assert full["start_time"] == 1.0
+            
+            # 窗口视图：只覆盖请求的窗口，尖峰保留在其所在的像素列
+            window = trace_view.view_trace(meta, start=1.0 + 50000 * dt, end=1.0 + 60000 * dt, width=300)
+            first = round((window["start_time"] - 1.0) / dt)
+            step = window["samples_per_point"]
+            assert first <= 50000 and len(window["time"]) <= 300
+            assert max(window["max"]) == 80.0
+            column = window["time"].index(next(t for t, v in zip(window["time"], window["max"]) if v == 80.0))
+            assert abs(window["time"][column] - (1.0 + 54321 * dt)) <= step * dt
+            
+            # 放大到每像素不足一个采样点时返回原始点
+            raw = trace_view.view_trace(meta, start=1.0 + 54300 * dt, end=1.0 + 54340 * dt, width=100)
+            assert raw["samples_per_point"] == 1 and raw["max"] == signal[54300:54341].astype(float).tolist()
+            
+            try:
+                trace_view.view_trace(meta, start=100.0, end=101.0)
+                assert False, "窗口超出信号范围应报错"
+            except ValueError:
+                pass
+            
+            trace_store.delete_trace_file(meta)
+            assert os.listdir(directory) == []
+        finally:
+            settings.TRACE_STORAGE_DIR = original
+
+
+def test_solvent_grid_matches_single_scores():
+    """溶剂体系网格评分：广播计算的每个组合与单点评分完全一致，排名有序，未知溶剂不再静默按默认值计算"""
+    import numpy as np
+    from app.services.green_chemistry import SOLVENT_DATABASE, analyzer
+    
+    ratios = [i / 20 for i in range(21)]
+    volumes = [1.0, 80.0, 150.0, 333.3]
+    grid = analyzer.calculate_solvent_score_grid(ratios=ratios, volumes_ml=volumes, top=15)
+    
+    solvents = list(SOLVENT_DATABASE)
+    assert grid["solvents"] == solvents
+    assert len(grid["pairs"]) == len(solvents) * (len(solvents) - 1) // 2
+    assert grid["num_combinations"] == len(grid["pairs"]) * len(ratios) * len(volumes)
+    
+    matrix = np.array(grid["matrix"])
+    assert matrix.shape == (len(volumes), len(grid["pairs"]), len(ratios))
+    for v, volume in enumerate(volumes):
+        for p, (solvent_a, solvent_b) in enumerate(grid["pairs"]):
+            for r, ratio in enumerate(ratios):
+                expected = analyzer.calculate_solvent_score(solvent_a, solvent_b, ratio_a=ratio, volume_ml=volume)
+                assert matrix[v, p, r] == expected["overall_green_score"]
+    
+    ranking = grid["ranking"]
+    scores = [item["overall_green_score"] for item in ranking]
+    assert len(ranking) == 15 and scores == sorted(scores, reverse=True)
+    assert scores[0] == matrix.max()
+    assert ranking == analyzer.calculate_solvent_score_grid(ratios=ratios, volumes_ml=volumes, top=15)["ranking"]
+    for item in ranking:
+        single = analyzer.calculate_solvent_score(
+            item["solvent_a"], item["solvent_b"], ratio_a=item["ratio_a"], volume_ml=item["volume_ml"]
+        )
+        assert single["overall_green_score"] == item["overall_green_score"]
+    
+    pair_matrix = grid["pair_matrix"]
+    assert all(pair_matrix[i][i] is None for i in range(len(solvents)))
+    for p, (solvent_a, solvent_b) in enumerate(grid["pairs"]):
+        i, j = solvents.index(solvent_a), solvents.index(solvent_b)
+        assert pair_matrix[i][j] == pair_matrix[j][i] == matrix[:, p, :].max()
+    
+    # 未知溶剂：网格评分和严格模式报错，非严格模式在结果中列出
+    for call in (
+        lambda: analyzer.calculate_solvent_score_grid(solvents=["水", "未知溶剂"]),
+        lambda: analyzer.calculate_solvent_score("水", "未知溶剂", strict=True)
+    ):
+        try:
+            call()
+            assert False, "未知溶剂应报错"
+        except ValueError as e:
+            assert "未知溶剂" in str(e)
+    assert analyzer.calculate_solvent_score("水", "未知溶剂")["unknown_solvents"] == ["未知溶剂"]
+    assert analyzer.calculate_solvent_score("水", "甲醇")["unknown_solvents"] == []
+
+
+def test_file_sqlite_engine_uses_queue_pool():
+    """SQLite文件数据库的引擎使用队列池并接受 DATABASE_POOL_* 参数，连接时执行PRAGMA"""
+    import asyncio
+    import os
+    import tempfile
+    from sqlalchemy import text
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+    from app.core.config import settings
+    from app.database.connection import create_engine
+    
+    async def run(path):
+        engine = create_engine(f"sqlite+aiosqlite:///{path}", pragmas=["PRAGMA journal_mode=WAL"])
+        try:
+            assert isinstance(engine.pool, AsyncAdaptedQueuePool)
+            assert engine.pool.size() == settings.DATABASE_POOL_SIZE
+            async with engine.connect() as conn:
+                assert (await conn.execute(text("SELECT 1"))).scalar() == 1
+                assert (await conn.execute(text("PRAGMA journal_mode"))).scalar().lower() == "wal"
+        finally:
+            await engine.dispose()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "test.db")
+        asyncio.run(run(path))
+        assert os.path.exists(path)
+
+
+def test_request_id_and_server_timing_follow_trace_switch():
+    """请求ID回显或生成；开启追踪时返回 Server-Timing；关闭时不计时、不构建调试数据"""
+    import logging
+    from fastapi.testclient import TestClient
+    from app.core import instrumentation
+    from app.core.config import settings
+    import main
+    
+    method = _sample_method()
+    body = {
+        "instrument": {
+            "time_points": method["instrument_time_points"],
+            "composition": method["instrument_composition"],
+            "flow_rate": method["instrument_flow_rate"],
+            "densities": method["instrument_densities"],
+            "factor_matrix": method["instrument_factor_matrix"],
+            "curve_types": method["instrument_curve_types"]
+        },
+        "preparation": {
+            "volumes": method["prep_volumes"],
+            "densities": method["prep_densities"],
+            "factor_matrix": method["prep_factor_matrix"]
+        },
+        **{name: method[name] for name in (
+            "p_factor", "pretreatment_p_factor", "instrument_r_factor", "instrument_d_factor",
+            "pretreatment_r_factor", "pretreatment_d_factor"
+        )}
+    }
+    # 不进入 with：不触发 lifespan，不初始化数据库
+    client = TestClient(main.app)
+    original = settings.SCORING_TRACE_ENABLED
+    try:
+        settings.SCORING_TRACE_ENABLED = False
+        response = client.post("/api/v1/scoring/full-score", json=body, headers={"X-Request-ID": "req-abc"})
+        assert response.status_code == 200
+        assert response.headers["X-Request-ID"] == "req-abc"
+        assert "Server-Timing" not in response.headers
+        
+        response = client.get("/health")
+        generated = response.headers["X-Request-ID"]
+        assert len(generated) == 16 and generated != client.get("/health").headers["X-Request-ID"]
+        
+        settings.SCORING_TRACE_ENABLED = True
+        response = client.post("/api/v1/scoring/full-score", json=body)
+        assert response.status_code == 200
+        timing = dict(item.split(";dur=") for item in response.headers["Server-Timing"].split(", "))
+        assert "layer0.instrument" in timing and "layer1.sub_factors" in timing
+        assert all(float(value) >= 0 for value in timing.values())
+    finally:
+        settings.SCORING_TRACE_ENABLED = original
+    assert instrumentation.request_id_var.get() == "-"
+    
+    # 关闭追踪且非DEBUG：span 返回共享的空上下文，调试数据的构建函数不被调用
+    logger = logging.getLogger("app.test_instrumentation")
+    span_level = instrumentation.span_logger.level
+    try:
+        instrumentation.span_logger.setLevel(logging.INFO)
+        logger.setLevel(logging.INFO)
+        assert instrumentation.span("layer0.instrument") is instrumentation._NULL_SPAN
+        
+        def never():
+            raise AssertionError("日志级别未开启时不应构建调试数据")
+        instrumentation.debug_payload(logger, "调试数据", never)
+        
+        built = []
+        logger.setLevel(logging.DEBUG)
+        instrumentation.debug_payload(logger, "调试数据", lambda: built.append(1) or {"n": 1})
+        assert built == [1]
+        
+        # 开启追踪后 span 计时并记录
+        token = instrumentation.start_trace()
+        with instrumentation.span("stage"):
+            pass
+        trace = instrumentation.stop_trace(token)
+        assert [name for name, _ in trace] == ["stage"]
+        assert instrumentation.span("stage") is instrumentation._NULL_SPAN
+    finally:
+        instrumentation.span_logger.setLevel(span_level)
+
+
 if __name__ == "__main__":
     test_simple_case()
+    test_array_engine_matches_dict_layers()
+    test_invalid_factor_rejected()
+    test_batch_matches_single_and_isolates_errors()
+    test_scheme_sweep_covers_all_combinations()
+    test_layer_caches_hit_on_repeated_gradient()
+    test_scoring_session_recomputes_only_dependent_layers()
+    test_parametric_curves_match_named_curves()
+    test_pump_trace_integration_matches_gradient_program()
+    test_ndjson_stream_scores_batches_as_input_arrives()
+    test_worker_pool_limits_queue_depth_and_keeps_context()
+    test_custom_weight_scheme_compiled_and_validated()
+    test_custom_schemes_persist_and_reload_from_database()
+    test_saved_results_ranked_and_filtered_in_database()
+    test_hplc_listing_keyset_pagination_and_filters()
+    test_hplc_bulk_create_in_chunks()
+    test_method_store_versions_and_delta_sync()
+    test_method_store_concurrent_writers_conflict()
+    test_reagent_library_resolves_request_reagents()
+    test_chromatogram_trace_peaks_and_usp_metrics()
+    test_trace_upload_stored_as_memory_mapped_file()
+    test_chromatogram_batch_runs_in_chunks_with_aggregates()
+    test_trace_view_min_max_pyramid()
+    test_solvent_grid_matches_single_scores()
+    test_file_sqlite_engine_uses_queue_pool()
+    test_request_id_and_server_timing_follow_trace_switch()
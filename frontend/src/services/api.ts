@@ -15,6 +15,10 @@ export const api = {
   calculateSolventScore: (data: any) =>
     axiosInstance.post('/green-chemistry/solvent-score', data),
 
+  // 溶剂对 × A比例 × 体积 网格评分：返回排名表、溶剂×溶剂最高评分矩阵和 [体积][溶剂对][比例] 热图数据
+  calculateSolventGrid: (data: any = {}) =>
+    axiosInstance.post('/green-chemistry/solvent-grid', data),
+
   calculateEcoScale: (data: any) =>
     axiosInstance.post('/green-chemistry/eco-scale', data),
 
@@ -22,12 +26,59 @@ export const api = {
   analyzeChromatogram: (data: any) =>
     axiosInstance.post('/analysis/chromatogram', data),
 
+  // 原始检测器信号（数值数组或base64编码的float32/float64缓冲区）：基线校正、寻峰、积分
+  analyzeChromatogramTrace: (data: any) =>
+    axiosInstance.post('/analysis/chromatogram/trace', data),
+
+  // 批量处理质控序列：runs 为 { analysis_id } 或内联信号，返回每个运行的汇总和保留时间漂移/面积RSD
+  analyzeChromatogramBatch: (data: any) =>
+    axiosInstance.post('/analysis/chromatogram/batch', data),
+
   // HPLC分析
   createHPLCAnalysis: (data: any) =>
     axiosInstance.post('/analysis/hplc', data),
 
-  listHPLCAnalyses: (skip = 0, limit = 100) =>
-    axiosInstance.get(`/analysis/hplc?skip=${skip}&limit=${limit}`),
+  // 键集分页：返回 { items, next_cursor }，下一页传入 next_cursor
+  listHPLCAnalyses: (limit = 100, cursor?: string, filters: Record<string, any> = {}) =>
+    axiosInstance.get('/analysis/hplc', { params: { limit, cursor, ...filters } }),
+
+  // 原始信号以二进制上传（Float32Array/Float64Array 或 .npy 文件），服务端按内存映射处理
+  uploadHPLCTrace: (id: number, data: ArrayBuffer | ArrayBufferView | Blob, sampleRateHz: number, dtype = 'float32', startTime = 0) =>
+    axiosInstance.put(`/analysis/hplc/${id}/trace`, data, {
+      params: { sample_rate_hz: sampleRateHz, start_time: startTime, dtype },
+      headers: { 'Content-Type': 'application/octet-stream' }
+    }),
+
+  analyzeHPLCTrace: (id: number, options: any = {}) =>
+    axiosInstance.post(`/analysis/hplc/${id}/trace/analyze`, options),
+
+  // 按图表像素宽度获取可见窗口内的降采样信号（每个像素列的最小/最大值），缩放时重新请求
+  viewHPLCTrace: (id: number, width: number, start?: number, end?: number) =>
+    axiosInstance.get(`/analysis/hplc/${id}/trace/view`, { params: { width, start, end } }),
+
+  // 方法数据存储（methods/factors/gradients），逐条写入并按修订号增量同步
+  listMethodRecords: (collection: string) =>
+    axiosInstance.get(`/storage/${collection}`),
+
+  putMethodRecord: (collection: string, key: string, data: any, baseVersion?: number) =>
+    axiosInstance.put(`/storage/${collection}/${encodeURIComponent(key)}`, { data, base_version: baseVersion }),
+
+  deleteMethodRecord: (collection: string, key: string, baseVersion?: number) =>
+    axiosInstance.delete(`/storage/${collection}/${encodeURIComponent(key)}`, { params: { base_version: baseVersion } }),
+
+  // 返回 { results, conflicts, changes, revision, has_more }，保存 revision 作为下次的 since
+  syncMethodRecords: (since: number, changes: any[] = [], collections?: string[]) =>
+    axiosInstance.post('/storage/sync', { since, changes, collections }),
+
+  // 试剂库：评分请求中的试剂可按名称/ID引用，省略 densities 和 factor_matrix
+  listReagents: () =>
+    axiosInstance.get('/reagents'),
+
+  saveReagents: (reagents: any[]) =>
+    axiosInstance.post('/reagents', { reagents }),
+
+  deleteReagent: (id: number) =>
+    axiosInstance.delete(`/reagents/${id}`),
 
   // 溶剂数据库
   listSolvents: () =>